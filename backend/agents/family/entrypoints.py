@@ -15,6 +15,7 @@ from .story_generator import StoryGenerator
 from .tooling import FamilyToolSet
 from .persona_generator import PersonaGenerator
 from .config import get_sessions_dir
+from utils.session_layout import get_session_index, session_dir as sharded_session_dir
 
 # ロガー設定
 logger = logging.getLogger(__name__)
@@ -34,7 +35,7 @@ class FamilyProfileLoader:
         if not session_id:
             return {}
         base_dir = cls.get_base_dir()
-        profile_path = os.path.join(base_dir, session_id, "user_profile.json")
+        profile_path = os.path.join(sharded_session_dir(base_dir, session_id), "user_profile.json")
         if not os.path.exists(profile_path):
             return {}
         try:
@@ -89,25 +90,14 @@ class FamilySessionAgent(Agent):
         # プロファイルが見つからない場合、最新のセッションを探す
         if not profile or not profile.get("age"):
             logger.info(f"⚠️ セッション {session_id} にプロファイルが見つかりません。最新のセッションを検索します...")
-            base_dir = FamilyProfileLoader.get_base_dir()
-            if os.path.exists(base_dir):
-                # すべてのセッションディレクトリを取得（最新順）
-                sessions = []
-                for d in os.listdir(base_dir):
-                    path = os.path.join(base_dir, d)
-                    if os.path.isdir(path) and d != "generated_content":
-                        # ディレクトリの最終更新時刻を取得
-                        mtime = os.path.getmtime(path)
-                        sessions.append((mtime, d))
-
-                # 最新のものから順にチェック
-                for _, sess_dir in sorted(sessions, reverse=True):
-                    test_profile = FamilyProfileLoader.load_from_session(sess_dir)
-                    if test_profile and test_profile.get("age"):
-                        logger.info(f"セッション {sess_dir} からプロファイルを読み込みました")
-                        profile = test_profile
-                        session_id = sess_dir
-                        break
+            # ディレクトリを走査せず、プロファイル（age）のある最新のセッションをインデックスから引く
+            latest_session = get_session_index().latest_session(has_profile=True)
+            if latest_session:
+                test_profile = FamilyProfileLoader.load_from_session(latest_session)
+                if test_profile and test_profile.get("age"):
+                    logger.info(f"セッション {latest_session} からプロファイルを読み込みました")
+                    profile = test_profile
+                    session_id = latest_session
 
         # LLMでペルソナを生成
         logger.info("PersonaGeneratorを使用してペルソナを生成します...")
@@ -223,7 +213,7 @@ class FamilySessionAgent(Agent):
             try:
                 logger.info(f"家族会話をセッション {session_id} に保存します")
                 base_dir = FamilyProfileLoader.get_base_dir()
-                session_dir = os.path.join(base_dir, session_id)
+                session_dir = sharded_session_dir(base_dir, session_id)
                 os.makedirs(session_dir, exist_ok=True)
 
                 output_data = {
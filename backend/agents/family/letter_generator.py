@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import asyncio
 import os
 from datetime import datetime
 from typing import Any, Dict, List
@@ -8,6 +7,8 @@ from typing import Any, Dict, List
 import google.generativeai as genai
 from google.generativeai import GenerativeModel
 
+from utils.llm_gateway import get_llm_gateway
+
 from .models import Persona
 
 
@@ -99,6 +100,7 @@ class LetterGenerator:
         trip_info: Dict[str, Any],
         family_members: List[Persona],
         user_name: str | None = None,
+        story_is_partial: bool = False,
     ) -> str:
         """ストーリーを基に手紙形式のメッセージを生成
 
@@ -107,6 +109,8 @@ class LetterGenerator:
             trip_info: 旅行情報 {"destination": "行き先", "activities": ["アクティビティ1", ...]}
             family_members: 家族メンバーのペルソナリスト
             user_name: ユーザーの名前（省略可）
+            story_is_partial: Trueの場合、ストーリーは生成途中の冒頭部分（空でも可）として扱い、
+                旅行情報を中心に手紙を書く
 
         Returns:
             str: 生成された手紙（600-900文字程度）
@@ -115,7 +119,7 @@ class LetterGenerator:
             ValueError: 必須情報が不足している場合
         """
         # バリデーション
-        if not story or not story.strip():
+        if not story_is_partial and (not story or not story.strip()):
             raise ValueError("ストーリーが空です")
 
         if not trip_info.get("destination"):
@@ -135,10 +139,18 @@ class LetterGenerator:
         current_date = datetime.now().strftime("%Y年%m月%d日")
         user_display_name = user_name if user_name else "あなた"
 
+        story_text = (story or "").strip()
+        if story_is_partial:
+            story_text = (
+                f"{story_text}\n（ここまでは物語の冒頭です。続きは旅行情報を基に想像してください）"
+                if story_text
+                else "（物語は作成中です。旅行情報と家族構成を基に書いてください）"
+            )
+
         # プロンプト生成
         prompt = self.LETTER_PROMPT_TEMPLATE.format(
             family_members=family_members_text,
-            story=story,
+            story=story_text,
             destination=trip_info["destination"],
             activities=activities_text,
             user_name=user_display_name,
@@ -147,10 +159,7 @@ class LetterGenerator:
         )
 
         # 手紙生成（非同期実行）
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None, self.model.generate_content, prompt
-        )
+        response = await get_llm_gateway().generate_content(self.model, prompt)
 
         letter = response.text if hasattr(response, "text") else str(response)
         return letter.strip()
@@ -9,6 +9,8 @@ from typing import Any, Dict, List
 import google.generativeai as genai
 from google.generativeai import GenerativeModel
 
+from utils.llm_gateway import get_llm_gateway
+
 from .models import Persona
 
 logger = logging.getLogger(__name__)
@@ -57,9 +59,7 @@ class PersonaGenerator:
         prompt = self._build_prompt(user_profile)
 
         try:
-            import asyncio
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, self.model.generate_content, prompt)
+            response = await get_llm_gateway().generate_content(self.model, prompt)
             text = response.text if hasattr(response, "text") else str(response)
 
             # JSONの前後のマークダウンコードブロックを除去
@@ -13,6 +13,8 @@ import random
 from dataclasses import dataclass
 from typing import Any, Dict, List
 
+from utils.llm_gateway import get_llm_gateway
+
 
 @dataclass
 class BigFiveTraits:
@@ -207,7 +209,7 @@ class PersonalityCalculator:
 重要: 年齢に応じた自然な子供らしさを保ちつつ、科学的データを反映してください。
 """
 
-            response = model.generate_content(prompt)
+            response = get_llm_gateway().generate_content_sync(model, prompt)
             response_text = response.text if hasattr(response, 'text') else str(response)
 
             # JSON抽出
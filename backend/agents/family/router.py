@@ -0,0 +1,120 @@
+"""家族会話の発話者ルーティング
+
+LLMを呼び出す前に、ユーザー発話に応答すべき家族メンバーをローカルで選ぶ。
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from .tooling import FamilyTool
+
+
+GROUP_ADDRESS_WORDS: Sequence[str] = ("みんな", "皆", "家族", "全員")
+
+HONORIFIC_SUFFIXES: Sequence[str] = ("ちゃん", "くん", "君", "さん")
+
+
+class SpeakerRouter:
+    """ターンごとに応答するメンバーを選択する
+
+    優先順位:
+    1. 名前・役割で呼びかけられたメンバー
+    2. 「みんな」などの全体への呼びかけ → 全員
+    3. 計画の提案・確定が進行中ならパートナー（妻）を必ず含める
+    4. 残り枠は直近で話していないメンバーから順に（直前の発話者は避ける）
+    """
+
+    def __init__(self, max_speakers: Optional[int] = None) -> None:
+        """
+        Args:
+            max_speakers: 1ターンで応答する最大人数。
+                          Noneの場合は環境変数 FAMILY_MAX_SPEAKERS（デフォルト: 2）。0以下で全員
+        """
+        if max_speakers is None:
+            max_speakers = int(os.getenv("FAMILY_MAX_SPEAKERS", "2"))
+        self.max_speakers = max_speakers
+
+    def select(
+        self,
+        tools: Sequence[FamilyTool],
+        state: Dict[str, Any],
+        message: str,
+    ) -> List[FamilyTool]:
+        """応答するメンバーをツール順で返す"""
+        candidates = list(tools)
+        if not candidates:
+            return []
+        if self.max_speakers <= 0 or len(candidates) <= self.max_speakers:
+            return candidates
+
+        partner = candidates[0]
+        if state.get("family_conversation_complete"):
+            return [partner]
+
+        text = message or ""
+        addressed = [tool for tool in candidates if self._is_addressed(tool, text)]
+        if addressed:
+            return self._ordered(candidates, addressed[: self.max_speakers])
+
+        if any(word in text for word in GROUP_ADDRESS_WORDS):
+            return candidates
+
+        selected: List[FamilyTool] = []
+        if self._plan_in_progress(state):
+            selected.append(partner)
+
+        log = state.get("family_conversation_log", []) or []
+        previous_speaker = self._previous_family_speaker(log)
+        last_turns = self._last_spoken_positions(log)
+
+        remaining = [tool for tool in candidates if tool not in selected]
+        # 話していない期間が長い順（未発言が最優先）、同順位はツール順
+        remaining.sort(key=lambda tool: (
+            tool.persona.role == previous_speaker,
+            last_turns.get(tool.persona.role, -1),
+        ))
+        for tool in remaining:
+            if len(selected) >= self.max_speakers:
+                break
+            selected.append(tool)
+
+        return self._ordered(candidates, selected)
+
+    def _is_addressed(self, tool: FamilyTool, text: str) -> bool:
+        name = (tool.persona.name or "").strip()
+        role = (tool.persona.role or "").strip()
+        if name:
+            base = name
+            for suffix in HONORIFIC_SUFFIXES:
+                if base.endswith(suffix) and len(base) > len(suffix):
+                    base = base[: -len(suffix)]
+                    break
+            if base and base in text:
+                return True
+        return bool(role) and role in text
+
+    def _plan_in_progress(self, state: Dict[str, Any]) -> bool:
+        if state.get("family_plan_prompted") or state.get("family_plan_confirmed"):
+            return True
+        trip_info = state.get("family_trip_info", {}) or {}
+        # 行き先と2つ以上のアクティビティが揃うと、パートナーが計画を提案する
+        return bool(trip_info.get("destination")) and len(trip_info.get("activities", []) or []) >= 2
+
+    def _previous_family_speaker(self, log: List[Dict[str, Any]]) -> Optional[str]:
+        for entry in reversed(log):
+            speaker = entry.get("speaker")
+            if speaker and speaker != "user":
+                return speaker
+        return None
+
+    def _last_spoken_positions(self, log: List[Dict[str, Any]]) -> Dict[str, int]:
+        positions: Dict[str, int] = {}
+        for idx, entry in enumerate(log):
+            speaker = entry.get("speaker")
+            if speaker and speaker != "user":
+                positions[speaker] = idx
+        return positions
+
+    def _ordered(self, candidates: List[FamilyTool], selected: List[FamilyTool]) -> List[FamilyTool]:
+        return [tool for tool in candidates if tool in selected]
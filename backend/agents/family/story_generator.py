@@ -1,15 +1,25 @@
 from __future__ import annotations
 
-import asyncio
 import os
-from typing import Any, Dict, List
+import re
+from typing import Any, AsyncIterator, Dict, List
 
 import google.generativeai as genai
 from google.generativeai import GenerativeModel
 
+from utils.llm_gateway import get_llm_gateway
+
 from .models import Persona
 
 
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """空行区切りで段落に分割（空の段落は除く）"""
+    return [paragraph.strip() for paragraph in _PARAGRAPH_BREAK.split(text or "") if paragraph.strip()]
+
+
 class StoryGenerator:
     """会話ログから物語的なストーリーを生成
 
@@ -58,6 +68,7 @@ class StoryGenerator:
 - 全体で800-1200文字程度
 
 ### 注意事項
+- 段落と段落の間は必ず空行を1行入れる
 - 箇条書きは使わず、自然な文章で
 - 会話文を適度に含めて臨場感を出す
 - 各家族メンバーの性格や話し方を反映
@@ -97,6 +108,54 @@ class StoryGenerator:
         Returns:
             str: 生成された物語（3部構成、800-1200文字程度）
 
+        Raises:
+            ValueError: 必須情報（destination、activities）が不足している場合
+        """
+        prompt = self._build_prompt(conversation_log, trip_info, personas)
+
+        # ストーリー生成（非同期実行）
+        response = await get_llm_gateway().generate_content(self.model, prompt)
+
+        story = response.text if hasattr(response, "text") else str(response)
+        return story.strip()
+
+    async def stream_story(
+        self,
+        conversation_log: List[Dict[str, str]],
+        trip_info: Dict[str, Any],
+        personas: List[Persona],
+    ) -> AsyncIterator[str]:
+        """ストーリーを生成しながら段落ごとに返す
+
+        引数と例外は generate_story と同じ。段落は空行区切りで、
+        次の段落が始まった時点で確定したものとして返す。
+
+        Yields:
+            str: 生成済みの段落
+        """
+        prompt = self._build_prompt(conversation_log, trip_info, personas)
+
+        buffer = ""
+        async for chunk in get_llm_gateway().stream_content(self.model, prompt):
+            buffer += chunk
+            parts = _PARAGRAPH_BREAK.split(buffer)
+            # 最後の要素は書きかけの段落なので保留
+            buffer = parts.pop()
+            for paragraph in parts:
+                if paragraph.strip():
+                    yield paragraph.strip()
+
+        if buffer.strip():
+            yield buffer.strip()
+
+    def _build_prompt(
+        self,
+        conversation_log: List[Dict[str, str]],
+        trip_info: Dict[str, Any],
+        personas: List[Persona],
+    ) -> str:
+        """ストーリー生成プロンプトを作成
+
         Raises:
             ValueError: 必須情報（destination、activities）が不足している場合
         """
@@ -114,22 +173,13 @@ class StoryGenerator:
         activities_text = "、".join(activities)
 
         # プロンプト生成
-        prompt = self.STORY_PROMPT_TEMPLATE.format(
+        return self.STORY_PROMPT_TEMPLATE.format(
             family_members=family_members_text,
             conversation_log=conversation_text,
             destination=trip_info["destination"],
             activities=activities_text,
         )
 
-        # ストーリー生成（非同期実行）
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None, self.model.generate_content, prompt
-        )
-
-        story = response.text if hasattr(response, "text") else str(response)
-        return story.strip()
-
     def _format_family_members(self, personas: List[Persona]) -> str:
         """ペルソナリストを読みやすいテキストに整形
 
@@ -2,15 +2,22 @@ from __future__ import annotations
 
 import asyncio
 import json
+import logging
 import os
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 import google.generativeai as genai
 from google.generativeai import GenerativeModel
 from google.adk.tools import FunctionTool
 
+from utils.llm_gateway import get_llm_gateway
+
 from .models import Persona
 
+logger = logging.getLogger(__name__)
+
+
 class FamilyTool:
     def __init__(self, persona: Persona, index: int, kind: str) -> None:
         self.persona = persona
@@ -22,34 +29,44 @@ class FamilyTool:
         self.display_name = persona.role
 
         async def call_agent(*, tool_context, input_text: str) -> Dict[str, str]:
-            import logging
+            state = tool_context.state
+            snapshot = self.snapshot_state(state)
+            reply = await self.generate_reply(snapshot, input_text)
+            return self.apply_reply(state, reply, snapshot)
 
-            logger = logging.getLogger(__name__)
+        call_agent.__name__ = f"call_{kind}_{index}"
+        self.tool = FunctionTool(func=call_agent)
 
-            state = tool_context.state
-            trip_info = state.get("family_trip_info", {})
-            plan_prompted = bool(state.get("family_plan_prompted"))
-            plan_confirmed = bool(state.get("family_plan_confirmed"))
+    @staticmethod
+    def snapshot_state(state: Dict[str, Any]) -> Dict[str, Any]:
+        """ターン開始時点の共有状態を読み取り専用で切り出す
 
-            if state.get("family_conversation_complete"):
-                destination = trip_info.get("destination", "お出かけ先")
-                message = (
-                    f"ありがとう！それじゃあ明日は「{destination}」で楽しもうね。準備は私に任せて♪"
-                    if self.persona.role == "妻"
-                    else ""
-                )
-                log = state.get("family_conversation_log", [])
-                if message:
-                    log.append({"speaker": self.persona.role, "message": message})
-                state["family_conversation_log"] = log
-                return {"speaker": self.persona.role, "message": message}
-
-            conversation_tail = state.get("family_conversation_log", [])[-3:]
-            prompt = f"""
+        並行して応答を生成するメンバーは全員このスナップショットを参照し、
+        共有状態への反映は apply_reply で順番に行う。
+        """
+        trip_info = state.get("family_trip_info", {}) or {}
+        return {
+            "trip_info": {
+                "destination": trip_info.get("destination"),
+                "activities": list(trip_info.get("activities", []) or []),
+            },
+            "plan_prompted": bool(state.get("family_plan_prompted")),
+            "plan_confirmed": bool(state.get("family_plan_confirmed")),
+            "conversation_complete": bool(state.get("family_conversation_complete")),
+            "conversation_tail": list(state.get("family_conversation_log", [])[-3:]),
+        }
+
+    async def generate_reply(self, snapshot: Dict[str, Any], input_text: str) -> Dict[str, Any]:
+        """LLMで応答を生成する（共有状態は変更しない）"""
+        if snapshot.get("conversation_complete"):
+            return {"message": "", "destination": None, "activities": None, "plan_response": None}
+
+        trip_info = snapshot.get("trip_info", {})
+        prompt = f"""
 あなたは未来の{self.persona.role}「{self.persona.name}」です。
 次のユーザー発話に応答してください。
 
-直近の会話ログ: {conversation_tail}
+直近の会話ログ: {snapshot.get("conversation_tail", [])}
 行き先: {trip_info.get("destination")}
 アクティビティ一覧: {trip_info.get("activities", [])}
 
@@ -67,96 +84,145 @@ class FamilyTool:
 ユーザー発話: "{input_text}"
 """
 
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(None, self.model.generate_content, prompt)
-            text = response.text if hasattr(response, "text") else str(response)
-
-            logger.info(f"[{self.persona.role}] Raw response: {text[:200]}...")
-
-            destination = None
-            activities: List[str] | None = None
-            plan_response: Optional[str] = None
-            try:
-                text_cleaned = text.strip()
-                if text_cleaned.startswith("```json"):
-                    text_cleaned = text_cleaned[7:]
-                if text_cleaned.startswith("```"):
-                    text_cleaned = text_cleaned[3:]
-                if text_cleaned.endswith("```"):
-                    text_cleaned = text_cleaned[:-3]
-                text_cleaned = text_cleaned.strip()
-
-                logger.info(f"[{self.persona.role}] Cleaned JSON: {text_cleaned[:200]}...")
-
-                result = json.loads(text_cleaned)
-                speaker_text = result.get("message", text)
-                destination = result.get("destination")
-                activities_field = result.get("activities")
-                plan_response = result.get("plan_response")
-
-                logger.info(
-                    f"[{self.persona.role}] Parsed - destination: {destination}, activities: {activities_field}"
+        response = await get_llm_gateway().generate_content(self.model, prompt)
+        text = response.text if hasattr(response, "text") else str(response)
+
+        logger.info(f"[{self.persona.role}] Raw response: {text[:200]}...")
+        return self.parse_reply(text)
+
+    def parse_reply(self, text: str) -> Dict[str, Any]:
+        """LLMのJSON応答を message / destination / activities / plan_response に分解"""
+        destination = None
+        activities: List[str] | None = None
+        plan_response: Optional[str] = None
+        try:
+            text_cleaned = text.strip()
+            if text_cleaned.startswith("```json"):
+                text_cleaned = text_cleaned[7:]
+            if text_cleaned.startswith("```"):
+                text_cleaned = text_cleaned[3:]
+            if text_cleaned.endswith("```"):
+                text_cleaned = text_cleaned[:-3]
+            text_cleaned = text_cleaned.strip()
+
+            logger.info(f"[{self.persona.role}] Cleaned JSON: {text_cleaned[:200]}...")
+
+            result = json.loads(text_cleaned)
+            speaker_text = result.get("message", text)
+            destination = result.get("destination")
+            activities_field = result.get("activities")
+            plan_response = result.get("plan_response")
+
+            logger.info(
+                f"[{self.persona.role}] Parsed - destination: {destination}, activities: {activities_field}"
+            )
+
+            if isinstance(activities_field, list):
+                activities = [str(item) for item in activities_field if item]
+            elif activities_field:
+                activities = [str(activities_field)]
+        except json.JSONDecodeError as e:
+            logger.warning(f"[{self.persona.role}] JSON parse error: {e}, using text as-is")
+            speaker_text = text.strip()
+
+        return {
+            "message": speaker_text,
+            "destination": destination,
+            "activities": activities,
+            "plan_response": plan_response,
+        }
+
+    def apply_reply(
+        self,
+        state: Dict[str, Any],
+        reply: Dict[str, Any],
+        snapshot: Dict[str, Any],
+    ) -> Dict[str, str]:
+        """生成済みの応答を共有状態に反映し、会話ログに追加する
+
+        plan_response の判定はターン開始時点（snapshot）の提案状態に対して行う。
+        """
+        if state.get("family_conversation_complete"):
+            return self._closing_reply(state)
+
+        speaker_text = reply.get("message") or ""
+        destination = reply.get("destination")
+        activities = reply.get("activities")
+        plan_response = reply.get("plan_response")
+
+        trip_info = state.get("family_trip_info", {})
+        if destination and isinstance(destination, str):
+            trip_info["destination"] = destination
+            logger.info(f"[{self.persona.role}] Set destination: {destination}")
+        if activities:
+            stored = trip_info.get("activities", [])
+            for activity in activities:
+                if activity not in stored:
+                    stored.append(activity)
+            trip_info["activities"] = stored
+            logger.info(f"[{self.persona.role}] Added activities: {activities}, total: {stored}")
+
+        state["family_trip_info"] = trip_info
+
+        if self.persona.role == "妻":
+            destination = trip_info.get("destination")
+            activities = trip_info.get("activities", [])
+            if state.get("family_plan_confirmed") and destination:
+                speaker_text = (
+                    f"ありがとう！それじゃあ明日は「{destination}」で楽しもうね。準備は私に任せて♪"
                 )
-
-                if isinstance(activities_field, list):
-                    activities = [str(item) for item in activities_field if item]
-                elif activities_field:
-                    activities = [str(activities_field)]
-            except json.JSONDecodeError as e:
-                logger.warning(f"[{self.persona.role}] JSON parse error: {e}, using text as-is")
-                speaker_text = text.strip()
-
-            trip_info = state.get("family_trip_info", {})
-            if destination and isinstance(destination, str):
-                trip_info["destination"] = destination
-                logger.info(f"[{self.persona.role}] Set destination: {destination}")
-            if activities:
-                stored = trip_info.get("activities", [])
-                for activity in activities:
-                    if activity not in stored:
-                        stored.append(activity)
-                trip_info["activities"] = stored
-                logger.info(f"[{self.persona.role}] Added activities: {activities}, total: {stored}")
-
-            state["family_trip_info"] = trip_info
-
-            if self.persona.role == "妻":
-                destination = trip_info.get("destination")
-                activities = trip_info.get("activities", [])
-                if state.get("family_plan_confirmed") and destination:
-                    speaker_text = (
-                        f"ありがとう！それじゃあ明日は「{destination}」で楽しもうね。準備は私に任せて♪"
-                    )
-                    state["family_conversation_complete"] = True
-                    state["family_plan_prompted"] = False
-                elif destination and len(activities) >= 2 and not state.get("family_plan_prompted"):
-                    first = activities[0]
-                    second = activities[1] if len(activities) > 1 else activities[0]
-                    speaker_text += (
-                        f"\n\n明日は「{destination}」で、{first}と{second}を楽しむ計画にしようと思うけど大丈夫かな？"
-                    )
-                    state["family_plan_prompted"] = True
-
-            if plan_prompted and not plan_confirmed and plan_response:
-                plan_response_upper = plan_response.upper()
-                if plan_response_upper.startswith("YES"):
-                    state["family_plan_confirmed"] = True
-                    state["family_plan_prompted"] = False
-                elif plan_response_upper.startswith("NO"):
-                    state["family_plan_prompted"] = False
-
-            log = state.get("family_conversation_log", [])
-            if speaker_text:
-                log.append({"speaker": self.persona.role, "message": speaker_text})
-            state["family_conversation_log"] = log
-
-            return {
-                "speaker": self.persona.role,
-                "message": speaker_text,
-            }
-
-        call_agent.__name__ = f"call_{kind}_{index}"
-        self.tool = FunctionTool(func=call_agent)
+                state["family_conversation_complete"] = True
+                state["family_plan_prompted"] = False
+            elif destination and len(activities) >= 2 and not state.get("family_plan_prompted"):
+                first = activities[0]
+                second = activities[1] if len(activities) > 1 else activities[0]
+                speaker_text += (
+                    f"\n\n明日は「{destination}」で、{first}と{second}を楽しむ計画にしようと思うけど大丈夫かな？"
+                )
+                state["family_plan_prompted"] = True
+
+        plan_prompted = snapshot.get("plan_prompted")
+        plan_confirmed = snapshot.get("plan_confirmed")
+        if plan_prompted and not plan_confirmed and plan_response and state.get("family_plan_prompted"):
+            plan_response_upper = plan_response.upper()
+            if plan_response_upper.startswith("YES"):
+                state["family_plan_confirmed"] = True
+                state["family_plan_prompted"] = False
+            elif plan_response_upper.startswith("NO"):
+                state["family_plan_prompted"] = False
+
+        return self._append_log(state, speaker_text)
+
+    def error_reply(self, state: Dict[str, Any], error: Exception) -> Dict[str, str]:
+        """応答生成に失敗したメンバーのフォールバック発話を会話ログに追加"""
+        logger.warning(f"[{self.persona.role}] 応答生成エラー: {error}")
+        fallback_message = (
+            "ごめんなさい、少し調子が悪いみたい。また後で話そうね。"
+            f"（詳細: {error}）"
+        )
+        return self._append_log(state, fallback_message)
+
+    def _closing_reply(self, state: Dict[str, Any]) -> Dict[str, str]:
+        trip_info = state.get("family_trip_info", {})
+        destination = trip_info.get("destination", "お出かけ先")
+        message = (
+            f"ありがとう！それじゃあ明日は「{destination}」で楽しもうね。準備は私に任せて♪"
+            if self.persona.role == "妻"
+            else ""
+        )
+        return self._append_log(state, message)
+
+    def _append_log(self, state: Dict[str, Any], message: str) -> Dict[str, str]:
+        log = state.get("family_conversation_log", [])
+        timestamp = datetime.now().isoformat()
+        if message:
+            log.append({"speaker": self.persona.role, "message": message, "timestamp": timestamp})
+        state["family_conversation_log"] = log
+        return {
+            "speaker": self.persona.role,
+            "message": message,
+            "timestamp": timestamp,
+        }
 
     def _build_prompt(self, user_message: str) -> str:
         history_snippets = "\n".join(
@@ -203,14 +269,22 @@ class FamilyTool:
 class FamilyToolSet:
     """家族会話ツール群"""
 
-    def __init__(self, personas: List[Persona]) -> None:
+    MODE_PER_MEMBER = "per_member"
+    MODE_ENSEMBLE = "ensemble"
+
+    def __init__(self, personas: List[Persona], mode: Optional[str] = None) -> None:
         """
         Args:
             personas: PersonaGeneratorで生成された家族メンバーのペルソナリスト
                      [パートナー, 子供1, 子供2, ...]の順
+            mode: 応答生成モード。per_member（メンバーごとに1リクエスト）または
+                  ensemble（全員分を1リクエストで生成）。
+                  Noneの場合は環境変数 FAMILY_TOOL_MODE（デフォルト: per_member）
         """
         self.personas = personas
         self.tools = self._build_tools()
+        self.mode = (mode or os.getenv("FAMILY_TOOL_MODE", self.MODE_PER_MEMBER)).lower()
+        self.model = self.tools[0].model if self.tools else None
 
     def _build_tools(self) -> List[FamilyTool]:
         tools: List[FamilyTool] = []
@@ -233,6 +307,161 @@ class FamilyToolSet:
     def tool_names(self) -> List[str]:
         return [tool.name for tool in self.tools]
 
+    async def respond_all(
+        self,
+        tool_context,
+        input_text: str,
+        tools: Optional[List[FamilyTool]] = None,
+    ) -> List[Dict[str, str]]:
+        """家族メンバーの応答を並行生成し、ツール順に共有状態へ反映する
+
+        Args:
+            tool_context: state属性を持つコンテキスト
+            input_text: ユーザー発話
+            tools: 応答させるメンバー（省略時は全員）
+
+        Returns:
+            List[Dict[str, str]]: ツール順の発話（speaker, message, timestamp）
+        """
+        targets = list(self.tools if tools is None else tools)
+        state = tool_context.state
+        snapshot = FamilyTool.snapshot_state(state)
+
+        replies: List[Any] = [None] * len(targets)
+        if self.mode == self.MODE_ENSEMBLE and len(targets) > 1 and not snapshot["conversation_complete"]:
+            try:
+                replies = await self._generate_ensemble(snapshot, input_text, targets)
+            except Exception as e:
+                logger.warning(f"[ensemble] 一括生成に失敗したため個別生成にフォールバック: {e}")
+
+        # 一括生成で得られなかったメンバーは個別に並行生成
+        pending = [idx for idx, reply in enumerate(replies) if reply is None]
+        if pending:
+            generated = await asyncio.gather(
+                *(targets[idx].generate_reply(snapshot, input_text) for idx in pending),
+                return_exceptions=True,
+            )
+            for idx, reply in zip(pending, generated):
+                replies[idx] = reply
+
+        results: List[Dict[str, str]] = []
+        for tool, reply in zip(targets, replies):
+            if isinstance(reply, Exception):
+                results.append(tool.error_reply(state, reply))
+                continue
+            if isinstance(reply, BaseException):
+                raise reply
+            try:
+                results.append(tool.apply_reply(state, reply, snapshot))
+            except Exception as apply_error:
+                results.append(tool.error_reply(state, apply_error))
+        return results
+
+    async def _generate_ensemble(
+        self,
+        snapshot: Dict[str, Any],
+        input_text: str,
+        targets: List[FamilyTool],
+    ) -> List[Optional[Dict[str, Any]]]:
+        """全メンバーの応答を1回のLLM呼び出しでまとめて生成
+
+        Returns:
+            targetsと同じ順の応答リスト。取得できなかったメンバーはNone
+        """
+        trip_info = snapshot.get("trip_info", {})
+        members_text = "\n".join(
+            f"{idx + 1}. {tool.persona.role}「{tool.persona.name}」"
+            f" 話し方: {tool.persona.speaking_style} / 性格: {', '.join(tool.persona.traits)}"
+            for idx, tool in enumerate(targets)
+        )
+        prompt = f"""
+あなたは未来の家族の各メンバーを演じます。
+次のユーザー発話に、以下のメンバー全員がそれぞれの人格で応答してください。
+
+メンバー（この順番で応答する）:
+{members_text}
+
+直近の会話ログ: {snapshot.get("conversation_tail", [])}
+行き先: {trip_info.get("destination")}
+アクティビティ一覧: {trip_info.get("activities", [])}
+
+以下のJSON形式で出力してください:
+{{
+  "replies": [
+    {{"speaker": "役割名", "message": "返答文（300字以内）"}}
+  ],
+  "destination": 会話全体から決まった行き先またはnull,
+  "activities": 会話全体から挙がったアクティビティ配列,
+  "plan_response": "YES" / "NO" / "UNKNOWN"
+}}
+
+制約:
+- repliesはメンバーの順番どおり、全員分を含める。
+- 他のメンバーの発言と矛盾しないようにする。
+- plan_responseは、提案への明確な賛成ならYES、明確な拒否ならNO、判断できなければUNKNOWN。
+- JSON以外のテキストは出力しない。
+ユーザー発話: "{input_text}"
+"""
+
+        response = await get_llm_gateway().generate_content(self.model, prompt)
+        text = response.text if hasattr(response, "text") else str(response)
+        logger.info(f"[ensemble] Raw response: {text[:200]}...")
+
+        text_cleaned = text.strip()
+        if text_cleaned.startswith("```json"):
+            text_cleaned = text_cleaned[7:]
+        if text_cleaned.startswith("```"):
+            text_cleaned = text_cleaned[3:]
+        if text_cleaned.endswith("```"):
+            text_cleaned = text_cleaned[:-3]
+        result = json.loads(text_cleaned.strip())
+
+        raw_replies = result.get("replies")
+        if not isinstance(raw_replies, list):
+            raise ValueError("repliesが配列ではありません")
+        entries = [item for item in raw_replies if isinstance(item, dict) and item.get("message")]
+
+        # 順番どおりに揃っていれば位置で、そうでなければ役割名で対応付ける
+        if len(entries) == len(targets):
+            matched: List[Optional[Dict[str, Any]]] = list(entries)
+        else:
+            by_role: Dict[str, List[Dict[str, Any]]] = {}
+            for entry in entries:
+                by_role.setdefault(str(entry.get("speaker")), []).append(entry)
+            matched = [
+                by_role[tool.persona.role].pop(0) if by_role.get(tool.persona.role) else None
+                for tool in targets
+            ]
+
+        activities_field = result.get("activities")
+        if isinstance(activities_field, list):
+            activities = [str(item) for item in activities_field if item]
+        elif activities_field:
+            activities = [str(activities_field)]
+        else:
+            activities = None
+
+        replies: List[Optional[Dict[str, Any]]] = []
+        shared_applied = False
+        for entry in matched:
+            if entry is None:
+                replies.append(None)
+                continue
+            reply = {"message": str(entry["message"]), "destination": None, "activities": None, "plan_response": None}
+            # 行き先・アクティビティ・計画への返答は最初のメンバーの応答として一度だけ反映
+            if not shared_applied:
+                reply.update({
+                    "destination": result.get("destination"),
+                    "activities": activities,
+                    "plan_response": result.get("plan_response"),
+                })
+                shared_applied = True
+            replies.append(reply)
+
+        if not shared_applied:
+            raise ValueError("有効な応答が含まれていません")
+        return replies
+
     def get_personas(self) -> List[Persona]:
         """全ての家族メンバーのペルソナを取得
 
@@ -7,8 +7,9 @@ import json
 import os
 import asyncio
 import re
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple
 from enum import Enum
 
 # Google ADK imports
@@ -29,7 +30,13 @@ from .profile_validation import (
     profile_is_complete,
     prune_empty_fields,
 )
+from .completion_gate import needs_unified_check
+from .reply_stream import EXTRACTION_DELIMITER, ReplyStreamSplitter, parse_json_object
+from .session_state import HeraSessionRegistry, HeraSessionState
 from agents.family.family_agent import FamilyAgent
+from utils.llm_gateway import get_llm_gateway
+from utils.session_manager import FileSessionManager
+from utils.session_layout import get_session_index, session_dir as sharded_session_dir
 
 FULL_WIDTH_DIGIT_MAP = str.maketrans({
     "０": "0",
@@ -45,6 +52,38 @@ FULL_WIDTH_DIGIT_MAP = str.maketrans({
 })
 
 
+# 返答生成プロンプトの出力形式（通常: JSON一括）
+HERA_JSON_OUTPUT_FORMAT = """【出力形式】
+以下のJSON形式で回答してください：
+
+```json
+{
+  "extracted_info": {
+    "field_name": "抽出された値",
+    ...
+  },
+  "response": "ユーザーへの温かい応答メッセージ（heraの人格を活かした自然な文章）"
+}
+```"""
+
+# 返答生成プロンプトの出力形式（ストリーミング: 返答本文を先に出力）
+HERA_STREAMING_OUTPUT_FORMAT = """【出力形式】
+まずユーザーへの温かい応答メッセージ（heraの人格を活かした自然な文章）をそのまま書いてください。
+応答メッセージを書き終えたら、改行して区切り行「{delimiter}」を1行だけ出力し、
+その後に抽出した情報をJSON形式で出力してください：
+
+（ユーザーへの応答メッセージ）
+{delimiter}
+```json
+{{
+  "field_name": "抽出された値",
+  ...
+}}
+```
+
+- 応答メッセージの中にJSONや区切り行を含めない"""
+
+
 class UserProfile(BaseModel):
     """ユーザープロファイル（Pydanticモデル）"""
     age: Optional[int] = Field(None, description="ユーザーの年齢")
@@ -77,8 +116,8 @@ class UserProfile(BaseModel):
     children_info: Optional[List[Dict[str, Any]]] = Field(None, description="子ども情報")
 
     # 画像関連フィールド
-    partner_image_path: Optional[str] = Field(None, description="パートナーの画像パス")
-    user_image_path: Optional[str] = Field(None, description="ユーザー画像パス")
+    partner_image_path: Optional[str] = Field(None, description="パートナーの画像のストレージ上のパス")
+    user_image_path: Optional[str] = Field(None, description="ユーザー画像のストレージ上のパス")
     children_images: Optional[List[Dict[str, str]]] = Field(None, description="子供の画像リスト")
 
     created_at: Optional[str] = Field(None, description="作成日時")
@@ -108,27 +147,33 @@ class ADKHeraAgent:
         self,
         gemini_api_key: str = None,
         session_manager=None,
+        job_queue=None,
         **kwargs
     ):
         self.gemini_api_key = gemini_api_key
-        self.session_manager = session_manager  # セッションマネージャーを保存
+        # セッションマネージャーを保存（未指定時はファイルベース）
+        self.session_manager = session_manager or FileSessionManager(get_sessions_dir(), index=get_session_index())
+        # 画像生成などの重い処理を登録するジョブキュー（未指定時はその場で実行）
+        self.job_queue = job_queue
         # ADK WebサーバーのベースURL（Dev UIが動いているURL）
         self.adk_base_url = os.getenv("ADK_BASE_URL", "http://127.0.0.1:8000")
 
         # ヘーラーの人格設定
         self.persona = HeraPersona()
 
-        # セッション管理
-        self.current_session = None
-        self.user_profile = UserProfile()
-        self.conversation_history = []
-        self.last_extracted_fields: Dict[str, Any] = {}
-        self._session_state = self.SessionState.COLLECTING
-        self._last_completion_result: Dict[str, Any] = {
-            "status": "INCOMPLETE",
-            "completion_message": None,
-            "remaining_missing": []
-        }
+        # セッション管理（session_id単位の状態はレジストリで保持し、
+        # 実行中のコルーチンにはContextVarで紐付ける）
+        self._sessions = HeraSessionRegistry(
+            factory=self._new_session_state,
+            loader=self._rehydrate_session_state,
+        )
+        self._active_state: ContextVar[Optional[HeraSessionState]] = ContextVar(
+            f"hera_session_state_{id(self)}", default=None
+        )
+        # run()を経由しない呼び出し（ADK Web UI等）用の状態
+        self._default_state = self._new_session_state(None)
+        # 実行中のバックグラウンド完了処理（GCされないよう参照を保持）
+        self._background_tasks: Set[asyncio.Task] = set()
 
         # 情報収集の進捗管理（必須項目定義）
         self.base_required_info = PROFILE_BASE_REQUIRED_FIELDS.copy()
@@ -194,6 +239,113 @@ class ADKHeraAgent:
         self.agent.sub_agents = [FamilyAgent]
         print("[SUCCESS] Familyエージェントをサブエージェントとして追加しました")
 
+    def _new_session_state(self, session_id: Optional[str]) -> HeraSessionState:
+        """空のセッション状態を生成"""
+        return HeraSessionState(
+            session_id=session_id,
+            user_profile=UserProfile(),
+            session_state=self.SessionState.COLLECTING,
+        )
+
+    def _rehydrate_session_state(self, state: HeraSessionState) -> None:
+        """永続化済みのプロファイルと会話履歴から状態を復元"""
+        data = self.session_manager.load_keys(
+            state.session_id,
+            ["user_profile", "conversation_history", "completion_job"],
+        ) or {}
+
+        profile_data = data.get("user_profile")
+        if isinstance(profile_data, dict) and profile_data:
+            state.user_profile = UserProfile(**profile_data)
+
+        history = data.get("conversation_history")
+        if isinstance(history, list):
+            state.conversation_history = history
+
+        completion_job = data.get("completion_job")
+        if isinstance(completion_job, dict):
+            state.completion_job = completion_job
+
+        if profile_is_complete(state.user_profile):
+            state.session_state = self.SessionState.COMPLETED
+            state.last_completion_result = {
+                "status": "COMPLETED",
+                "completion_message": None,
+                "remaining_missing": [],
+            }
+
+    @property
+    def _state(self) -> HeraSessionState:
+        """現在のコンテキストに紐付いたセッション状態"""
+        return self._active_state.get() or self._default_state
+
+    @property
+    def current_session(self) -> Optional[str]:
+        return self._state.session_id
+
+    @current_session.setter
+    def current_session(self, value: Optional[str]) -> None:
+        self._state.session_id = value
+
+    @property
+    def user_profile(self) -> UserProfile:
+        return self._state.user_profile
+
+    @user_profile.setter
+    def user_profile(self, value: UserProfile) -> None:
+        self._state.user_profile = value
+
+    @property
+    def conversation_history(self) -> List[Dict[str, Any]]:
+        return self._state.conversation_history
+
+    @conversation_history.setter
+    def conversation_history(self, value: List[Dict[str, Any]]) -> None:
+        self._state.conversation_history = value
+
+    @property
+    def last_extracted_fields(self) -> Dict[str, Any]:
+        return self._state.last_extracted_fields
+
+    @last_extracted_fields.setter
+    def last_extracted_fields(self, value: Dict[str, Any]) -> None:
+        self._state.last_extracted_fields = value
+
+    @property
+    def _session_state(self) -> "ADKHeraAgent.SessionState":
+        return self._state.session_state
+
+    @_session_state.setter
+    def _session_state(self, value: "ADKHeraAgent.SessionState") -> None:
+        self._state.session_state = value
+
+    @property
+    def _last_completion_result(self) -> Dict[str, Any]:
+        return self._state.last_completion_result
+
+    @_last_completion_result.setter
+    def _last_completion_result(self, value: Dict[str, Any]) -> None:
+        self._state.last_completion_result = value
+
+    async def _acquire_session_state(self, session_id: str) -> HeraSessionState:
+        """セッション状態を取得（復元のI/Oはループ外で実行）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._sessions.get, session_id)
+
+    def get_completion_job(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """メモリ上に保持しているセッションの完了処理ジョブの状態を取得"""
+        state = self._sessions.peek(session_id)
+        if state is None or state.completion_job is None:
+            return None
+        return dict(state.completion_job)
+
+    def get_conversation_history(self, session_id: str) -> List[Dict[str, Any]]:
+        """メモリ上に保持しているセッションの会話履歴を取得"""
+        state = self._sessions.peek(session_id)
+        if state is None:
+            return []
+        return list(state.conversation_history)
+
     @property
     def required_info(self) -> List[str]:
         """relationship_statusに応じた必須情報リストを返す
@@ -310,18 +462,15 @@ OK例: 関連する情報をまとめて聞く
         """エージェントのツールを取得（ディレクトリ作成付き）"""
         # セッションディレクトリの作成（確実に呼ばれる場所）
         try:
-            # 最新のセッションIDを取得
-            sessions_dir = get_sessions_dir()
-            if os.path.exists(sessions_dir):
-                existing_sessions = [d for d in os.listdir(sessions_dir) if os.path.isdir(os.path.join(sessions_dir, d))]
-                if existing_sessions:
-                    latest_session = max(existing_sessions)
-                    session_dir = os.path.join(sessions_dir, latest_session)
-                    if not os.path.exists(session_dir):
-                        print(f"[INFO] _get_agent_toolsでセッションディレクトリ作成: {latest_session}")
-                        os.makedirs(session_dir, exist_ok=True)
-                        os.makedirs(os.path.join(session_dir, 'photos'), exist_ok=True)
-                        self.current_session = latest_session
+            # 最新のセッションIDを取得（ディレクトリを走査せずセッションインデックスから引く）
+            latest_session = get_session_index().latest_session()
+            if latest_session:
+                session_dir = sharded_session_dir(get_sessions_dir(), latest_session)
+                if not os.path.exists(session_dir):
+                    print(f"[INFO] _get_agent_toolsでセッションディレクトリ作成: {latest_session}")
+                    os.makedirs(session_dir, exist_ok=True)
+                    os.makedirs(os.path.join(session_dir, 'photos'), exist_ok=True)
+                    self.current_session = latest_session
         except Exception as e:
             print(f"[WARN] _get_agent_toolsでのディレクトリ作成エラー: {e}")
 
@@ -350,13 +499,17 @@ OK例: 関連する情報をまとめて聞く
         """セッション開始（デバッグ強化版）"""
         print(f"[DEBUG] start_session開始: {session_id}")
 
-        self.current_session = session_id
-        self.user_profile = UserProfile()
-        self.conversation_history = []
-        self._session_state = self.SessionState.COLLECTING
+        # セッション状態を初期化して現在のコンテキストに紐付け
+        self._active_state.set(self._sessions.reset(session_id))
+
+        self._ensure_session_dirs(session_id)
 
-        # セッション用ディレクトリを事前に作成
-        session_dir = os.path.join(get_sessions_dir(), session_id)
+        # 初手の通常挨拶は表示順の混乱を避けるため無効化
+        return ""
+
+    def _ensure_session_dirs(self, session_id: str) -> None:
+        """セッション用ディレクトリを事前に作成"""
+        session_dir = sharded_session_dir(get_sessions_dir(), session_id)
         photos_dir = os.path.join(session_dir, "photos")
 
         print(f"[DEBUG] セッションディレクトリ: {session_dir}")
@@ -372,9 +525,6 @@ OK例: 関連する情報をまとめて聞く
         else:
             print(f"[DEBUG] ディレクトリは既に存在します")
 
-        # 初手の通常挨拶は表示順の混乱を避けるため無効化
-        return ""
-
 
     async def _generate_adk_response(self, user_message: str, progress: Dict[str, bool]) -> Dict[str, str]:
         """ADKエージェントを使用して応答を生成"""
@@ -492,7 +642,7 @@ JSONの外に余計なテキストを含めないでください。
 {{"user_personality_traits": "自由人", "children_info": "女の子一人欲しい"}}  ← 文字列になっているのでNG
 """
 
-            response = model.generate_content(prompt)
+            response = await get_llm_gateway().generate_content(model, prompt)
             response_text = response.text if hasattr(response, 'text') else str(response)
 
             print(f"[DEBUG] raw extraction response: {response_text}")
@@ -901,7 +1051,7 @@ JSONの外に余計なテキストを含めないでください。
 
             for attempt in range(max_retries):
                 try:
-                    response = model.generate_content(prompt)
+                    response = await get_llm_gateway().generate_content(model, prompt)
                     response_text = response.text if hasattr(response, 'text') else str(response)
                     print(f"[DEBUG] unified completion raw response: {response_text[:200]}...")
                     break  # 成功したらループを抜ける
@@ -1019,7 +1169,7 @@ JSONの外に余計なテキストを含めないでください。
 
 完了の場合は「COMPLETED」、未完了の場合は「INCOMPLETE」で回答してください。
 """
-            response = model.generate_content(prompt)
+            response = await get_llm_gateway().generate_content(model, prompt)
             response_text = response.text if hasattr(response, 'text') else str(response)
             is_completed = "COMPLETED" in response_text.upper()
 
@@ -1050,59 +1200,68 @@ JSONの外に余計なテキストを含めないでください。
             "timestamp": datetime.now().isoformat()
         })
 
-    async def _generate_hera_response_with_extraction(self, user_message: str) -> str:
-        """返答生成と情報抽出を統合したメソッド（heraの人格を活かした版）"""
-        try:
-            # セッションIDの設定とディレクトリ作成
-            if not self.current_session:
-                self.current_session = await self._get_latest_adk_session_id()
-
-            if self.current_session:
-                session_dir = os.path.join(get_sessions_dir(), self.current_session)
-                if not os.path.exists(session_dir):
-                    print(f"[INFO] 返答生成時にセッションディレクトリ作成: {self.current_session}")
-                    await self.start_session(self.current_session)
-
-            from google.generativeai import GenerativeModel
-            model = GenerativeModel('gemini-2.5-pro')
-
-            # 現在のプロファイル情報を取得
-            formatted_profile = await self._format_collected_info()
-            missing_fields = compute_missing_fields(self.user_profile)
-
-            # 不足項目の説明を生成
-            missing_fields_text = "\n".join([
-                f"- {self._describe_missing_detail(field)} ({field})"
-                for field in missing_fields
-            ]) if missing_fields else "- （不足はありません）"
+    async def _prepare_response_generation(self, user_message: str, streaming: bool = False) -> Tuple[Any, str]:
+        """返答生成用のモデルとプロンプトを準備
 
-            goal_lines: List[str] = []
-            if {"age", "gender", "relationship_status"} & set(missing_fields):
-                goal_lines.append("- 年齢・性別・交際状況をまとめて確認する")
-            if "location" in missing_fields:
-                goal_lines.append("- お住まいの地域を丁寧に尋ねる")
-            if "income_range" in missing_fields:
-                goal_lines.append("- 年収の目安（例: 300万円程度）を尋ねる")
-            if "user_personality_traits" in missing_fields:
-                goal_lines.append("- あなた自身の性格や強みを掘り下げる（ビッグファイブを意識）")
-            if "partner_face_description" in missing_fields:
-                goal_lines.append("- パートナーの外見描写を具体的に引き出す")
-            if any(field in missing_fields for field in ("ideal_partner", "current_partner")):
-                goal_lines.append("- パートナーの性格や外見をまとめて尋ねる")
-            if "children_info" in missing_fields:
-                goal_lines.append("- 希望するお子さんの人数や性別を尋ねる")
-            if not goal_lines:
-                goal_lines.append("- 必須項目は揃っているため、感謝を伝えつつ次のステップを案内する")
-            goals_text = "\n".join(goal_lines)
+        Args:
+            streaming: Trueの場合、返答本文を先に出力し、区切り行の後に抽出情報を出力させる
+        """
+        # セッションIDの設定とディレクトリ作成
+        if not self.current_session:
+            self.current_session = await self._get_latest_adk_session_id()
+
+        if self.current_session:
+            session_dir = sharded_session_dir(get_sessions_dir(), self.current_session)
+            if not os.path.exists(session_dir):
+                print(f"[INFO] 返答生成時にセッションディレクトリ作成: {self.current_session}")
+                self._ensure_session_dirs(self.current_session)
+
+        from google.generativeai import GenerativeModel
+        model = GenerativeModel('gemini-2.5-pro')
+
+        # 現在のプロファイル情報を取得
+        formatted_profile = await self._format_collected_info()
+        missing_fields = compute_missing_fields(self.user_profile)
+
+        # 不足項目の説明を生成
+        missing_fields_text = "\n".join([
+            f"- {self._describe_missing_detail(field)} ({field})"
+            for field in missing_fields
+        ]) if missing_fields else "- （不足はありません）"
+
+        goal_lines: List[str] = []
+        if {"age", "gender", "relationship_status"} & set(missing_fields):
+            goal_lines.append("- 年齢・性別・交際状況をまとめて確認する")
+        if "location" in missing_fields:
+            goal_lines.append("- お住まいの地域を丁寧に尋ねる")
+        if "income_range" in missing_fields:
+            goal_lines.append("- 年収の目安（例: 300万円程度）を尋ねる")
+        if "user_personality_traits" in missing_fields:
+            goal_lines.append("- あなた自身の性格や強みを掘り下げる（ビッグファイブを意識）")
+        if "partner_face_description" in missing_fields:
+            goal_lines.append("- パートナーの外見描写を具体的に引き出す")
+        if any(field in missing_fields for field in ("ideal_partner", "current_partner")):
+            goal_lines.append("- パートナーの性格や外見をまとめて尋ねる")
+        if "children_info" in missing_fields:
+            goal_lines.append("- 希望するお子さんの人数や性別を尋ねる")
+        if not goal_lines:
+            goal_lines.append("- 必須項目は揃っているため、感謝を伝えつつ次のステップを案内する")
+        goals_text = "\n".join(goal_lines)
+
+        # 会話の流れを考慮したコンテキスト
+        recent_history = (
+            self.conversation_history[-3:]
+            if len(self.conversation_history) > 3
+            else self.conversation_history
+        )
 
-            # 会話の流れを考慮したコンテキスト
-            recent_history = (
-                self.conversation_history[-3:]
-                if len(self.conversation_history) > 3
-                else self.conversation_history
-            )
+        output_format = (
+            HERA_STREAMING_OUTPUT_FORMAT.format(delimiter=EXTRACTION_DELIMITER)
+            if streaming
+            else HERA_JSON_OUTPUT_FORMAT
+        )
 
-            prompt = f"""
+        prompt = f"""
 あなたは{self.persona.name}（{self.persona.role}）です。
 
 基本情報：
@@ -1197,29 +1356,24 @@ JSONの外に余計なテキストを含めないでください。
 - 必要な情報が揃ったら「ありがとうございます。十分な情報が揃いました」と明確に伝える
 - 常に愛情深く、家族思いの神として振る舞う
 
-【出力形式】
-以下のJSON形式で回答してください：
-
-```json
-{{
-  "extracted_info": {{
-    "field_name": "抽出された値",
-    ...
-  }},
-  "response": "ユーザーへの温かい応答メッセージ（heraの人格を活かした自然な文章）"
-}}
-```
+{output_format}
 
 重要:
 - 抽出できた情報のみをJSON形式で返す
 - 性格特性は必ず0.0-1.0の数値の辞書形式で推定する
 - children_infoは必ず配列（[]）形式で返す
 - user_personality_traits は必ず辞書（{{}}）形式で返す
-- responseは固定文言ではなく、heraの人格と状況に応じた自然で温かい文章で返す
+- 応答メッセージは固定文言ではなく、heraの人格と状況に応じた自然で温かい文章で返す
 - ツール呼び出し（check_session_completion）を適切に使用してください
 """
+        return model, prompt
+
+    async def _generate_hera_response_with_extraction(self, user_message: str) -> str:
+        """返答生成と情報抽出を統合したメソッド（heraの人格を活かした版）"""
+        try:
+            model, prompt = await self._prepare_response_generation(user_message)
 
-            response = model.generate_content(prompt)
+            response = await get_llm_gateway().generate_content(model, prompt)
             response_text = response.text if hasattr(response, 'text') else str(response)
 
             # JSONを抽出
@@ -1228,13 +1382,7 @@ JSONの外に余計なテキストを含めないでください。
                 result = json.loads(json_match.group(0))
 
                 # 抽出された情報をプロファイルに反映
-                extracted_info = result.get("extracted_info", {})
-                print(f"[DEBUG] extracted_info from LLM: {extracted_info}")
-                if extracted_info:
-                    await self._update_user_profile(extracted_info)
-                    self.last_extracted_fields = extracted_info
-                else:
-                    print("[DEBUG] No extracted_info found in LLM response")
+                await self._apply_extracted_info(result.get("extracted_info", {}))
 
                 # heraの人格を活かした動的応答を返す
                 return result.get("response", "お話を伺いました。続きもぜひ教えてください。")
@@ -1247,6 +1395,53 @@ JSONの外に余計なテキストを含めないでください。
             # エラー時も固定文言ではなく、heraらしい応答
             return "申し訳ございません。もう一度お話ししていただけますか？"
 
+    async def _stream_hera_response_with_extraction(
+        self,
+        user_message: str,
+        on_token: Callable[[str], None],
+    ) -> str:
+        """返答本文を生成しながら on_token へ逐次渡し、最後に抽出情報を反映する
+
+        Returns:
+            str: 返答本文の全文
+        """
+        try:
+            model, prompt = await self._prepare_response_generation(user_message, streaming=True)
+
+            splitter = ReplyStreamSplitter()
+            async for chunk in get_llm_gateway().stream_content(model, prompt):
+                text = splitter.feed(chunk)
+                if text:
+                    on_token(text)
+            tail = splitter.finish()
+            if tail:
+                on_token(tail)
+
+            reply = splitter.reply
+            extracted_info = splitter.extracted_info()
+            if not splitter.found_delimiter:
+                # 区切り行がなく従来のJSON形式で返ってきた場合
+                legacy = parse_json_object(splitter.raw_text)
+                if "response" in legacy:
+                    reply = legacy.get("response") or ""
+                    extracted_info = legacy.get("extracted_info", {})
+
+            await self._apply_extracted_info(extracted_info)
+            return reply or "お話を伺いました。続きもぜひ教えてください。"
+
+        except Exception as e:
+            print(f"[ERROR] ストリーミング応答生成エラー: {e}")
+            return "申し訳ございません。もう一度お話ししていただけますか？"
+
+    async def _apply_extracted_info(self, extracted_info: Optional[Dict[str, Any]]) -> None:
+        """返答生成時に抽出された情報をプロファイルに反映"""
+        print(f"[DEBUG] extracted_info from LLM: {extracted_info}")
+        if extracted_info:
+            await self._update_user_profile(extracted_info)
+            self.last_extracted_fields = extracted_info
+        else:
+            print("[DEBUG] No extracted_info found in LLM response")
+
     async def _generate_hera_response(self, user_message: str) -> str:
         """ヘーラーエージェントの応答を生成（非推奨：_generate_hera_response_with_extractionを使用）"""
         try:
@@ -1336,7 +1531,7 @@ JSONの外に余計なテキストを含めないでください。
 ユーザーのメッセージに対して、{self.persona.name}として自然で温かく、かつ**効率的な**応答をしてください。
 """
 
-            response = model.generate_content(prompt)
+            response = await get_llm_gateway().generate_content(model, prompt)
             return response.text if hasattr(response, 'text') else str(response)
 
         except Exception as e:
@@ -1396,6 +1591,11 @@ JSONの外に余計なテキストを含めないでください。
             return None
 
 
+    async def _persist_session_data(self, data: Dict[str, Any]) -> None:
+        """セッションマネージャー経由で保存（I/Oはループ外で実行）"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.session_manager.save, self.current_session, data)
+
     async def _save_session_data(self) -> None:
         """セッションデータを保存"""
         if not self.current_session:
@@ -1404,27 +1604,19 @@ JSONの外に余計なテキストを含めないでください。
 
         print(f"[INFO] saving session data (session_id={self.current_session})")
 
-        # セッションディレクトリを取得（事前に作成済みを想定）
-        session_dir = os.path.join(get_sessions_dir(), self.current_session)
-
-        # ディレクトリの存在確認のみ（start_sessionで作成済み）
-        if not os.path.exists(session_dir):
-            print(f"[WARN] セッションディレクトリが存在しません: {session_dir}")
-            return
-
-        # ユーザープロファイルを保存
+        # ユーザープロファイルと会話履歴を保存
         profile_data = prune_empty_fields(self.user_profile.dict())
         print(f"[DEBUG] user profile persisted: {profile_data}")
-
-        with open(os.path.join(session_dir, "user_profile.json"), "w", encoding="utf-8") as f:
-            json.dump(profile_data, f, ensure_ascii=False, indent=2)
-
-        # 会話履歴を保存
         print(f"[DEBUG] conversation entries: {len(self.conversation_history)}")
-        with open(os.path.join(session_dir, "conversation_history.json"), "w", encoding="utf-8") as f:
-            json.dump(self.conversation_history, f, ensure_ascii=False, indent=2)
 
-        print(f"[INFO] session data saved: {session_dir}")
+        try:
+            await self._persist_session_data({
+                "user_profile": profile_data,
+                "conversation_history": list(self.conversation_history),
+            })
+            print(f"[INFO] session data saved: {self.current_session}")
+        except Exception as e:
+            print(f"[ERROR] セッションデータ保存エラー: {e}")
 
 
     async def _save_conversation_history(self) -> None:
@@ -1433,14 +1625,10 @@ JSONの外に余計なテキストを含めないでください。
             print("[WARN] セッションID未設定のため履歴保存をスキップ")
             return
 
-        session_dir = os.path.join(get_sessions_dir(), self.current_session)
-        if not os.path.exists(session_dir):
-            print(f"[WARN] セッションディレクトリが存在しません: {session_dir}")
-            return
-
         try:
-            with open(f"{session_dir}/conversation_history.json", "w", encoding="utf-8") as f:
-                json.dump(self.conversation_history, f, ensure_ascii=False, indent=2)
+            await self._persist_session_data({
+                "conversation_history": list(self.conversation_history),
+            })
             print(f"[DEBUG] 会話履歴を保存しました: {len(self.conversation_history)}件")
         except Exception as e:
             print(f"[ERROR] 会話履歴保存エラー: {e}")
@@ -1464,7 +1652,7 @@ JSONの外に余計なテキストを含めないでください。
         await self._save_session_data()
 
         # セッション情報を返す
-        session_dir = os.path.join(get_sessions_dir(), self.current_session)
+        session_dir = sharded_session_dir(get_sessions_dir(), self.current_session)
         session_info = {
             "session_id": self.current_session,
             "user_profile": self.user_profile.dict(),
@@ -1476,42 +1664,98 @@ JSONの外に余計なテキストを含めないでください。
         return session_info
 
     # ADKの標準フローに対応するメソッドを追加
-    async def run(self, message: str, session_id: str = None, **kwargs) -> str:
-        """ADKの標準runメソッド"""
+    async def run(
+        self,
+        message: str,
+        session_id: str = None,
+        defer_completion: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+        **kwargs
+    ) -> str:
+        """ADKの標準runメソッド
+
+        Args:
+            message: ユーザーメッセージ
+            session_id: セッションID
+            defer_completion: Trueの場合、返答を先に返し、完了判定・画像生成・保存は
+                バックグラウンドジョブとして継続する（状態は completion_job で参照）
+            on_token: 指定した場合、返答本文を生成しながら断片ごとに呼び出す（ストリーミング）
+        """
         print("[INFO] ADK runメソッドが呼び出されました")
         print(f"[DEBUG] メッセージ: {message}")
         print(f"[DEBUG] セッションID: {session_id}")
 
         try:
             # セッションIDの設定
-            if session_id:
-                self.current_session = session_id
-            elif not self.current_session:
-                self.current_session = await self._get_latest_adk_session_id()
-                if not self.current_session:
+            if not session_id:
+                session_id = self.current_session or await self._get_latest_adk_session_id()
+                if not session_id:
                     return json.dumps(self._wrap_response("セッションを開始できませんでした。"), ensure_ascii=False)
 
+            # セッション状態をこのターンに紐付け、同一セッションのターンは直列化する
+            state = await self._acquire_session_state(session_id)
+            token = self._active_state.set(state)
+            try:
+                async with state.lock:
+                    state.touch()
+                    return await self._run_turn(message, defer_completion=defer_completion, on_token=on_token)
+            finally:
+                self._active_state.reset(token)
+
+        except Exception as e:
+            print(f"[ERROR] runメソッドエラー: {e}")
+            # エラー時もheraらしい応答
+            error_response = "申し訳ございません。少し時間をいただけますか？"
+            return json.dumps(self._wrap_response(error_response), ensure_ascii=False)
+
+    async def _run_turn(
+        self,
+        message: str,
+        defer_completion: bool = False,
+        on_token: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """現在のセッション状態で1ターン分の処理を実行"""
+        try:
             # 会話履歴にユーザーメッセージを追加
             await self._add_to_history("user", message)
             await self._save_conversation_history()
 
             # 統合処理（情報抽出 + 返答生成）
-            print(f"[DEBUG] Calling _generate_hera_response_with_extraction for message: {message}")
-            response_text = await self._generate_hera_response_with_extraction(message)
-            print(f"[DEBUG] Response from _generate_hera_response_with_extraction: {response_text}")
+            if on_token is not None:
+                response_text = await self._stream_hera_response_with_extraction(message, on_token)
+            else:
+                print(f"[DEBUG] Calling _generate_hera_response_with_extraction for message: {message}")
+                response_text = await self._generate_hera_response_with_extraction(message)
+            print(f"[DEBUG] Hera response: {response_text}")
 
             # エージェントの応答を履歴に追加
             await self._add_to_history("hera", response_text)
             await self._save_conversation_history()
 
-            # メッセージは既に履歴へ登録済みなので、完了判定の評価のみ実行
-            completion_result = await self._evaluate_session_completion(
-                message,
-                user_message_already_logged=True,
-            )
+            completion_job: Optional[Dict[str, Any]] = None
+            # 統合完了チェックが不要なターン（completion gate）は、ジョブにせずこの場で判定する
+            if (
+                defer_completion
+                and self._session_state != self.SessionState.COMPLETED
+                and needs_unified_check(compute_missing_fields(self.user_profile), message)
+            ):
+                # 返答時点のプロファイルを保存し、完了判定以降はバックグラウンドで継続
+                await self._save_session_data()
+                completion_job = await self._start_completion_job(message)
+                completion_result = {
+                    "status": "PENDING",
+                    "completion_message": None,
+                    "remaining_missing": compute_missing_fields(self.user_profile),
+                }
+            else:
+                # メッセージは既に履歴へ登録済みなので、完了判定の評価のみ実行
+                completion_result = await self._evaluate_session_completion(
+                    message,
+                    user_message_already_logged=True,
+                )
 
-            # セッションデータを保存（プロファイル情報を含む）
-            await self._save_session_data()
+                # セッションデータを保存（プロファイル情報を含む）
+                await self._save_session_data()
 
             # レスポンスを返す
             payload = self._wrap_response(response_text)
@@ -1524,6 +1768,8 @@ JSONの外に余計なテキストを含めないでください。
                 "information_progress": build_information_progress(profile_snapshot),
                 "last_extracted_fields": self.last_extracted_fields,
             })
+            if completion_job is not None:
+                payload["completion_job"] = completion_job
             payload_json = json.dumps(payload, ensure_ascii=False)
 
             print(f"📤 レスポンス: {payload}")
@@ -1537,6 +1783,69 @@ JSONの外に余計なテキストを含めないでください。
             return json.dumps(self._wrap_response(error_response), ensure_ascii=False)
 
 
+    async def _start_completion_job(self, message: str) -> Dict[str, Any]:
+        """完了判定・画像生成・保存をバックグラウンドジョブとして開始"""
+        state = self._state
+        await self._update_completion_job(state, status="pending")
+
+        # タスクは現在のコンテキスト（セッション状態の紐付け）を引き継ぐ
+        task = asyncio.get_running_loop().create_task(self._run_completion_job(state, message))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return dict(state.completion_job)
+
+    async def _run_completion_job(self, state: HeraSessionState, message: str) -> None:
+        """バックグラウンドで完了判定を実行（同一セッションのターンとは直列化）"""
+        token = self._active_state.set(state)
+        try:
+            async with state.lock:
+                await self._update_completion_job(state, status="running")
+                try:
+                    result = await self._evaluate_session_completion(
+                        message,
+                        user_message_already_logged=True,
+                    )
+                    await self._save_session_data()
+                    await self._update_completion_job(
+                        state,
+                        status="failed" if result.get("status") == "ERROR" else "completed",
+                        result={
+                            "session_status": result.get("status", "INCOMPLETE"),
+                            "completion_message": result.get("completion_message"),
+                            "missing_fields": result.get("remaining_missing", []),
+                        },
+                        error=result.get("error"),
+                    )
+                except Exception as e:
+                    print(f"[ERROR] バックグラウンド完了処理エラー: {e}")
+                    await self._update_completion_job(state, status="failed", error=str(e))
+        finally:
+            self._active_state.reset(token)
+
+    async def _update_completion_job(
+        self,
+        state: HeraSessionState,
+        *,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """完了処理ジョブの状態を更新して保存"""
+        job: Dict[str, Any] = {
+            "status": status,
+            "updated_at": datetime.now().isoformat(),
+        }
+        if result is not None:
+            job["result"] = result
+        if error:
+            job["error"] = error
+        state.completion_job = job
+
+        try:
+            await self._persist_session_data({"completion_job": job})
+        except Exception as e:
+            print(f"[WARN] 完了処理ジョブの状態保存に失敗しました: {e}")
+
     async def _evaluate_session_completion(
         self,
         user_message: Optional[str],
@@ -1570,13 +1879,25 @@ JSONの外に余計なテキストを含めないでください。
                     return result
                 self.current_session = latest_sid
                 print(f"[INFO] 完了評価側でセッションID設定: {self.current_session}")
-                session_dir = os.path.join(get_sessions_dir(), self.current_session)
-                if not os.path.exists(session_dir):
-                    await self.start_session(self.current_session)
+                self._ensure_session_dirs(self.current_session)
 
             # 不足フィールドを特定
             missing_fields = compute_missing_fields(self.user_profile)
 
+            # 完了済み、または不足が多く終了の意図もないターンは統合完了チェックを省略し、
+            # 返答生成時の抽出結果をそのまま使う
+            if self._session_state == self.SessionState.COMPLETED:
+                print("[INFO] completion gate: 完了済みのため統合完了チェックを省略")
+                result["status"] = "COMPLETED"
+                result["remaining_missing"] = missing_fields
+                self._last_completion_result = dict(result)
+                return result
+            if not needs_unified_check(missing_fields, sanitized_message):
+                print(f"[INFO] completion gate: 不足{len(missing_fields)}項目のため統合完了チェックを省略")
+                result["remaining_missing"] = missing_fields
+                self._last_completion_result = dict(result)
+                return result
+
             # 統合完了チェック（1回のLLM呼び出しで抽出・判定・メッセージ生成）
             unified_result = await self._unified_completion_check(sanitized_message, missing_fields)
 
@@ -1605,7 +1926,7 @@ JSONの外に余計なテキストを含めないでください。
                 print("[INFO] session completion confirmed")
                 result["status"] = "COMPLETED"
                 if self._session_state != self.SessionState.COMPLETED:
-                    await self._generate_family_images()
+                    await self._schedule_family_images()
                     if completion_message:
                         await self._add_to_history("hera", completion_message)
                         await self._save_conversation_history()
@@ -1648,8 +1969,48 @@ JSONの外に余計なテキストを含めないでください。
             return f"完了判定中にエラーが発生しました: {error_message}"
         return "INCOMPLETE"
 
-    async def _generate_family_images(self):
-        """家族の画像を生成（修正版）"""
+    async def _schedule_family_images(self) -> None:
+        """家族画像の生成をジョブキューに登録（キュー未設定時はこの場で生成）"""
+        if self.job_queue is None:
+            await self._generate_family_images()
+            return
+
+        session_id = self.current_session
+        try:
+            loop = asyncio.get_running_loop()
+            job = await loop.run_in_executor(None, self.job_queue.enqueue, session_id, "family_images")
+            print(f"[INFO] 家族画像生成をジョブとして登録: {job.job_id} ({job.status})")
+        except Exception as e:
+            print(f"[WARN] 家族画像生成ジョブの登録に失敗したため同期生成します: {e}")
+            await self._generate_family_images()
+
+    async def generate_family_images(self, session_id: str) -> Dict[str, Any]:
+        """指定セッションの家族画像を生成して保存（ジョブキューのハンドラー用）
+
+        Returns:
+            Dict[str, Any]: 生成された画像パス
+        """
+        state = await self._acquire_session_state(session_id)
+        token = self._active_state.set(state)
+        try:
+            async with state.lock:
+                state.touch()
+                await self._generate_family_images(raise_on_error=True)
+                await self._save_session_data()
+                return {
+                    "partner_image_path": self.user_profile.partner_image_path,
+                    "user_image_path": self.user_profile.user_image_path,
+                    "children_images": self.user_profile.children_images or [],
+                }
+        finally:
+            self._active_state.reset(token)
+
+    async def _generate_family_images(self, raise_on_error: bool = False):
+        """家族の画像を生成（修正版）
+
+        Args:
+            raise_on_error: Trueの場合、エラーを呼び出し元（ジョブのリトライ）に伝える
+        """
         try:
             from .image_generator import FamilyImageGenerator
 
@@ -1695,6 +2056,8 @@ JSONの外に余計なテキストを含めないでください。
             import traceback
             traceback.print_exc()
             # エラーでもセッションは完了として扱う
+            if raise_on_error:
+                raise
 
 
 # ADK用のエクスポート関数
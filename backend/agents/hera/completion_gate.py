@@ -0,0 +1,64 @@
+"""Heraの完了判定ゲート
+
+統合完了チェック（2回目のLLM呼び出し）が必要なターンかどうかを、
+不足フィールド数と早期終了の意図からローカルに判定する。
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Optional, Sequence
+
+
+# 「これで十分」など、ユーザーがヒアリングの終了を示唆する表現
+EARLY_FINISH_PATTERNS: Sequence[str] = (
+    r"(これ|それ|今)で(十分|じゅうぶん|充分|全部|ぜんぶ|いい|OK|おっけー)",
+    r"もう(十分|じゅうぶん|充分|いい|大丈夫|ない)",
+    r"(?<![0-9０-９一二三四五六七八九十百千万人歳円])以上(です|で|だ)",
+    r"(終わり|おわり|終了)(に|で|です|にし)",
+    r"(次|つぎ)に?(進|すす)",
+    r"(家族|かぞく)と(話|はな|会話)",
+    r"(始|はじ)めて(ください|ほしい|いい)",
+    r"(他|ほか)に(は)?(ない|ありません|特に)",
+    r"特に(ない|ありません)",
+)
+
+_EARLY_FINISH_RE = re.compile("|".join(f"(?:{pattern})" for pattern in EARLY_FINISH_PATTERNS), re.IGNORECASE)
+
+
+def has_finish_intent(message: Optional[str]) -> bool:
+    """ユーザーが情報収集の終了を示唆しているか"""
+    if not message:
+        return False
+    return bool(_EARLY_FINISH_RE.search(message))
+
+
+def needs_unified_check(
+    missing_fields: Sequence[str],
+    message: Optional[str],
+    max_missing: Optional[int] = None,
+) -> bool:
+    """統合完了チェックを実行すべきかを判定
+
+    Args:
+        missing_fields: 1回目の抽出を反映した後の不足フィールド
+        message: ユーザーの最新メッセージ
+        max_missing: この数以下の不足なら実行する
+                     （デフォルト: HERA_COMPLETION_CHECK_MAX_MISSING or 2）
+
+    Returns:
+        bool: 不足がない/残りわずか/終了の意図がある場合にTrue
+    """
+    if max_missing is None:
+        max_missing = int(os.getenv("HERA_COMPLETION_CHECK_MAX_MISSING", "2"))
+    if len(missing_fields) <= max_missing:
+        return True
+    return has_finish_intent(message)
+
+
+__all__ = [
+    "EARLY_FINISH_PATTERNS",
+    "has_finish_intent",
+    "needs_unified_check",
+]
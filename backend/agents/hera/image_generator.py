@@ -1,29 +1,48 @@
 """
 家族画像生成サービス
 Gemini 2.5 Flash Imageを使用して家族の画像を生成する
+
+- 両親の画像は1度だけ読み込んでPNGへ変換し、子供全員の生成で使い回す
+- 子供の画像は IMAGE_GENERATION_CONCURRENCY 件まで並行して生成する
+  （ブロッキングなSDK呼び出しはLLMゲートウェイのスレッドプールで実行）
+- 生成した画像は StorageManager 経由で保存し、ストレージ上のパス（例: photos/partner.png）を返す
 """
-import base64
-import os
 import asyncio
-from typing import List, Dict, Optional
-from PIL import Image
 import io
+import mimetypes
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
 from google import genai
 import sys
 
 # プロジェクトルートをパスに追加
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
-from config import get_sessions_dir
+from utils.async_storage import AsyncStorageManager, get_async_storage_manager
+from utils.llm_gateway import get_llm_gateway
+
+
+IMAGE_MODEL = "gemini-2.5-flash-image-preview"
+# 子供の画像を並行して生成する上限
+IMAGE_GENERATION_CONCURRENCY = int(os.getenv('IMAGE_GENERATION_CONCURRENCY', '3'))
+USER_IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png')
 
 
 class FamilyImageGenerator:
     """家族画像生成クラス"""
 
-    def __init__(self):
+    def __init__(self, storage: Optional[AsyncStorageManager] = None, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            storage: 画像の読み書きに使うストレージ（デフォルト: get_async_storage_manager()）
+            max_concurrency: 同時に生成する画像の上限（デフォルト: IMAGE_GENERATION_CONCURRENCY）
+        """
         self.gemini_api_key = os.getenv('GEMINI_API_KEY')
         if not self.gemini_api_key:
             raise ValueError("GEMINI_API_KEY環境変数が設定されていません")
         self.client = genai.Client(api_key=self.gemini_api_key)
+        self.storage = storage or get_async_storage_manager()
+        self.max_concurrency = max_concurrency or IMAGE_GENERATION_CONCURRENCY
         self.current_session = None
 
     async def generate_partner_image(self, ideal_partner: dict) -> str:
@@ -45,8 +64,7 @@ class FamilyImageGenerator:
         print(f"[INFO] パートナー画像生成開始: {appearance[:50]}...")
 
         try:
-            # Gemini 2.5 Flash Imageで画像生成
-            partner_image_path = await self._generate_image_with_gemini_flash(prompt, "partner")
+            partner_image_path = await self._generate_image([prompt], "partner")
             print(f"[INFO] パートナー画像生成完了: {partner_image_path}")
             return partner_image_path
         except Exception as e:
@@ -54,150 +72,94 @@ class FamilyImageGenerator:
             raise
 
     async def get_user_image_path(self, session_id: str) -> Optional[str]:
-        """既存のユーザー画像パスを取得"""
-        photos_dir = os.path.join(get_sessions_dir(), session_id, "photos")
-
-        if not os.path.exists(photos_dir):
-            print(f"[WARN] ユーザー画像ディレクトリが存在しません: {photos_dir}")
-            return None
-
-        # ユーザー画像ファイルを探す
-        for ext in ['jpg', 'jpeg', 'png']:
-            user_image_path = os.path.join(photos_dir, f"user.{ext}")
-            if os.path.exists(user_image_path):
+        """既存のユーザー画像のストレージ上のパスを取得"""
+        for ext in USER_IMAGE_EXTENSIONS:
+            user_image_path = f"photos/user.{ext}"
+            info = await self.storage.stat_file(session_id, user_image_path)
+            if info is not None:
                 print(f"[INFO] ユーザー画像を発見: {user_image_path}")
                 return user_image_path
 
-        print(f"[WARN] ユーザー画像が見つかりません: {photos_dir}")
+        print(f"[WARN] ユーザー画像が見つかりません: {session_id}")
         return None
 
     async def generate_children_images(self, children_info: List[Dict],
                                      partner_image_path: str, user_image_path: str) -> List[Dict]:
-        """子供の画像生成（両親の画像をインプットとして使用）"""
-        children_images = []
+        """子供の画像生成（両親の画像をインプットとして使用）
 
+        両親の画像は1度だけ読み込み、子供ごとの生成は並行して行う。
+        失敗した子供は結果から除く。
+        """
         print(f"[INFO] 子供画像生成開始: {len(children_info)}名")
 
-        for child in children_info:
+        user_image_bytes, partner_image_bytes = await self._load_parent_images(user_image_path, partner_image_path)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def generate(child: Dict) -> Optional[Dict]:
+            prompt = f"""
+            以下の2枚の画像の人物を親とする{child['desired_gender']}の子の肖像画を生成してください：
+            - 名前: {child['name']}
+            - 性別: {child['desired_gender']}
+            - 両親の特徴を自然に組み合わせた顔立ちで描いてください
+
+            元気で可愛らしい表情で、家族写真に適した自然な笑顔で描いてください。
+            高品質で写実的なスタイルで。
+            """
+            contents = [
+                prompt,
+                {"inline_data": {"mime_type": "image/png", "data": user_image_bytes}},
+                {"inline_data": {"mime_type": "image/png", "data": partner_image_bytes}},
+            ]
             try:
-                # 両親の画像を読み込み
-                user_image = Image.open(user_image_path)
-                partner_image = Image.open(partner_image_path)
-
-                # プロンプト作成
-                prompt = f"""
-                以下の2枚の画像の人物を親とする{child['desired_gender']}の子の肖像画を生成してください：
-                - 名前: {child['name']}
-                - 性別: {child['desired_gender']}
-                - 両親の特徴を自然に組み合わせた顔立ちで描いてください
-
-                元気で可愛らしい表情で、家族写真に適した自然な笑顔で描いてください。
-                高品質で写実的なスタイルで。
-                """
-
-                # Gemini 2.5 Flash Imageでマルチモーダル画像生成
-                child_image_path = await self._generate_image_with_parents(
-                    prompt,
-                    user_image,
-                    partner_image,
-                    f"child_{child['name']}"
-                )
-
-                children_images.append({
-                    'name': child['name'],
-                    'gender': child['desired_gender'],
-                    'image_path': child_image_path
-                })
-
-                print(f"[INFO] 子供画像生成完了: {child['name']} -> {child_image_path}")
-
+                async with semaphore:
+                    child_image_path = await self._generate_image(contents, f"child_{child['name']}")
             except Exception as e:
                 print(f"[ERROR] 子供画像生成エラー ({child['name']}): {e}")
-                # エラーでも続行
-                continue
-
-        return children_images
-
-    async def _generate_image_with_parents(self, prompt: str, user_image: Image.Image,
-                                         partner_image: Image.Image, filename: str) -> str:
-        """両親の画像をインプットとして使用して子供の画像を生成"""
-        try:
-            print(f"[DEBUG] Gemini Flash Imageマルチモーダル生成開始: {filename}")
-
-            # 画像をバイト配列に変換
-            user_buffer = io.BytesIO()
-            user_image.save(user_buffer, format='PNG')
-            user_image_bytes = user_buffer.getvalue()
-
-            partner_buffer = io.BytesIO()
-            partner_image.save(partner_buffer, format='PNG')
-            partner_image_bytes = partner_buffer.getvalue()
-
-            # Gemini 2.5 Flash Imageでマルチモーダル画像生成
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash-image-preview",
-                contents=[
-                    prompt,
-                    {"inline_data": {"mime_type": "image/png", "data": user_image_bytes}},
-                    {"inline_data": {"mime_type": "image/png", "data": partner_image_bytes}}
-                ]
-            )
-
-            print(f"[DEBUG] Gemini Flash Imageマルチモーダルレスポンス受信")
-
-            # セッションディレクトリに保存
-            session_dir = os.path.join(get_sessions_dir(), self.current_session, "photos")
-            os.makedirs(session_dir, exist_ok=True)
-
-            image_path = os.path.join(session_dir, f"{filename}.jpg")
-
-            # レスポンスから画像データを抽出
-            for part in response.candidates[0].content.parts:
-                if part.inline_data is not None:
-                    # 画像データを保存
-                    image_data = part.inline_data.data
-                    with open(image_path, "wb") as f:
-                        f.write(image_data)
-
-                    print(f"[INFO] マルチモーダル画像保存完了: {image_path} ({len(image_data)} bytes)")
-                    return image_path
-                elif part.text is not None:
-                    print(f"[DEBUG] テキストレスポンス: {part.text}")
-
-            raise Exception("画像データが見つかりませんでした")
-
-        except Exception as e:
-            print(f"[ERROR] Gemini Flash Imageマルチモーダル生成エラー: {e}")
-            import traceback
-            traceback.print_exc()
-            raise
-
-    async def _generate_image_with_gemini_flash(self, prompt: str, filename: str) -> str:
-        """Gemini 2.5 Flash Imageを使用して画像を生成"""
+                # エラーでも他の子供の生成は続行
+                return None
+
+            print(f"[INFO] 子供画像生成完了: {child['name']} -> {child_image_path}")
+            return {
+                'name': child['name'],
+                'gender': child['desired_gender'],
+                'image_path': child_image_path
+            }
+
+        results = await asyncio.gather(*(generate(child) for child in children_info))
+        return [result for result in results if result is not None]
+
+    async def _load_parent_images(self, user_image_path: str, partner_image_path: str) -> Tuple[bytes, bytes]:
+        """両親の画像をストレージから読み込み、PNGに変換（子供全員の生成で共有する）"""
+        files = await self.storage.load_files(self.current_session, [user_image_path, partner_image_path])
+        loop = asyncio.get_running_loop()
+        encoded = []
+        for path in (user_image_path, partner_image_path):
+            if files.get(path) is None:
+                raise FileNotFoundError(f"親の画像が見つかりません: {path}")
+            encoded.append(await loop.run_in_executor(None, _to_png, files[path]))
+        return encoded[0], encoded[1]
+
+    async def _generate_image(self, contents: List[Any], filename: str) -> str:
+        """Gemini 2.5 Flash Imageで画像を生成し、ストレージに保存してパスを返す"""
         try:
             print(f"[DEBUG] Gemini Flash Image生成開始: {filename}")
 
-            # Gemini 2.5 Flash Imageで画像生成
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash-image-preview",
-                contents=[prompt]
+            # ブロッキングなSDK呼び出しはゲートウェイのスレッドプールで実行
+            response = await get_llm_gateway().run(
+                self.client.models.generate_content,
+                model=IMAGE_MODEL,
+                contents=contents
             )
 
-            print(f"[DEBUG] Gemini Flash Imageレスポンス受信")
-
-            # セッションディレクトリに保存
-            session_dir = os.path.join(get_sessions_dir(), self.current_session, "photos")
-            os.makedirs(session_dir, exist_ok=True)
-
-            image_path = os.path.join(session_dir, f"{filename}.jpg")
+            print(f"[DEBUG] Gemini Flash Imageレスポンス受信: {filename}")
 
             # レスポンスから画像データを抽出
             for part in response.candidates[0].content.parts:
                 if part.inline_data is not None:
-                    # 画像データを保存
                     image_data = part.inline_data.data
-                    with open(image_path, "wb") as f:
-                        f.write(image_data)
+                    ext = mimetypes.guess_extension(part.inline_data.mime_type or '') or '.jpg'
+                    image_path = f"photos/{filename}{ext}"
+                    await self.storage.save_file(self.current_session, image_path, image_data)
 
                     print(f"[INFO] 画像保存完了: {image_path} ({len(image_data)} bytes)")
                     return image_path
@@ -211,3 +173,10 @@ class FamilyImageGenerator:
             import traceback
             traceback.print_exc()
             raise
+
+
+def _to_png(image_data: bytes) -> bytes:
+    """画像データをPNGに変換"""
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(image_data)).save(buffer, format='PNG')
+    return buffer.getvalue()
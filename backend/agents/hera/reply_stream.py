@@ -0,0 +1,98 @@
+"""Heraのストリーミング返答の分割
+
+ストリーミング時は「返答本文 → 区切り行 → 抽出情報JSON」の順で出力させ、
+区切り行より前の本文だけを逐次クライアントへ流す。
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List
+
+
+EXTRACTION_DELIMITER = "<<<EXTRACTED_INFO>>>"
+
+
+class ReplyStreamSplitter:
+    """LLMのストリーム出力を返答本文と抽出ブロックに分ける
+
+    区切り行がチャンクの境界をまたいでも本文に混ざらないよう、
+    区切り行の先頭と一致しうる末尾だけを次のチャンクまで保留する。
+    """
+
+    def __init__(self, delimiter: str = EXTRACTION_DELIMITER) -> None:
+        self.delimiter = delimiter
+        self.found_delimiter = False
+        self._pending = ""
+        self._reply_parts: List[str] = []
+        self._extraction_parts: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """チャンクを受け取り、クライアントへ流してよい本文を返す"""
+        if not chunk:
+            return ""
+        if self.found_delimiter:
+            self._extraction_parts.append(chunk)
+            return ""
+
+        text = self._pending + chunk
+        index = text.find(self.delimiter)
+        if index >= 0:
+            self.found_delimiter = True
+            self._pending = ""
+            self._extraction_parts.append(text[index + len(self.delimiter):])
+            emitted = text[:index]
+        else:
+            hold = self._partial_delimiter_length(text)
+            emitted = text[: len(text) - hold]
+            self._pending = text[len(text) - hold:]
+
+        self._reply_parts.append(emitted)
+        return emitted
+
+    def finish(self) -> str:
+        """ストリーム終了時に保留中の本文を返す"""
+        remaining, self._pending = self._pending, ""
+        if remaining:
+            self._reply_parts.append(remaining)
+        return remaining
+
+    @property
+    def reply(self) -> str:
+        """これまでに受け取った返答本文"""
+        return "".join(self._reply_parts).strip()
+
+    @property
+    def raw_text(self) -> str:
+        """区切り行を除いた出力全体"""
+        return "".join(self._reply_parts) + "".join(self._extraction_parts)
+
+    def extracted_info(self) -> Dict[str, Any]:
+        """抽出ブロックのJSONを辞書で返す（解析できなければ空の辞書）"""
+        return parse_json_object("".join(self._extraction_parts))
+
+    def _partial_delimiter_length(self, text: str) -> int:
+        for length in range(min(len(self.delimiter) - 1, len(text)), 0, -1):
+            if self.delimiter.startswith(text[-length:]):
+                return length
+        return 0
+
+
+def parse_json_object(text: str) -> Dict[str, Any]:
+    """テキスト中の最初のJSONオブジェクトを辞書で返す"""
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        value = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+__all__ = [
+    "EXTRACTION_DELIMITER",
+    "ReplyStreamSplitter",
+    "parse_json_object",
+]
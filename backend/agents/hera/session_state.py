@@ -0,0 +1,166 @@
+"""
+ヘーラーエージェントのセッション単位の状態管理
+
+ADKHeraAgentは1プロセスで1インスタンスを共有するため、会話ごとの
+プロファイル・会話履歴・完了状態はここで session_id 単位に保持する。
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class HeraSessionState:
+    """1セッション分のヒアリング状態"""
+
+    session_id: Optional[str]
+    user_profile: Any
+    session_state: Any
+    conversation_history: List[Dict[str, Any]] = field(default_factory=list)
+    last_extracted_fields: Dict[str, Any] = field(default_factory=dict)
+    last_completion_result: Dict[str, Any] = field(default_factory=lambda: {
+        "status": "INCOMPLETE",
+        "completion_message": None,
+        "remaining_missing": [],
+    })
+    # バックグラウンドの完了処理ジョブの状態（status, result, error, updated_at）
+    completion_job: Optional[Dict[str, Any]] = None
+    last_access: float = field(default_factory=time.monotonic)
+    # 同一セッションのターンを直列化するためのロック
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False, compare=False)
+
+    def touch(self) -> None:
+        """最終アクセス時刻を更新"""
+        self.last_access = time.monotonic()
+
+
+class HeraSessionRegistry:
+    """session_idをキーにしたHeraSessionStateのLRUレジストリ
+
+    - max_sessions を超えると最も古いセッションから破棄
+    - idle_ttl 秒アクセスのないセッションは破棄
+    - 未登録のセッションは loader で永続化データから復元（遅延再水和）
+
+    破棄されたセッションも永続化済みのため、次回アクセス時に復元される。
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], HeraSessionState],
+        loader: Optional[Callable[[HeraSessionState], None]] = None,
+        max_sessions: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+    ):
+        """
+        Args:
+            factory: 空のセッション状態を生成する関数
+            loader: 永続化データから状態を復元する関数（任意）
+            max_sessions: 保持する最大セッション数（デフォルト: HERA_SESSION_CACHE_SIZE or 512）
+            idle_ttl: 無操作で破棄するまでの秒数（デフォルト: HERA_SESSION_IDLE_TTL or 1800）
+        """
+        self._factory = factory
+        self._loader = loader
+        self.max_sessions = max_sessions if max_sessions is not None else int(
+            os.getenv('HERA_SESSION_CACHE_SIZE', '512')
+        )
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(
+            os.getenv('HERA_SESSION_IDLE_TTL', '1800')
+        )
+        self._states: "OrderedDict[str, HeraSessionState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._states)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._states
+
+    def get(self, session_id: str) -> HeraSessionState:
+        """セッション状態を取得（未登録なら復元して登録）"""
+        with self._lock:
+            state = self._lookup_locked(session_id)
+            if state is not None:
+                return state
+
+        # 復元はI/Oを伴うためロック外で行う
+        state = self._factory(session_id)
+        if self._loader is not None:
+            try:
+                self._loader(state)
+            except Exception as e:
+                print(f"[WARN] セッション状態の復元に失敗しました ({session_id}): {e}")
+
+        with self._lock:
+            # 復元中に他スレッドが登録していればそちらを優先
+            existing = self._lookup_locked(session_id)
+            if existing is not None:
+                return existing
+            self._insert_locked(session_id, state)
+            return state
+
+    def reset(self, session_id: str) -> HeraSessionState:
+        """セッション状態を初期化して登録（復元は行わない）"""
+        state = self._factory(session_id)
+        with self._lock:
+            self._states.pop(session_id, None)
+            self._insert_locked(session_id, state)
+        return state
+
+    def peek(self, session_id: str) -> Optional[HeraSessionState]:
+        """登録済みのセッション状態を取得（復元・LRU更新なし）"""
+        with self._lock:
+            return self._states.get(session_id)
+
+    def discard(self, session_id: str) -> None:
+        """セッション状態を破棄"""
+        with self._lock:
+            self._states.pop(session_id, None)
+
+    def _lookup_locked(self, session_id: str) -> Optional[HeraSessionState]:
+        state = self._states.get(session_id)
+        if state is None:
+            return None
+        if self._is_expired(state, time.monotonic()):
+            del self._states[session_id]
+            return None
+        state.touch()
+        self._states.move_to_end(session_id)
+        return state
+
+    def _insert_locked(self, session_id: str, state: HeraSessionState) -> None:
+        state.touch()
+        self._states[session_id] = state
+        self._evict_locked()
+
+    def _is_expired(self, state: HeraSessionState, now: float) -> bool:
+        if self.idle_ttl <= 0 or state.lock.locked():
+            return False
+        return now - state.last_access > self.idle_ttl
+
+    def _evict_locked(self) -> None:
+        now = time.monotonic()
+        for session_id in [sid for sid, st in self._states.items() if self._is_expired(st, now)]:
+            del self._states[session_id]
+
+        if self.max_sessions <= 0:
+            return
+        # 処理中（ロック保持中）のセッションは破棄しない
+        for session_id in list(self._states.keys()):
+            if len(self._states) <= self.max_sessions:
+                break
+            if self._states[session_id].lock.locked():
+                continue
+            del self._states[session_id]
+
+
+__all__ = [
+    "HeraSessionRegistry",
+    "HeraSessionState",
+]
@@ -1,17 +1,22 @@
 import os
+import re
+import copy
 import uuid
 import json
+import mimetypes
 import asyncio
+import queue
 import threading
 from types import SimpleNamespace
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from config import get_sessions_dir
+from werkzeug.http import http_date
 from werkzeug.utils import secure_filename
 from flask import send_from_directory
 from agents.hera.adk_hera_agent import ADKHeraAgent
@@ -23,12 +28,16 @@ from agents.hera.profile_validation import (
 )
 from agents.family.persona_generator import PersonaGenerator
 from agents.family.tooling import FamilyToolSet
-from agents.family.story_generator import StoryGenerator
+from agents.family.router import SpeakerRouter
+from agents.family.story_generator import StoryGenerator, split_paragraphs
 from agents.family.letter_generator import LetterGenerator
 from utils.logger import setup_logger
 from utils.env_validator import validate_env
 from utils.session_manager import get_session_manager, SessionManager
+from utils.session_layout import session_dir as sharded_session_dir
 from utils.storage_manager import create_storage_manager, StorageManager
+from utils.async_storage import get_async_storage_manager
+from utils.job_queue import Job, JobQueue, create_job_queue
 from utils.auth_middleware import require_auth, optional_auth
 from api.firebase_config import initialize_firebase
 
@@ -88,9 +97,13 @@ os.makedirs(SESSIONS_DIR, exist_ok=True)
 try:
     session_mgr: SessionManager = get_session_manager()
     storage_mgr: StorageManager = create_storage_manager()
+    # 画像生成などの非同期処理も同じストレージを使う
+    get_async_storage_manager(storage_mgr)
     storage_mode = os.getenv('STORAGE_MODE', 'local').lower()
     logger.info(f"セッション管理初期化完了: {type(session_mgr).__name__}")
     logger.info(f"ストレージ管理初期化完了: {type(storage_mgr).__name__} (mode={storage_mode})")
+    # 重い生成処理はジョブキューで実行（ハンドラーは下部で登録して起動）
+    job_queue: JobQueue = create_job_queue(session_mgr)
 except Exception as e:
     logger.error(f"マネージャー初期化エラー: {e}")
     raise
@@ -98,15 +111,30 @@ except Exception as e:
 # Heraエージェントを初期化（session_managerを渡す）
 hera_agent = ADKHeraAgent(
     gemini_api_key=os.getenv("GEMINI_API_KEY"),
-    session_manager=session_mgr
+    session_manager=session_mgr,
+    job_queue=job_queue,
 )
 logger.info("ADK Heraエージェント初期化完了")
 
+# 返答を先に返し、完了判定・画像生成・保存をバックグラウンドで行うか
+HERA_DEFERRED_COMPLETION = os.getenv('HERA_DEFERRED_COMPLETION', 'true').lower() == 'true'
+
+# ストーリーがこの文字数まで生成されたら手紙の生成を開始（0で旅行情報のみから即開始）
+FAMILY_LETTER_STORY_PREFIX_CHARS = int(os.getenv('FAMILY_LETTER_STORY_PREFIX_CHARS', '400'))
+
+# 画像配信のCache-Control（通常はETagで再検証、内容のハッシュを含むURLは長期キャッシュ）
+PHOTO_CACHE_CONTROL = os.getenv('PHOTO_CACHE_CONTROL', 'private, no-cache')
+PHOTO_IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+# 内容のハッシュを含むファイル名（例: partner.3f2a9c0d1e4b5a67.png）
+CONTENT_ADDRESSED_FILENAME = re.compile(r'(^|[._-])[0-9a-f]{16,}\.[A-Za-z0-9]+$')
+# ストレージの署名付きURLへリダイレクトして画像を配信するか（対応していないストレージではAPIから配信）
+PHOTO_SIGNED_URL_REDIRECT = os.getenv('PHOTO_SIGNED_URL_REDIRECT', 'true').lower() == 'true'
+
 # Utility関数
 
 def session_path(session_id: str) -> str:
     """画像保存用のパス取得（後方互換性のため残す）"""
-    return os.path.join(SESSIONS_DIR, session_id)
+    return sharded_session_dir(SESSIONS_DIR, session_id)
 
 def load_file(path: str, default=None):
     """ファイルベースのデータ読み込み（後方互換性のため残す）"""
@@ -136,18 +164,46 @@ def save_session_data(session_id: str, key: str, data: Any) -> None:
 
 
 def load_session_data(session_id: str, key: str, default: Any = None) -> Any:
-    """セッションデータを読み込み（Redis/File自動切り替え）"""
+    """セッションデータを読み込み（Redis/File自動切り替え、指定キーのみ取得）"""
     try:
-        data = session_mgr.load(session_id)
-        if data and key in data:
-            logger.debug(f"セッションデータ読み込み: {session_id}/{key}")
-            return data[key]
-        return default
+        value = session_mgr.load_key(session_id, key, default)
+        logger.debug(f"セッションデータ読み込み: {session_id}/{key}")
+        return value
     except Exception as e:
         logger.error(f"セッションデータ読み込みエラー: {session_id}/{key} - {e}")
         return default
 
 
+def load_session_values(session_id: str, defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """複数のキーをまとめて読み込み（存在しないキーはdefaultsの値）"""
+    values = dict(defaults)
+    try:
+        data = session_mgr.load_keys(session_id, list(defaults.keys())) or {}
+        values.update(data)
+        logger.debug(f"セッションデータ読み込み: {session_id}/{','.join(data.keys())}")
+    except Exception as e:
+        logger.error(f"セッションデータ読み込みエラー: {session_id}/{','.join(defaults.keys())} - {e}")
+    return values
+
+
+def load_existing_session(session_id: str, defaults: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """存在確認と読み込みを1回で行う（セッションが存在しない場合はNone、存在しないキーはdefaultsの値）
+
+    読み込みエラー（タイムアウトを含む）は「存在しない」として404にしないよう、そのまま送出する。
+    """
+    try:
+        handle = session_mgr.get_or_none(session_id, list(defaults.keys()))
+    except Exception as e:
+        logger.error(f"セッションデータ読み込みエラー: {session_id}/{','.join(defaults.keys())} - {e}")
+        raise
+    if handle is None:
+        return None
+    values = dict(defaults)
+    values.update(handle.data)
+    logger.debug(f"セッションデータ読み込み: {session_id}/{','.join(handle.data.keys())}")
+    return values
+
+
 def session_exists(session_id: str) -> bool:
     """セッションが存在するか確認"""
     try:
@@ -157,12 +213,26 @@ def session_exists(session_id: str) -> bool:
         return False
 
 
+@app.teardown_request
+def flush_session_writes(exc):
+    """リクエスト終了時に、そのセッションでバッファされた書き込みを1回にまとめて反映"""
+    flush = getattr(session_mgr, 'flush', None)
+    session_id = (request.view_args or {}).get('session_id')
+    if flush is None or not session_id:
+        return
+    try:
+        flush(session_id)
+    except Exception as e:
+        logger.error(f"セッションデータ反映エラー: {session_id} - {e}")
+
+
 class FamilyConversationSession:
     """家族エージェントとの対話状態を管理"""
 
     def __init__(self, session_id: str):
         self.session_id = session_id
         self.toolset: Optional[FamilyToolSet] = None
+        self.router = SpeakerRouter()
         self.personas = []
         self.initialized = False
         self.user_profile: Dict[str, Any] = {}
@@ -176,19 +246,30 @@ class FamilyConversationSession:
             "family_plan_generated": False,
         }
         self.context = SimpleNamespace(state=self.state)
+        # ペルソナ生成ジョブと会話リクエストが同時に初期化しないよう直列化
+        self._init_lock = asyncio.Lock()
+        # 旅行計画の生成タスクと、その途中経過（SSE購読者が後から再生できるよう保持）
+        self._plan_task: Optional[asyncio.Task] = None
+        self._plan_events: List[Tuple[str, Dict[str, Any]]] = []
+        self._plan_signal = asyncio.Event()
         self._load_cached_state()
 
     def _load_cached_state(self) -> None:
         """既存の会話ログや旅行情報があれば読み込む（session_mgr使用）"""
-        cached_log = load_session_data(self.session_id, 'family_conversation', [])
+        cached = load_session_values(self.session_id, {
+            'family_conversation': [],
+            'family_trip_info': {},
+            'family_plan': None,
+        })
+        cached_log = cached['family_conversation']
         if isinstance(cached_log, list):
             self.state["family_conversation_log"] = cached_log
 
-        cached_trip = load_session_data(self.session_id, 'family_trip_info', {})
+        cached_trip = cached['family_trip_info']
         if isinstance(cached_trip, dict):
             self.state["family_trip_info"] = cached_trip
 
-        cached_plan = load_session_data(self.session_id, 'family_plan', None)
+        cached_plan = cached['family_plan']
         if isinstance(cached_plan, dict):
             self.state["family_plan_data"] = cached_plan
             self.state["family_plan_generated"] = True
@@ -199,16 +280,20 @@ class FamilyConversationSession:
         if self.initialized:
             return
 
-        profile = load_session_data(self.session_id, 'user_profile', {})
-        if not profile:
-            raise ValueError("ユーザープロファイルが見つからないため、家族会話を開始できません。")
-        self.user_profile = profile
+        async with self._init_lock:
+            if self.initialized:
+                return
+
+            profile = load_session_data(self.session_id, 'user_profile', {})
+            if not profile:
+                raise ValueError("ユーザープロファイルが見つからないため、家族会話を開始できません。")
+            self.user_profile = profile
 
-        generator = PersonaGenerator()
-        generated = await generator.generate_personas(profile)
-        self.personas = generator.build_persona_objects(generated)
-        self.toolset = FamilyToolSet(self.personas)
-        self.initialized = True
+            generator = PersonaGenerator()
+            generated = await generator.generate_personas(profile)
+            self.personas = generator.build_persona_objects(generated)
+            self.toolset = FamilyToolSet(self.personas)
+            self.initialized = True
 
     async def send_message(self, user_message: str) -> List[Dict[str, Any]]:
         """ユーザーメッセージに対して家族メンバーの発話を生成"""
@@ -225,57 +310,63 @@ class FamilyConversationSession:
         if not self.toolset:
             return responses
 
-        for family_tool in self.toolset.tools:
-            try:
-                result = await family_tool.tool.func(
-                    tool_context=self.context,
-                    input_text=user_message,
-                )
-                if result and result.get("message"):
-                    response_timestamp = datetime.now().isoformat()
-                    # ツール側で追加された最新ログにタイムスタンプを付与
-                    if self.state.get("family_conversation_log"):
-                        self.state["family_conversation_log"][-1]["timestamp"] = response_timestamp
-                    responses.append({
-                        "speaker": result.get("speaker", family_tool.persona.role),
-                        "message": result["message"],
-                        "timestamp": response_timestamp,
-                    })
-            except Exception as tool_error:
-                fallback_message = (
-                    "ごめんなさい、少し調子が悪いみたい。また後で話そうね。"
-                    f"（詳細: {tool_error}）"
-                )
-                error_entry = {
-                    "speaker": family_tool.persona.role,
-                    "message": fallback_message,
-                    "timestamp": datetime.now().isoformat(),
-                }
-                responses.append(error_entry)
-                log.append(error_entry)
-
-        await self._maybe_finalize_plan()
+        # 応答するメンバーをLLM呼び出し前に選び、並行生成してツール順（パートナー→子供）でログに反映
+        speakers = self.router.select(self.toolset.tools, self.state, user_message)
+        results = await self.toolset.respond_all(self.context, user_message, tools=speakers)
+        for result in results:
+            if result and result.get("message"):
+                responses.append({
+                    "speaker": result["speaker"],
+                    "message": result["message"],
+                    "timestamp": result.get("timestamp") or datetime.now().isoformat(),
+                })
 
         return responses
 
-    def persist(self) -> None:
-        """セッション状態を保存（session_mgr使用）"""
-        save_session_data(
-            self.session_id,
-            'family_conversation',
-            self.state.get("family_conversation_log", [])
-        )
-        save_session_data(
-            self.session_id,
-            'family_trip_info',
-            self.state.get("family_trip_info", {})
+    async def handle_message(self, user_message: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """発話を生成して保存し、返答と状態のスナップショットを返す（イベントループ上で実行）"""
+        replies = await self.send_message(user_message)
+        await self.persist()
+        return replies, await self.snapshot()
+
+    async def snapshot(self) -> Dict[str, Any]:
+        """状態のコピーを返す（self.state はイベントループ上でのみ触り、リクエストスレッドにはコピーを渡す）
+
+        Returns:
+            status() の内容と、計画の生成ジョブを登録すべきか（plan_ready）
+        """
+        snapshot = copy.deepcopy(self.status())
+        snapshot["plan_ready"] = bool(
+            self.state.get("family_plan_confirmed") and not self.state.get("family_plan_generated")
         )
+        return snapshot
+
+    def schedule_plan(self, plan_ready: bool) -> Optional[Job]:
+        """旅行計画が確定していれば、ストーリーと手紙の生成をジョブとして登録
+
+        Args:
+            plan_ready: snapshot() の plan_ready
+        """
+        if not plan_ready:
+            return None
+        return job_queue.enqueue(self.session_id, JOB_FAMILY_PLAN)
+
+    async def persist(self) -> None:
+        """セッション状態を保存（session_mgr使用）
+
+        保存する値はイベントループ上でコピーし、保存処理はスレッドプールで行う。
+        """
+        values = {
+            'family_conversation': copy.deepcopy(self.state.get("family_conversation_log", [])),
+            'family_trip_info': copy.deepcopy(self.state.get("family_trip_info", {})),
+        }
         if self.state.get("family_plan_data"):
-            save_session_data(
-                self.session_id,
-                'family_plan',
-                self.state["family_plan_data"]
-            )
+            values['family_plan'] = copy.deepcopy(self.state["family_plan_data"])
+        await asyncio.get_running_loop().run_in_executor(None, self._save_values, values)
+
+    def _save_values(self, values: Dict[str, Any]) -> None:
+        for key, value in values.items():
+            save_session_data(self.session_id, key, value)
 
     def status(self) -> Dict[str, Any]:
         return {
@@ -287,67 +378,163 @@ class FamilyConversationSession:
 
     async def _maybe_finalize_plan(self) -> None:
         """旅行計画が確定したタイミングでストーリーと手紙を生成"""
-        if self.state.get("family_plan_generated"):
+        task = self._ensure_plan_task()
+        if task is not None:
+            # 呼び出し元がキャンセルされても、SSE購読者のために生成は継続する
+            await asyncio.shield(task)
+
+    async def stream_plan(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """旅行計画の生成経過を (event, data) で順に返す
+
+        event:
+            story: {"index", "paragraph"} ストーリーの段落
+            letter: {"letter"} 手紙
+            done: {"family_plan"} 完成した計画
+            waiting: 計画が未確定で生成を開始できない
+            error: 生成に失敗
+        """
+        await self.initialize()
+
+        if self.state.get("family_plan_generated") and (self._plan_task is None or self._plan_task.done()):
+            for event in self._stored_plan_events():
+                yield event
             return
-        if not self.state.get("family_plan_confirmed"):
+
+        task = self._ensure_plan_task()
+        if task is None:
+            yield "waiting", {
+                "reason": "旅行計画がまだ確定していません",
+                "family_trip_info": self.state.get("family_trip_info", {}),
+            }
             return
 
+        # 生成済みの経過を再生してから、新しいイベントを待つ
+        index = 0
+        while True:
+            while index < len(self._plan_events):
+                yield self._plan_events[index]
+                index += 1
+            if task.done():
+                break
+            await self._plan_signal.wait()
+
+    def _ensure_plan_task(self) -> Optional[asyncio.Task]:
+        """計画が確定していれば生成タスクを開始（実行中ならそれを返す）"""
+        if self._plan_task is not None and not self._plan_task.done():
+            return self._plan_task
+        if self.state.get("family_plan_generated"):
+            return None
+        if not self.state.get("family_plan_confirmed"):
+            return None
+
         trip_info = self.state.get("family_trip_info") or {}
-        destination = trip_info.get("destination")
-        activities = trip_info.get("activities", [])
-        if not destination or not activities:
-            return
+        if not trip_info.get("destination") or not trip_info.get("activities"):
+            return None
 
-        plan_data = await self._generate_family_plan(trip_info)
-        if plan_data:
-            self.state["family_plan_data"] = plan_data
-            self.state["family_plan_generated"] = True
-            self.state["family_conversation_complete"] = True
-            self.persist()
+        self._plan_events = []
+        self._plan_task = asyncio.get_running_loop().create_task(self._run_plan_generation(dict(trip_info)))
+        return self._plan_task
+
+    async def _run_plan_generation(self, trip_info: Dict[str, Any]) -> None:
+        plan_data: Optional[Dict[str, Any]] = None
+        try:
+            async for event, data in self._iter_family_plan(trip_info):
+                self._publish_plan_event(event, data)
+                if event == "done":
+                    plan_data = data["family_plan"]
+            if plan_data:
+                self.state["family_plan_data"] = plan_data
+                self.state["family_plan_generated"] = True
+                self.state["family_conversation_complete"] = True
+                await self.persist()
+        except Exception as e:
+            print(f"[WARN] family plan generation failed: {e}")
+            self._publish_plan_event("error", {"error": str(e)})
+        finally:
+            self._publish_plan_event(None, None)
+
+    def _publish_plan_event(self, event: Optional[str], data: Optional[Dict[str, Any]]) -> None:
+        """経過を記録して購読者を起こす（eventがNoneなら起こすだけ）"""
+        if event is not None:
+            self._plan_events.append((event, data))
+        signal, self._plan_signal = self._plan_signal, asyncio.Event()
+        signal.set()
+
+    def _stored_plan_events(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """保存済みの計画をストリームと同じ形式のイベントに変換"""
+        plan = self.state.get("family_plan_data") or {}
+        events: List[Tuple[str, Dict[str, Any]]] = [
+            ("story", {"index": index, "paragraph": paragraph})
+            for index, paragraph in enumerate(split_paragraphs(plan.get("story", "")))
+        ]
+        events.append(("letter", {"letter": plan.get("letter", "")}))
+        events.append(("done", {"family_plan": plan}))
+        return events
 
-    async def _generate_family_plan(self, trip_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """ストーリーと手紙を生成して保存"""
-        conversation_log = self.state.get("family_conversation_log", [])
+    async def _iter_family_plan(self, trip_info: Dict[str, Any]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """ストーリーを段落ごとに生成し、十分な冒頭が揃った時点で手紙の生成を並行して開始"""
+        conversation_log = list(self.state.get("family_conversation_log", []))
         personas = self.toolset.get_personas() if self.toolset else self.personas
         if not personas:
-            return None
+            return
+
+        letter_generator = LetterGenerator()
+        user_name = self.user_profile.get("name") if isinstance(self.user_profile, dict) else None
+        story_parts: List[str] = []
+        letter_task: Optional[asyncio.Task] = None
+
+        def start_letter(partial: bool) -> asyncio.Task:
+            return asyncio.get_running_loop().create_task(letter_generator.generate_letter(
+                story="\n\n".join(story_parts),
+                trip_info=trip_info,
+                family_members=personas,
+                user_name=user_name,
+                story_is_partial=partial,
+            ))
+
+        if FAMILY_LETTER_STORY_PREFIX_CHARS <= 0:
+            letter_task = start_letter(partial=True)
 
         try:
             story_generator = StoryGenerator()
-            story = await story_generator.generate_story(
+            async for paragraph in story_generator.stream_story(
                 conversation_log=conversation_log,
                 trip_info=trip_info,
                 personas=personas,
-            )
+            ):
+                story_parts.append(paragraph)
+                yield "story", {"index": len(story_parts) - 1, "paragraph": paragraph}
+                if letter_task is None and sum(len(part) for part in story_parts) >= FAMILY_LETTER_STORY_PREFIX_CHARS:
+                    letter_task = start_letter(partial=True)
         except Exception as e:
             print(f"[WARN] family story generation failed: {e}")
-            story = self._generate_fallback_summary(
-                conversation_log,
-                trip_info.get("destination"),
-                trip_info.get("activities", []),
-            )
+            if not story_parts:
+                fallback = self._generate_fallback_summary(
+                    conversation_log,
+                    trip_info.get("destination"),
+                    trip_info.get("activities", []),
+                )
+                for paragraph in split_paragraphs(fallback):
+                    story_parts.append(paragraph)
+                    yield "story", {"index": len(story_parts) - 1, "paragraph": paragraph}
 
+        if letter_task is None:
+            letter_task = start_letter(partial=False)
         try:
-            letter_generator = LetterGenerator()
-            user_name = self.user_profile.get("name") if isinstance(self.user_profile, dict) else None
-            letter = await letter_generator.generate_letter(
-                story=story,
-                trip_info=trip_info,
-                family_members=personas,
-                user_name=user_name,
-            )
+            letter = await letter_task
         except Exception as e:
             print(f"[WARN] family letter generation failed: {e}")
             letter = ""
+        yield "letter", {"letter": letter}
 
         plan_data = {
             "destination": trip_info.get("destination"),
             "activities": trip_info.get("activities", []),
-            "story": story,
+            "story": "\n\n".join(story_parts),
             "letter": letter,
             "conversation_log": conversation_log,
         }
-        return plan_data
+        yield "done", {"family_plan": plan_data}
 
     def _generate_fallback_summary(
         self,
@@ -385,6 +572,43 @@ def get_family_session(session_id: str) -> FamilyConversationSession:
         FAMILY_SESSIONS[session_id] = session
     return session
 
+
+# --- バックグラウンドジョブ ---
+JOB_FAMILY_PERSONAS = "family_personas"
+JOB_FAMILY_PLAN = "family_plan"
+JOB_FAMILY_IMAGES = "family_images"
+
+
+def _run_family_personas_job(job: Job) -> Dict[str, Any]:
+    """家族ペルソナを生成"""
+    session = get_family_session(job.session_id)
+    run_async(session.initialize())
+    return {'personas': len(session.personas)}
+
+
+def _run_family_plan_job(job: Job) -> Dict[str, Any]:
+    """確定した旅行計画からストーリーと手紙を生成"""
+    session = get_family_session(job.session_id)
+    run_async(session.initialize())
+    run_async(session._maybe_finalize_plan())
+    status = run_async(session.snapshot())
+    if not status.get("family_plan"):
+        raise RuntimeError("旅行計画のストーリーと手紙を生成できませんでした")
+    return {'destination': status["family_plan"].get("destination")}
+
+
+def _run_family_images_job(job: Job) -> Dict[str, Any]:
+    """パートナー・子供の画像を生成"""
+    return run_async(hera_agent.generate_family_images(job.session_id))
+
+
+# 優先度: ユーザーが待っている処理ほど先に実行（小さいほど優先）
+job_queue.register(JOB_FAMILY_PERSONAS, _run_family_personas_job, priority=10)
+job_queue.register(JOB_FAMILY_PLAN, _run_family_plan_job, priority=20)
+job_queue.register(JOB_FAMILY_IMAGES, _run_family_images_job, priority=30)
+job_queue.start()
+logger.info(f"ジョブキュー起動完了: workers={job_queue.workers}")
+
  
 
 # 1. セッション新規作成
@@ -451,6 +675,7 @@ def send_message(session_id):
             hera_agent.run(
                 message=user_message,
                 session_id=session_id,
+                defer_completion=HERA_DEFERRED_COMPLETION,
             )
         )
         if isinstance(raw_response, str):
@@ -464,20 +689,25 @@ def send_message(session_id):
             'reply': '申し訳ございません。しばらく時間をおいてから再度お試しください。'
         }), 500
 
-    # セッションデータの保存（session_mgr使用）
+    return jsonify(_build_message_response(session_id, agent_response))
+
+
+def _build_message_response(session_id: str, agent_response: Dict[str, Any]) -> Dict[str, Any]:
+    """Heraの応答からメッセージAPIのレスポンスを組み立てる"""
+    # プロファイルはエージェントがsession_mgr経由で保存済み
+    # （バックグラウンドの完了処理による更新を上書きしないよう、ここでは保存しない）
     profile_from_agent = agent_response.get('user_profile') or {}
     profile_pruned = prune_empty_fields(profile_from_agent)
-    save_session_data(session_id, 'user_profile', profile_pruned)
 
     history = load_session_data(session_id, 'conversation_history', [])
     if not history:
-        # fall back to in-memoryログ
-        history = hera_agent.conversation_history
+        # fall back to in-memoryログ（セッション単位）
+        history = hera_agent.get_conversation_history(session_id)
 
     information_progress = agent_response.get('information_progress') or build_information_progress(profile_pruned)
     missing_fields = agent_response.get('missing_fields') or compute_missing_fields(profile_pruned)
 
-    return jsonify({
+    return {
         'reply': agent_response.get('message', ''),
         'conversation_history': history,
         'user_profile': profile_pruned,
@@ -487,46 +717,125 @@ def send_message(session_id):
         'session_status': agent_response.get('session_status'),
         'completion_message': agent_response.get('completion_message'),
         'last_extracted_fields': agent_response.get('last_extracted_fields', {}),
-    })
+        'completion_job': agent_response.get('completion_job'),
+    }
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Server-Sent Eventsの1イベント分の文字列"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events) -> Response:
+    """SSEレスポンス（プロキシのバッファリングを無効化）"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+# 2-b. メッセージ送信（返答をSSEでストリーミング）
+@app.route('/api/sessions/<session_id>/messages/stream', methods=['POST'])
+@optional_auth
+def stream_message(session_id):
+    req = request.get_json()
+    if not req or 'message' not in req:
+        return jsonify({'error': 'messageフィールド必須'}), 400
+
+    user_message = req['message']
+
+    if not session_exists(session_id):
+        logger.warning(f"存在しないセッション: {session_id}")
+        return jsonify({'error': 'セッションが存在しません'}), 404
+
+    session_dir = session_path(session_id)
+    os.makedirs(os.path.join(session_dir, 'photos'), exist_ok=True)
+
+    # エージェントループから届く返答の断片をリクエストスレッドへ渡すキュー（Noneで終了）
+    tokens: "queue.Queue[Optional[str]]" = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        hera_agent.run(
+            message=user_message,
+            session_id=session_id,
+            defer_completion=HERA_DEFERRED_COMPLETION,
+            on_token=tokens.put,
+        ),
+        _agent_loop,
+    )
+    future.add_done_callback(lambda _: tokens.put(None))
+
+    def generate():
+        while True:
+            text = tokens.get()
+            if text is None:
+                break
+            yield _sse_event('token', {'text': text})
+
+        try:
+            raw_response = future.result()
+            agent_response = json.loads(raw_response) if isinstance(raw_response, str) else raw_response
+            # 最終イベントの reply が正（断片の連結と異なる場合は置き換える）
+            yield _sse_event('done', _build_message_response(session_id, agent_response))
+        except Exception as e:
+            logger.error(f"Hera agent streaming failed: {e}")
+            yield _sse_event('error', {
+                'error': 'エージェント処理でエラーが発生しました',
+                'reply': '申し訳ございません。しばらく時間をおいてから再度お試しください。',
+            })
+
+    return _sse_response(generate())
 
 # 3. 進捗・履歴・プロフィール取得
 @app.route('/api/sessions/<session_id>/status', methods=['GET'])
 @optional_auth
 def get_status(session_id):
-    # セッション存在確認
-    if not session_exists(session_id):
+    # セッション存在確認とデータ取得（必要なキーのみ1回で読み込む）
+    stored = load_existing_session(session_id, {
+        'user_profile': {},
+        'conversation_history': [],
+        'completion_job': None,
+    })
+    if stored is None:
         logger.warning(f"存在しないセッション: {session_id}")
         return jsonify({'error': 'セッションが存在しません'}), 404
-
-    # session_mgrからデータ取得
-    profile = load_session_data(session_id, 'user_profile', {}) or {}
+    profile = stored['user_profile'] or {}
     profile_pruned = prune_empty_fields(profile)
-    history = load_session_data(session_id, 'conversation_history', []) or []
+    history = stored['conversation_history'] or []
 
     progress = build_information_progress(profile_pruned)
     missing_fields = compute_missing_fields(profile_pruned)
 
+    # バックグラウンド完了処理の状態（メモリ上の最新を優先）
+    completion_job = hera_agent.get_completion_job(session_id) or stored['completion_job']
+    session_status = None
+    if completion_job:
+        session_status = (completion_job.get('result') or {}).get('session_status')
+        if completion_job.get('status') in ('pending', 'running'):
+            session_status = 'PENDING'
+
     return jsonify({
         'user_profile': profile_pruned,
         'conversation_history': history,
         'information_progress': progress,
         'missing_fields': missing_fields,
-        'profile_complete': len(missing_fields) == 0
+        'profile_complete': len(missing_fields) == 0,
+        'session_status': session_status,
+        'completion_job': completion_job,
     })
 
 # 4. セッション完了（必須情報充足/保存・family_agent転送準備）
 @app.route('/api/sessions/<session_id>/complete', methods=['POST'])
 @optional_auth
 def complete_session(session_id):
-    # セッション存在確認
-    if not session_exists(session_id):
+    # セッション存在確認とデータ取得（必要なキーのみ1回で読み込む）
+    stored = load_existing_session(session_id, {'user_profile': {}, 'conversation_history': []})
+    if stored is None:
         logger.warning(f"存在しないセッション: {session_id}")
         return jsonify({'error': 'セッションが存在しません'}), 404
-
-    # session_mgrからデータ取得
-    profile = load_session_data(session_id, 'user_profile', {}) or {}
+    profile = stored['user_profile'] or {}
     profile_pruned = prune_empty_fields(profile)
-    history = load_session_data(session_id, 'conversation_history', []) or []
+    history = stored['conversation_history'] or []
 
     progress = build_information_progress(profile_pruned)
     missing_fields = compute_missing_fields(profile_pruned)
@@ -565,13 +874,13 @@ def complete_session(session_id):
             'information_complete': False
         }), 400
 
-    # 家族エージェントの準備を先行実行（ペルソナ生成など）
+    # 家族エージェントの準備（ペルソナ生成）はジョブとして先行実行
+    personas_job: Optional[Job] = None
     try:
-        family_session = get_family_session(session_id)
-        run_async(family_session.initialize())
-        logger.info(f"家族エージェント初期化完了: {session_id}")
+        personas_job = job_queue.enqueue(session_id, JOB_FAMILY_PERSONAS)
+        logger.info(f"家族エージェント初期化ジョブ登録: {personas_job.job_id} ({personas_job.status})")
     except Exception as e:
-        logger.warning(f"家族エージェント初期化に失敗しました: {e}")
+        logger.warning(f"家族エージェント初期化ジョブの登録に失敗しました: {e}")
 
     return jsonify({
         'message': '収集が完了しました。ありがとうございました。',
@@ -579,7 +888,8 @@ def complete_session(session_id):
         'conversation_history': history,
         'information_progress': progress,
         'missing_fields': [],
-        'information_complete': True
+        'information_complete': True,
+        'family_personas_job': personas_job.to_dict() if personas_job else None,
     })
 
 
@@ -589,13 +899,44 @@ def complete_session(session_id):
 def get_family_status_api(session_id):
     try:
         session = get_family_session(session_id)
-        run_async(session._maybe_finalize_plan())
-        session.persist()
-        return jsonify(session.status())
+        status = run_async(session.snapshot())
+        plan_job = session.schedule_plan(status.pop('plan_ready')) or job_queue.get(session_id, JOB_FAMILY_PLAN)
+        status['family_plan_job'] = plan_job.to_dict() if plan_job else None
+        return jsonify(status)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/sessions/<session_id>/family/plan/stream', methods=['GET'])
+@optional_auth
+def stream_family_plan(session_id):
+    """旅行計画（ストーリーの段落・手紙）の生成経過をSSEで配信"""
+    session = get_family_session(session_id)
+    return _sse_response(_iter_sse_from_loop(session.stream_plan()))
+
+
+def _iter_sse_from_loop(events: AsyncIterator[Tuple[str, Dict[str, Any]]]):
+    """エージェントループ上の非同期イテレータをSSE文字列として順に返す"""
+    bridge: "queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = queue.Queue()
+
+    async def pump() -> None:
+        try:
+            async for event, data in events:
+                bridge.put((event, data))
+        except Exception as e:
+            logger.error(f"SSEストリーム生成エラー: {e}")
+            bridge.put(('error', {'error': str(e)}))
+        finally:
+            bridge.put(None)
+
+    asyncio.run_coroutine_threadsafe(pump(), _agent_loop)
+    while True:
+        item = bridge.get()
+        if item is None:
+            break
+        yield _sse_event(*item)
+
+
 @app.route('/api/sessions/<session_id>/family/messages', methods=['POST'])
 @optional_auth
 def send_family_message(session_id):
@@ -606,26 +947,84 @@ def send_family_message(session_id):
 
     session = get_family_session(session_id)
     try:
-        replies = run_async(session.send_message(user_message))
-        session.persist()
-        status = session.status()
+        replies, status = run_async(session.handle_message(user_message))
+        # 計画が確定したらストーリーと手紙はジョブで生成（family/status または jobs APIで確認）
+        plan_job = session.schedule_plan(status.pop('plan_ready'))
         return jsonify({
             'reply': replies,
             'conversation_history': status['conversation_history'],
             'family_trip_info': status['family_trip_info'],
             'conversation_complete': status['conversation_complete'],
             'family_plan': status.get('family_plan'),
+            'family_plan_job': plan_job.to_dict() if plan_job else None,
         })
     except Exception as e:
         return jsonify({'error': f'家族エージェントとの会話に失敗しました: {e}'}), 500
 
+
+# --- バックグラウンドジョブAPI ---
+@app.route('/api/sessions/<session_id>/jobs', methods=['GET'])
+@optional_auth
+def list_session_jobs(session_id):
+    """セッションのジョブ一覧（ポーリング用）"""
+    if not session_exists(session_id):
+        return jsonify({'error': 'セッションが存在しません'}), 404
+    return jsonify({'jobs': [job.to_dict() for job in job_queue.list(session_id)]})
+
+
+@app.route('/api/sessions/<session_id>/jobs/<job_type>', methods=['GET'])
+@optional_auth
+def get_session_job(session_id, job_type):
+    """ジョブの状態を取得（ポーリング用）"""
+    job = job_queue.get(session_id, job_type)
+    if job is None:
+        return jsonify({'error': 'ジョブが存在しません'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/sessions/<session_id>/jobs/<job_type>', methods=['POST'])
+@optional_auth
+def enqueue_session_job(session_id, job_type):
+    """ジョブを登録（失敗したジョブの再実行にも使用。実行待ち・実行中・成功済みならそのまま返す）"""
+    if not session_exists(session_id):
+        return jsonify({'error': 'セッションが存在しません'}), 404
+    try:
+        job = job_queue.enqueue(session_id, job_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(job.to_dict()), 202
+
+def session_cache_stats() -> Optional[Dict[str, Any]]:
+    """セッション読み込みキャッシュの統計（キャッシュ未使用ならNone）"""
+    manager = session_mgr
+    while manager is not None:
+        if hasattr(manager, 'stats'):
+            return manager.stats()
+        manager = getattr(manager, 'backend', None)
+    return None
+
+
 # ヘルスチェック
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'ok'})
+    return jsonify({'status': 'ok', 'session_cache': session_cache_stats()})
 
 # --- 画像アップロード/生成API ---
 UPLOAD_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+UPLOAD_CONTENT_TYPES = {'image/png', 'image/jpeg'}
+# アップロード画像の最大サイズ（バイト）
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+# 画像形式の判定に使う先頭バイト（PNG / JPEG）
+IMAGE_SIGNATURES = (b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff')
+USER_PHOTO_PATH = 'photos/user.png'
+# 直接アップロードの一時保存先（finalizeで検証してから USER_PHOTO_PATH へ移す）
+USER_PHOTO_UPLOAD_PATH = 'photos/user.upload'
+
+
+def user_photo_url(session_id: str, etag: Optional[str] = None) -> str:
+    """ユーザー画像の配信URL（ETagを付けると長期キャッシュ可能なURLになる）"""
+    url = f'/api/sessions/{session_id}/{USER_PHOTO_PATH}'
+    return f'{url}?v={etag}' if etag else url
 
 # 1. ユーザー画像アップロード
 @app.route('/api/sessions/<session_id>/photos/user', methods=['POST'])
@@ -645,11 +1044,8 @@ def upload_user_photo(session_id):
         return jsonify({'status': 'error', 'error': '対応形式: jpg, jpeg, png'}), 400
 
     try:
-        # 画像データ読み込み
-        file_data = file.read()
-
-        # storage_mgrで保存（ローカル/クラウド自動切り替え）
-        image_url = storage_mgr.save_file(session_id, 'photos/user.png', file_data)
+        # storage_mgrへストリームのまま保存（ローカル/クラウド自動切り替え）
+        image_url = storage_mgr.save_stream(session_id, USER_PHOTO_PATH, file.stream)
         logger.info(f"画像アップロード成功: {session_id}/photos/user.png")
 
         return jsonify({
@@ -660,31 +1056,154 @@ def upload_user_photo(session_id):
         logger.error(f"画像アップロードエラー: {session_id} - {e}")
         return jsonify({'status': 'error', 'error': '画像の保存に失敗しました'}), 500
 
-# 画像ファイル取得（静的配信用途）
-@app.route('/api/sessions/<session_id>/photos/<filename>')
-def get_photo(session_id, filename):
-    # セッション存在確認
+# 1-a. 直接アップロード用の署名付きURL発行
+@app.route('/api/sessions/<session_id>/photos/user/upload-url', methods=['POST'])
+def create_user_photo_upload_url(session_id):
     if not session_exists(session_id):
         logger.warning(f"存在しないセッション: {session_id}")
-        return jsonify({'error': 'セッションが存在しません'}), 404
+        return jsonify({'status': 'error', 'error': 'セッションが存在しません'}), 404
+
+    data = request.get_json(silent=True) or {}
+    content_type = data.get('content_type', 'image/png')
+    if content_type not in UPLOAD_CONTENT_TYPES:
+        return jsonify({'status': 'error', 'error': '対応形式: image/png, image/jpeg'}), 400
 
     try:
-        # storage_mgrから画像データ取得
-        file_data = storage_mgr.load_file(session_id, f'photos/{filename}')
+        upload = storage_mgr.create_upload_url(session_id, USER_PHOTO_UPLOAD_PATH, content_type)
+    except Exception as e:
+        logger.error(f"アップロードURL発行エラー: {session_id} - {e}")
+        upload = None
+    if upload is None:
+        return jsonify({'status': 'error', 'error': 'このストレージでは直接アップロードできません'}), 501
+
+    return jsonify({
+        'status': 'success',
+        'upload': upload,
+        'max_bytes': UPLOAD_MAX_BYTES,
+        'finalize_url': f'/api/sessions/{session_id}/photos/user/finalize',
+    })
+
+# 1-b. 署名付きアップロード（ローカルストレージ用）
+@app.route('/api/sessions/<session_id>/uploads/<path:file_path>', methods=['PUT'])
+def put_signed_upload(session_id, file_path):
+    if not storage_mgr.verify_upload(session_id, file_path, request.args.get('expires'), request.args.get('signature')):
+        return jsonify({'status': 'error', 'error': '署名が無効か期限切れです'}), 403
+    if request.content_length is None:
+        return jsonify({'status': 'error', 'error': 'Content-Lengthが必要です'}), 411
+    if request.content_length > UPLOAD_MAX_BYTES:
+        return jsonify({'status': 'error', 'error': '画像サイズが上限を超えています'}), 413
+
+    try:
+        storage_mgr.save_stream(session_id, file_path, request.stream)
+        return Response(status=204)
+    except Exception as e:
+        logger.error(f"署名付きアップロードエラー: {session_id}/{file_path} - {e}")
+        return jsonify({'status': 'error', 'error': '画像の保存に失敗しました'}), 500
+
+# 1-c. 直接アップロードした画像の検証（検証できた画像のみ配信するパスへ移す）
+@app.route('/api/sessions/<session_id>/photos/user/finalize', methods=['POST'])
+def finalize_user_photo(session_id):
+    if not session_exists(session_id):
+        logger.warning(f"存在しないセッション: {session_id}")
+        return jsonify({'status': 'error', 'error': 'セッションが存在しません'}), 404
+
+    try:
+        upload_info = storage_mgr.stat_file(session_id, USER_PHOTO_UPLOAD_PATH)
+        if upload_info is None:
+            return jsonify({'status': 'error', 'error': '画像がアップロードされていません'}), 400
+
+        error = None
+        if upload_info.size > UPLOAD_MAX_BYTES:
+            error = '画像サイズが上限を超えています'
+        else:
+            head = b''.join(storage_mgr.open_file(session_id, USER_PHOTO_UPLOAD_PATH, 0, 16) or [])
+            if not head.startswith(IMAGE_SIGNATURES):
+                error = '対応形式: jpg, jpeg, png'
+
+        if error:
+            # 破棄するのは一時保存先のみ（以前の画像はそのまま残す）
+            storage_mgr.discard_file(session_id, USER_PHOTO_UPLOAD_PATH)
+            logger.warning(f"アップロード画像を破棄: {session_id}/{USER_PHOTO_UPLOAD_PATH} - {error}")
+            return jsonify({'status': 'error', 'error': error}), 400
+
+        storage_mgr.move_file(session_id, USER_PHOTO_UPLOAD_PATH, USER_PHOTO_PATH)
+        info = storage_mgr.stat_file(session_id, USER_PHOTO_PATH)
+        logger.info(f"画像アップロード成功: {session_id}/photos/user.png")
+        return jsonify({
+            'status': 'success',
+            'image_url': user_photo_url(session_id, info.etag)
+        })
+    except Exception as e:
+        logger.error(f"画像検証エラー: {session_id} - {e}")
+        return jsonify({'status': 'error', 'error': '画像の検証に失敗しました'}), 500
 
-        if file_data is None:
+# 画像ファイル取得（静的配信用途）
+@app.route('/api/sessions/<session_id>/photos/<filename>')
+def get_photo(session_id, filename):
+    file_path = f'photos/{filename}'
+    if file_path == USER_PHOTO_UPLOAD_PATH:
+        # 検証前のアップロードは配信しない
+        return jsonify({'error': '画像が見つかりません'}), 404
+    try:
+        # 署名付きURLに対応したストレージでは、画像をAPIを経由させずに直接ダウンロードさせる
+        # （URLを発行する前にセッションの存在を確認する）
+        if PHOTO_SIGNED_URL_REDIRECT:
+            if not session_exists(session_id):
+                logger.warning(f"存在しないセッション: {session_id}")
+                return jsonify({'error': 'セッションが存在しません'}), 404
+            signed_url = storage_mgr.get_download_url(session_id, file_path)
+            if signed_url:
+                return Response(status=302, headers={'Location': signed_url, 'Cache-Control': 'private, no-store'})
+
+        # storage_mgrから画像の属性のみ取得（セッションの存在確認は画像がない場合のみ行う）
+        info = storage_mgr.stat_file(session_id, file_path)
+
+        if info is None:
+            if not session_exists(session_id):
+                logger.warning(f"存在しないセッション: {session_id}")
+                return jsonify({'error': 'セッションが存在しません'}), 404
             logger.warning(f"画像が見つかりません: {session_id}/photos/{filename}")
             return jsonify({'error': '画像が見つかりません'}), 404
 
-        # Content-Typeを推測
-        import mimetypes
-        content_type, _ = mimetypes.guess_type(filename)
-        if content_type is None:
-            content_type = 'application/octet-stream'
-
-        # バイナリデータをレスポンス
-        from flask import Response
-        return Response(file_data, mimetype=content_type)
+        content_type = info.content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        immutable = CONTENT_ADDRESSED_FILENAME.search(filename) or request.args.get('v') == info.etag
+        headers = {
+            'ETag': f'"{info.etag}"',
+            'Cache-Control': PHOTO_IMMUTABLE_CACHE_CONTROL if immutable else PHOTO_CACHE_CONTROL,
+            'Accept-Ranges': 'bytes',
+        }
+        if info.last_modified is not None:
+            headers['Last-Modified'] = http_date(info.last_modified)
+
+        # 変更がなければ本体を送らない
+        if request.if_none_match.contains_weak(info.etag):
+            return Response(status=304, headers=headers)
+
+        # Rangeリクエスト（単一範囲のみ対応、If-Rangeが一致しない場合は全体を返す）
+        start, end, status = 0, info.size, 200
+        if_range = request.if_range
+        range_applies = (
+            request.range is not None
+            and len(request.range.ranges) == 1
+            and (if_range.etag is None or if_range.etag == info.etag)
+            and (if_range.date is None or (info.last_modified is not None and info.last_modified.replace(microsecond=0) <= if_range.date))
+        )
+        if range_applies:
+            window = request.range.range_for_length(info.size)
+            if window is None:
+                headers['Content-Range'] = f'bytes */{info.size}'
+                return Response(status=416, headers=headers)
+            start, end = window
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{info.size}'
+
+        # ファイル全体をメモリに載せず、チャンク単位でストリーミング
+        body = storage_mgr.open_file(session_id, file_path, start, end)
+        if body is None:
+            logger.warning(f"画像が見つかりません: {session_id}/photos/{filename}")
+            return jsonify({'error': '画像が見つかりません'}), 404
+        headers['Content-Length'] = str(end - start)
+        return Response(body, status=status, mimetype=content_type, headers=headers, direct_passthrough=True)
 
     except Exception as e:
         logger.error(f"画像取得エラー: {session_id}/photos/{filename} - {e}")
@@ -693,8 +1212,9 @@ def get_photo(session_id, filename):
 # 2. パートナー画像生成
 @app.route('/api/sessions/<session_id>/generate-image', methods=['POST'])
 def generate_partner_image(session_id):
-    # セッション存在確認
-    if not session_exists(session_id):
+    # セッション存在確認とプロファイル取得（session_mgr使用）
+    stored = load_existing_session(session_id, {'user_profile': {}})
+    if stored is None:
         logger.warning(f"存在しないセッション: {session_id}")
         return jsonify({'status': 'error', 'error': 'セッションが存在しません'}), 404
 
@@ -703,8 +1223,8 @@ def generate_partner_image(session_id):
     if target != 'partner':
         return jsonify({'status': 'error', 'error': '現在partnerのみ対応'}), 400
 
-    # プロファイルから顔特徴取得（session_mgr使用）
-    prof = load_session_data(session_id, 'user_profile', {})
+    # プロファイルから顔特徴取得
+    prof = stored['user_profile'] or {}
     desc = prof.get('partner_face_description')
     if not desc:
         return jsonify({'status': 'error', 'error': 'partner_face_descriptionが未入力'}), 400
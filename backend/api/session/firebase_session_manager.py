@@ -6,8 +6,11 @@ import os
 import sys
 import uuid
 import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, Iterable, List, Any, Callable
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -16,8 +19,42 @@ from utils.session_manager import SessionManager
 from google.cloud import firestore
 from ..firebase_config import get_firestore_client
 
+# 会話タイプごとのサブコレクション名と、保存済み件数（次のorderIndex）を持つカウンターフィールド
+CONVERSATION_COLLECTIONS = {
+    'main': ('conversations', 'conversationCount'),
+    'family': ('familyConversations', 'familyConversationCount'),
+}
+CONVERSATION_KEYS = {
+    'conversation_history': 'main',
+    'family_conversation': 'family',
+}
+# Firestoreの1バッチあたりの書き込み上限
+FIRESTORE_BATCH_LIMIT = 500
+# 保存済みの会話件数を記憶しておくセッション数の上限
+CONVERSATION_COUNT_CACHE_SIZE = 4096
+# メインドキュメントに保存するフィールド（created_at/statusは基本情報として別名で保存）
+MAIN_DOCUMENT_FIELDS = [
+    'completed', 'completed_at', 'user_id',
+    'letter', 'family_image_url', 'created_at', 'status'
+]
+# セッションスナップショット（sessions/<id>/snapshot/current）に複製するキー
+SNAPSHOT_KEYS = [
+    'user_profile', 'completion_job', 'completed', 'completed_at', 'created_at', 'status'
+]
+
+
 class FirebaseSessionManager(SessionManager):
-    """Firestore を使用したセッション管理"""
+    """Firestore を使用したセッション管理
+
+    会話履歴は追記専用で保存する。セッションドキュメントのカウンターフィールド
+    （conversationCount / familyConversationCount）を保存済み件数の高水位として使い、
+    それより後ろのメッセージだけをバッチで書き込む。
+
+    読み込みはメインドキュメント・プロファイル・メタデータをget_allでまとめて取得し、
+    会話履歴のクエリと並列に実行する（全体でFIRESTORE_LOAD_BUDGET_SECの時間予算）。
+    FIRESTORE_SESSION_SNAPSHOT=true の場合、プロファイルと進捗フラグを1つの
+    スナップショットドキュメントにも複製し、/status などの読み込みを1ドキュメントで済ませる。
+    """
 
     def __init__(self):
         """初期化"""
@@ -27,6 +64,16 @@ class FirebaseSessionManager(SessionManager):
         # フォールバック用に常にmock_storageを初期化
         self.mock_storage = {}
 
+        # 読み込みの並列化と時間予算
+        self.load_budget = float(os.getenv('FIRESTORE_LOAD_BUDGET_SEC', '5'))
+        self.snapshot_enabled = os.getenv('FIRESTORE_SESSION_SNAPSHOT', 'false').lower() == 'true'
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('FIRESTORE_READ_CONCURRENCY', '8')),
+            thread_name_prefix='firestore-read',
+        )
+        # (session_id, 会話タイプ) -> 保存済みの会話件数。分かっていれば保存前の読み込みを省く
+        self._conversation_counts: "OrderedDict[tuple, int]" = OrderedDict()
+
         if self.mock_mode:
             print("📌 FirebaseSessionManager: Running in MOCK mode")
         elif not self.db:
@@ -50,109 +97,65 @@ class FirebaseSessionManager(SessionManager):
             for key, value in data.items():
                 if key == 'user_profile':
                     self.save_profile(session_id, value)
-                elif key == 'conversation_history':
-                    # 既存の会話履歴をクリアして新規保存
-                    if 'conversations' not in self.mock_storage[session_id]:
-                        self.mock_storage[session_id]['conversations'] = {}
-                    self.mock_storage[session_id]['conversations']['main'] = []
-                    if isinstance(value, list):
-                        for conv in value:
-                            self.add_conversation(
-                                session_id,
-                                conv.get('message', ''),
-                                conv.get('speaker', 'user'),
-                                'main'
-                            )
-                elif key == 'family_conversation':
-                    # 家族会話履歴
-                    if 'conversations' not in self.mock_storage[session_id]:
-                        self.mock_storage[session_id]['conversations'] = {}
-                    self.mock_storage[session_id]['conversations']['family'] = []
+                elif key in CONVERSATION_KEYS:
+                    # 会話履歴は保存済みの件数より後ろだけを追記
                     if isinstance(value, list):
-                        for conv in value:
-                            self.add_conversation(
-                                session_id,
-                                conv.get('message', ''),
-                                conv.get('speaker', 'user'),
-                                'family'
-                            )
+                        self.save_conversations(session_id, value, CONVERSATION_KEYS[key])
                 else:
                     # その他のデータはそのまま保存
                     self.mock_storage[session_id][key] = value
         else:
             try:
-                # Firestoreにデータを保存
+                # Firestoreにデータを保存（事前の読み込みなしで作成・更新する）
                 session_ref = self.db.collection('sessions').document(session_id)
-
-                # セッションが存在しない場合は作成
-                if not session_ref.get().exists:
-                    session_ref.set({
-                        'sessionId': session_id,
-                        'createdAt': datetime.now().isoformat(),
-                        'updatedAt': datetime.now().isoformat(),
-                        'status': 'active'
-                    })
-
-                # 各データタイプに応じて保存
+                now = datetime.now().isoformat()
+
+                # created_at を含む保存はセッション作成時の初期化として扱う
+                initializing = 'created_at' in data
+                main_updates: Dict[str, Any] = {'sessionId': session_id, 'updatedAt': now}
+                if initializing:
+                    main_updates['createdAt'] = data['created_at']
+                    main_updates['status'] = 'active'
+                    main_updates['conversationCount'] = 0
+                    main_updates['familyConversationCount'] = 0
+
+                batch = self.db.batch()
+                conversations = {}
                 for key, value in data.items():
                     if key == 'user_profile':
-                        self.save_profile(session_id, value)
-                    elif key == 'conversation_history':
-                        # 既存の会話履歴をクリアして新規保存
-                        conv_ref = session_ref.collection('conversations')
-                        # 既存のドキュメントを削除
-                        for doc in conv_ref.stream():
-                            doc.reference.delete()
-                        # 新規保存
-                        if isinstance(value, list):
-                            for idx, conv in enumerate(value):
-                                conv_data = {
-                                    'message': conv.get('message', ''),
-                                    'speaker': conv.get('speaker', 'user'),
-                                    'timestamp': conv.get('timestamp', datetime.now().isoformat()),
-                                    'orderIndex': idx
-                                }
-                                conv_ref.add(conv_data)
-                    elif key == 'family_conversation':
-                        # 家族会話履歴
-                        fam_conv_ref = session_ref.collection('familyConversations')
-                        # 既存のドキュメントを削除
-                        for doc in fam_conv_ref.stream():
-                            doc.reference.delete()
-                        # 新規保存
+                        profile_ref = session_ref.collection('profiles').document('main')
+                        batch.set(profile_ref, value, merge=True)
+                    elif key in CONVERSATION_KEYS:
                         if isinstance(value, list):
-                            for idx, conv in enumerate(value):
-                                conv_data = {
-                                    'message': conv.get('message', ''),
-                                    'speaker': conv.get('speaker', 'user'),
-                                    'timestamp': conv.get('timestamp', datetime.now().isoformat()),
-                                    'orderIndex': idx
-                                }
-                                fam_conv_ref.add(conv_data)
-                    else:
+                            conversations[CONVERSATION_KEYS[key]] = value
+                    elif key in MAIN_DOCUMENT_FIELDS:
                         # 重要なフラグやメタデータはメインドキュメントに保存
                         # （クエリでフィルタリングできるように）
-                        main_document_fields = [
-                            'completed', 'completed_at', 'user_id', 'created_at',
-                            'letter', 'family_image_url', 'status'
-                        ]
-
-                        if key in main_document_fields:
-                            # メインドキュメントに直接保存
-                            session_ref.update({key: value})
-                        else:
-                            # その他のデータはメタデータサブコレクションに保存
-                            meta_ref = session_ref.collection('metadata').document(key)
-                            meta_ref.set({'value': value})
-
-                            # family_planの場合、letterとfamily_image_urlを抽出してメインドキュメントに保存
-                            if key == 'family_plan' and isinstance(value, dict):
-                                if 'letter' in value:
-                                    session_ref.update({'letter': value['letter']})
-                                # family_image_urlは家族写真のURL（後で画像生成時に保存される）
-
-                # 更新日時を更新
-                session_ref.update({'updatedAt': datetime.now().isoformat()})
+                        main_updates[key] = value
+                    else:
+                        # その他のデータはメタデータサブコレクションに保存
+                        meta_ref = session_ref.collection('metadata').document(key)
+                        batch.set(meta_ref, {'value': value})
+
+                        # family_planの場合、letterを抽出してメインドキュメントに保存
+                        # （family_image_urlは家族写真のURL。後で画像生成時に保存される）
+                        if key == 'family_plan' and isinstance(value, dict) and 'letter' in value:
+                            main_updates['letter'] = value['letter']
+
+                # 指定したフィールドだけを置き換えるマージ書き込み（存在しなければ作成）
+                batch.set(session_ref, main_updates, merge=list(main_updates.keys()))
+                batch.commit()
+
+                # 会話履歴は保存済みの件数（高水位）より後ろだけを追記
+                for conversation_type, value in conversations.items():
+                    persisted_count = 0 if initializing else self._persisted_conversation_count(
+                        session_id, conversation_type
+                    )
+                    if self.save_conversations(session_id, value, conversation_type,
+                                               persisted_count=persisted_count):
+                        self._remember_conversation_count(session_id, conversation_type, len(value))
+
+                self._update_snapshot(session_id, data, create=initializing)
             except Exception as e:
                 print(f"Error saving session data: {str(e)}")
                 # フォールバックとしてモックストレージに保存
@@ -165,11 +168,17 @@ class FirebaseSessionManager(SessionManager):
         """
         セッションデータを読み込み（SessionManager interface）
 
+        メインドキュメントとプロファイル（get_all）、会話履歴2種、メタデータを並列に取得する。
+
         Args:
             session_id: セッションID
 
         Returns:
             セッションデータのディクショナリ、存在しない場合はNone
+
+        Raises:
+            TimeoutError: FIRESTORE_LOAD_BUDGET_SEC 内に読み込みが終わらなかった場合
+            Exception: Firestoreの読み込みエラー（「存在しない」と区別するためそのまま送出する）
         """
         if self.mock_mode:
             if session_id not in self.mock_storage:
@@ -198,54 +207,238 @@ class FirebaseSessionManager(SessionManager):
 
         try:
             session_ref = self.db.collection('sessions').document(session_id)
-            session_doc = session_ref.get()
+            profile_ref = session_ref.collection('profiles').document('main')
 
-            if not session_doc.exists:
+            fetched = self._fetch_parallel({
+                'docs': lambda: self._get_documents([session_ref, profile_ref]),
+                'main': lambda: self.get_conversations(session_id, 'main'),
+                'family': lambda: self.get_conversations(session_id, 'family'),
+                'metadata': lambda: list(session_ref.collection('metadata').stream()),
+            })
+
+            session_doc = fetched['docs'].get(session_ref.path)
+            if session_doc is None or not session_doc.exists:
                 return None
 
             result = {}
 
-            # プロファイル取得
-            profile = self.get_profile(session_id)
-            if profile:
-                result['user_profile'] = profile
-
-            # 会話履歴取得
-            conversations = self.get_conversations(session_id, 'main')
-            if conversations:
-                result['conversation_history'] = conversations
-
-            # 家族会話履歴取得
-            family_conversations = self.get_conversations(session_id, 'family')
-            if family_conversations:
-                result['family_conversation'] = family_conversations
-
-            # メタデータ取得
-            metadata_ref = session_ref.collection('metadata')
-            for doc in metadata_ref.stream():
+            # プロファイル
+            profile_doc = fetched['docs'].get(profile_ref.path)
+            if profile_doc is not None and profile_doc.exists:
+                profile = profile_doc.to_dict()
+                if profile:
+                    result['user_profile'] = profile
+
+            # 会話履歴・家族会話履歴
+            if fetched['main']:
+                result['conversation_history'] = fetched['main']
+            if fetched['family']:
+                result['family_conversation'] = fetched['family']
+
+            # メタデータ
+            for doc in fetched['metadata']:
                 doc_data = doc.to_dict()
                 if 'value' in doc_data:
                     result[doc.id] = doc_data['value']
 
-            # セッションの基本情報（メインドキュメントから読み込み）
-            session_data = session_doc.to_dict()
-            result['created_at'] = session_data.get('createdAt')
-            result['status'] = session_data.get('status')
-
-            # メインドキュメントに保存されているフィールドを読み込み
-            main_document_fields = [
-                'completed', 'completed_at', 'user_id',
-                'letter', 'family_image_url'
-            ]
-            for field in main_document_fields:
-                if field in session_data:
-                    result[field] = session_data[field]
+            # セッションの基本情報とメインドキュメントに保存されているフィールド
+            session_data = session_doc.to_dict() or {}
+            for field in MAIN_DOCUMENT_FIELDS:
+                value = self._main_document_value(session_data, field)
+                if value is not None or field in ('created_at', 'status'):
+                    result[field] = value
 
             return result
 
         except Exception as e:
             print(f"Error loading session data: {str(e)}")
-            return None
+            raise
+
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        指定したキーのみ読み込み（SessionManager interface）
+
+        メインドキュメント・プロファイル・メタデータはget_allで1往復にまとめ、
+        会話履歴は要求された場合のみ並列にクエリする。スナップショットが有効で
+        要求キーがすべてスナップショットに含まれる場合は、スナップショット1件だけを読む。
+
+        Args:
+            session_id: セッションID
+            keys: 読み込むキー
+
+        Returns:
+            存在するキーのみを含むディクショナリ、セッションが存在しない場合はNone
+
+        Raises:
+            TimeoutError: FIRESTORE_LOAD_BUDGET_SEC 内に読み込みが終わらなかった場合
+            Exception: Firestoreの読み込みエラー（「存在しない」と区別するためそのまま送出する）
+        """
+        keys = list(keys)
+        return self._load_keys(session_id, keys, allow_snapshot=self.snapshot_enabled)
+
+    def _load_keys(self, session_id: str, keys: List[str], allow_snapshot: bool,
+                   prefetched: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """load_keysの本体（prefetchedは取得済みの会話履歴）"""
+        prefetched = prefetched or {}
+
+        if self.mock_mode:
+            if session_id not in self.mock_storage:
+                return None
+
+            session_data = self.mock_storage[session_id]
+            result = {}
+            for key in keys:
+                if key == 'user_profile':
+                    if 'profile' in session_data:
+                        result[key] = session_data['profile']
+                elif key in CONVERSATION_KEYS:
+                    conversation_type = CONVERSATION_KEYS[key]
+                    if conversation_type in session_data.get('conversations', {}):
+                        result[key] = session_data['conversations'][conversation_type]
+                elif key in session_data:
+                    result[key] = session_data[key]
+            return result
+
+        try:
+            session_ref = self.db.collection('sessions').document(session_id)
+            document_keys = [key for key in keys if key not in CONVERSATION_KEYS]
+            use_snapshot = allow_snapshot and all(key in SNAPSHOT_KEYS for key in document_keys)
+
+            if use_snapshot:
+                point_refs = {'_snapshot': self._snapshot_ref(session_id)}
+            else:
+                point_refs = {'_session': session_ref}
+                for key in document_keys:
+                    if key == 'user_profile':
+                        point_refs[key] = session_ref.collection('profiles').document('main')
+                    elif key not in MAIN_DOCUMENT_FIELDS:
+                        point_refs[key] = session_ref.collection('metadata').document(key)
+
+            calls: Dict[str, Callable[[], Any]] = {
+                'docs': lambda: self._get_documents(point_refs.values()),
+            }
+            for key in keys:
+                if key in CONVERSATION_KEYS and key not in prefetched:
+                    conversation_type = CONVERSATION_KEYS[key]
+                    calls[key] = lambda conversation_type=conversation_type: self.get_conversations(
+                        session_id, conversation_type
+                    )
+            fetched = {**prefetched, **self._fetch_parallel(calls)}
+            docs = fetched['docs']
+
+            if use_snapshot:
+                snapshot_doc = docs.get(point_refs['_snapshot'].path)
+                if snapshot_doc is None or not snapshot_doc.exists:
+                    # スナップショット導入前のセッションは通常の経路で読み直す（会話履歴は再利用）
+                    conversations = {key: fetched[key] for key in keys if key in CONVERSATION_KEYS}
+                    return self._load_keys(session_id, keys, allow_snapshot=False, prefetched=conversations)
+                snapshot = snapshot_doc.to_dict() or {}
+                result = {key: snapshot[key] for key in document_keys if key in snapshot}
+            else:
+                session_doc = docs.get(session_ref.path)
+                if session_doc is None or not session_doc.exists:
+                    return None
+                session_data = session_doc.to_dict() or {}
+                result = {}
+                for key in document_keys:
+                    if key in MAIN_DOCUMENT_FIELDS:
+                        if key in ('created_at', 'status') or key in session_data:
+                            result[key] = self._main_document_value(session_data, key)
+                        continue
+                    doc = docs.get(point_refs[key].path)
+                    if doc is None or not doc.exists:
+                        continue
+                    doc_data = doc.to_dict() or {}
+                    if key == 'user_profile':
+                        if doc_data:
+                            result[key] = doc_data
+                    elif 'value' in doc_data:
+                        result[key] = doc_data['value']
+
+            for key in keys:
+                if key in CONVERSATION_KEYS and fetched[key]:
+                    result[key] = fetched[key]
+            return result
+
+        except Exception as e:
+            print(f"Error loading session keys: {str(e)}")
+            raise
+
+    def _fetch_parallel(self, calls: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """複数の読み込みを並列に実行し、時間予算内に揃った結果を返す
+
+        Raises:
+            TimeoutError: 時間予算内に読み込みが終わらなかった場合
+        """
+        deadline = time.monotonic() + self.load_budget
+        futures = {name: self._read_executor.submit(call) for name, call in calls.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                for pending in futures.values():
+                    pending.cancel()
+                raise TimeoutError(
+                    f"Firestoreの読み込みが{self.load_budget}秒の予算を超えました ({name})"
+                ) from None
+        return results
+
+    def _get_documents(self, refs: Iterable[Any]) -> Dict[str, Any]:
+        """複数のドキュメントをget_allで1往復で取得し、パスをキーにした辞書で返す"""
+        return {doc.reference.path: doc for doc in self.db.get_all(list(refs))}
+
+    @staticmethod
+    def _main_document_value(session_data: Dict[str, Any], key: str) -> Any:
+        """メインドキュメントのフィールド値（created_at/statusは基本情報から読む）"""
+        if key == 'created_at':
+            return session_data.get('createdAt')
+        return session_data.get(key)
+
+    def _persisted_conversation_count(self, session_id: str, conversation_type: str) -> Optional[int]:
+        """保存済みの会話件数（記憶していなければセッションドキュメントのカウンターを読む）"""
+        count = self._conversation_counts.get((session_id, conversation_type))
+        if count is not None:
+            return count
+        _, counter_field = CONVERSATION_COLLECTIONS[conversation_type]
+        session_doc = self.db.collection('sessions').document(session_id).get()
+        if not session_doc.exists:
+            return 0
+        return (session_doc.to_dict() or {}).get(counter_field)
+
+    def _remember_conversation_count(self, session_id: str, conversation_type: str, count: int) -> None:
+        key = (session_id, conversation_type)
+        self._conversation_counts[key] = count
+        self._conversation_counts.move_to_end(key)
+        while len(self._conversation_counts) > CONVERSATION_COUNT_CACHE_SIZE:
+            self._conversation_counts.popitem(last=False)
+
+    def _snapshot_ref(self, session_id: str):
+        """セッションスナップショットのリファレンス"""
+        return self.db.collection('sessions').document(session_id).collection('snapshot').document('current')
+
+    def _update_snapshot(self, session_id: str, data: Dict[str, Any], create: bool = False) -> None:
+        """スナップショット対象のキーを複製
+
+        Args:
+            create: Trueの場合はスナップショットを作成する（セッション作成時）。
+                Falseの場合は作成済みのスナップショットのみ更新する
+        """
+        if not self.snapshot_enabled:
+            return
+        updates = {key: value for key, value in data.items() if key in SNAPSHOT_KEYS}
+        if create:
+            updates.setdefault('status', 'active')
+        if not updates:
+            return
+        try:
+            if create:
+                self._snapshot_ref(session_id).set(updates, merge=list(updates.keys()))
+            else:
+                self._snapshot_ref(session_id).update(updates)
+        except Exception as e:
+            # スナップショット導入前のセッションはドキュメントがないため複製しない
+            print(f"Snapshot not updated for {session_id}: {str(e)}")
 
     def delete(self, session_id: str) -> None:
         """
@@ -294,7 +487,9 @@ class FirebaseSessionManager(SessionManager):
             'userId': user_id or 'guest',
             'createdAt': datetime.now().isoformat(),
             'updatedAt': datetime.now().isoformat(),
-            'status': 'active'
+            'status': 'active',
+            'conversationCount': 0,
+            'familyConversationCount': 0,
         }
 
         if self.mock_mode:
@@ -302,6 +497,11 @@ class FirebaseSessionManager(SessionManager):
         else:
             try:
                 self.db.collection('sessions').document(session_id).set(session_data)
+                if self.snapshot_enabled:
+                    self._snapshot_ref(session_id).set({
+                        'created_at': session_data['createdAt'],
+                        'status': session_data['status'],
+                    })
             except Exception as e:
                 print(f"Error creating session: {str(e)}")
                 # フォールバック
@@ -352,6 +552,7 @@ class FirebaseSessionManager(SessionManager):
 
         try:
             self.db.collection('sessions').document(session_id).update(data)
+            self._update_snapshot(session_id, data)
             return True
         except Exception as e:
             print(f"Error updating session: {str(e)}")
@@ -414,6 +615,8 @@ class FirebaseSessionManager(SessionManager):
         """
         会話履歴追加
 
+        orderIndexはセッションドキュメントのカウンターから採番する（サブコレクションは読まない）
+
         Args:
             session_id: セッションID
             message: メッセージ
@@ -427,28 +630,157 @@ class FirebaseSessionManager(SessionManager):
             'message': message,
             'speaker': speaker,
             'timestamp': datetime.now().isoformat(),
-            'orderIndex': self._get_next_order_index(session_id, conversation_type)
         }
+        return self.append_conversations(session_id, [conversation_data], conversation_type)
+
+    def append_conversations(self, session_id: str, messages: List[Dict],
+                             conversation_type: str = 'main') -> bool:
+        """
+        会話履歴をまとめて追記
+
+        トランザクション内でカウンターを1回読み、メッセージとカウンター更新を
+        同じトランザクションで書き込む。履歴の長さに関係なく読み取りは1回。
+
+        Args:
+            session_id: セッションID
+            messages: 追記するメッセージ（message/speaker/timestamp）
+            conversation_type: 会話タイプ（'main' or 'family'）
+
+        Returns:
+            成功/失敗
+        """
+        if not messages:
+            return True
 
         if self.mock_mode:
             if session_id not in self.mock_storage:
                 return False
-            if 'conversations' not in self.mock_storage[session_id]:
-                self.mock_storage[session_id]['conversations'] = {}
-            if conversation_type not in self.mock_storage[session_id]['conversations']:
-                self.mock_storage[session_id]['conversations'][conversation_type] = []
-            self.mock_storage[session_id]['conversations'][conversation_type].append(conversation_data)
+            conversations = self.mock_storage[session_id].setdefault('conversations', {})
+            stored = conversations.setdefault(conversation_type, [])
+            for message in messages:
+                stored.append(self._conversation_document(message, len(stored)))
             return True
 
         try:
-            collection_name = 'conversations' if conversation_type == 'main' else 'familyConversations'
-            conv_ref = self.db.collection('sessions').document(session_id).collection(collection_name)
-            conv_ref.add(conversation_data)
-            return True
+            collection_name, counter_field = CONVERSATION_COLLECTIONS[conversation_type]
+            session_ref = self.db.collection('sessions').document(session_id)
+            conv_ref = session_ref.collection(collection_name)
+
+            @firestore.transactional
+            def _append(transaction):
+                snapshot = session_ref.get(transaction=transaction)
+                if not snapshot.exists:
+                    return False
+                start = (snapshot.to_dict() or {}).get(counter_field)
+                if start is None:
+                    # カウンター導入前のセッションは一度だけ件数を数えて補う
+                    start = len(list(conv_ref.select([]).stream()))
+                for offset, message in enumerate(messages):
+                    index = start + offset
+                    transaction.set(conv_ref.document(self._conversation_doc_id(index)),
+                                    self._conversation_document(message, index))
+                transaction.update(session_ref, {
+                    counter_field: start + len(messages),
+                    'updatedAt': datetime.now().isoformat(),
+                })
+                return True
+
+            # 件数はトランザクション内で確定するため、記憶している件数は破棄する
+            self._conversation_counts.pop((session_id, conversation_type), None)
+            return _append(self.db.transaction())
         except Exception as e:
             print(f"Error adding conversation: {str(e)}")
             return False
 
+    def save_conversations(self, session_id: str, conversations: List[Dict],
+                           conversation_type: str = 'main',
+                           persisted_count: Optional[int] = None) -> bool:
+        """
+        会話履歴全体を受け取り、未保存の末尾だけを書き込む
+
+        保存済みの件数（高水位）より後ろのメッセージだけをバッチで追記する。
+        履歴が短くなった場合やカウンター導入前のセッションは全件を書き直す。
+
+        Args:
+            session_id: セッションID
+            conversations: 会話履歴の全件
+            conversation_type: 会話タイプ（'main' or 'family'）
+            persisted_count: 呼び出し側が読み込み済みのカウンター値（Noneの場合は未導入として扱う）
+
+        Returns:
+            成功/失敗
+        """
+        if self.mock_mode:
+            if session_id not in self.mock_storage:
+                return False
+            stored = self.mock_storage[session_id].setdefault('conversations', {}).setdefault(conversation_type, [])
+            if len(conversations) < len(stored):
+                stored.clear()
+            return self.append_conversations(session_id, conversations[len(stored):], conversation_type)
+
+        try:
+            collection_name, counter_field = CONVERSATION_COLLECTIONS[conversation_type]
+            session_ref = self.db.collection('sessions').document(session_id)
+            conv_ref = session_ref.collection(collection_name)
+
+            rewrite = persisted_count is None or len(conversations) < persisted_count
+            if rewrite:
+                # 書き直し（カウンター導入前の自動IDのドキュメントも含めて削除）
+                self._delete_collection(conv_ref)
+                persisted_count = 0
+
+            writes = [
+                (conv_ref.document(self._conversation_doc_id(index)), self._conversation_document(message, index))
+                for index, message in enumerate(conversations[persisted_count:], start=persisted_count)
+            ]
+            if not writes and not rewrite:
+                return True
+
+            # カウンター更新も同じバッチに含めるため、1バッチあたりのメッセージは上限-1件
+            chunk_size = FIRESTORE_BATCH_LIMIT - 1
+            chunks = [writes[i:i + chunk_size] for i in range(0, len(writes), chunk_size)] or [[]]
+            written = persisted_count
+            for chunk in chunks:
+                batch = self.db.batch()
+                for doc_ref, doc_data in chunk:
+                    batch.set(doc_ref, doc_data)
+                written += len(chunk)
+                batch.update(session_ref, {counter_field: written})
+                batch.commit()
+            return True
+        except Exception as e:
+            print(f"Error saving conversations: {str(e)}")
+            return False
+
+    def _delete_collection(self, collection_ref) -> None:
+        """サブコレクションのドキュメントをバッチで削除"""
+        batch = self.db.batch()
+        pending = 0
+        for doc in collection_ref.select([]).stream():
+            batch.delete(doc.reference)
+            pending += 1
+            if pending >= FIRESTORE_BATCH_LIMIT:
+                batch.commit()
+                batch = self.db.batch()
+                pending = 0
+        if pending:
+            batch.commit()
+
+    @staticmethod
+    def _conversation_doc_id(index: int) -> str:
+        """orderIndexから決まるドキュメントID（同じ位置の再書き込みは上書きになる）"""
+        return f"{index:08d}"
+
+    @staticmethod
+    def _conversation_document(message: Dict, index: int) -> Dict:
+        """会話メッセージをFirestoreのドキュメント形式に変換"""
+        return {
+            'message': message.get('message', ''),
+            'speaker': message.get('speaker', 'user'),
+            'timestamp': message.get('timestamp', datetime.now().isoformat()),
+            'orderIndex': index,
+        }
+
     def get_conversations(self, session_id: str, conversation_type: str = 'main') -> List[Dict]:
         """
         会話履歴取得
@@ -474,22 +806,6 @@ class FirebaseSessionManager(SessionManager):
             print(f"Error getting conversations: {str(e)}")
             return []
 
-    def _get_next_order_index(self, session_id: str, conversation_type: str) -> int:
-        """
-        次の会話順序インデックスを取得
-
-        Args:
-            session_id: セッションID
-            conversation_type: 会話タイプ
-
-        Returns:
-            次のインデックス
-        """
-        conversations = self.get_conversations(session_id, conversation_type)
-        if not conversations:
-            return 0
-        return max(c.get('orderIndex', 0) for c in conversations) + 1
-
     def complete_session(self, session_id: str) -> bool:
         """
         セッション完了
@@ -518,15 +834,16 @@ class FirebaseSessionManager(SessionManager):
                 return True
             return False
 
+        for conversation_type in CONVERSATION_COLLECTIONS:
+            self._conversation_counts.pop((session_id, conversation_type), None)
+
         try:
             # サブコレクションも含めて削除
             session_ref = self.db.collection('sessions').document(session_id)
 
             # サブコレクションを削除
-            for collection_name in ['profiles', 'conversations', 'familyConversations', 'metadata']:
-                collection_ref = session_ref.collection(collection_name)
-                for doc in collection_ref.stream():
-                    doc.reference.delete()
+            for collection_name in ['profiles', 'conversations', 'familyConversations', 'metadata', 'snapshot']:
+                self._delete_collection(session_ref.collection(collection_name))
 
             # メインドキュメントを削除
             session_ref.delete()
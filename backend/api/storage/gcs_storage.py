@@ -6,23 +6,70 @@ import os
 import sys
 import uuid
 import base64
+import copy
 import json
-from typing import Optional, BinaryIO, List, Dict, Any
-from datetime import datetime, timedelta
+import threading
+from collections import OrderedDict
+from typing import Optional, BinaryIO, Iterator, List, Dict, Any
+from datetime import timedelta
+from google.api_core.exceptions import NotFound, NotModified
 from google.cloud import storage
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from utils.storage_manager import StorageManager
+from utils.storage_manager import (
+    SIGNED_URL_TTL_SEC, STREAM_CHUNK_SIZE, FileInfo, StorageManager, _blob_info, _upload_ticket, gcs_batch_delete,
+)
 from ..firebase_config import get_storage_bucket
 
+# メタデータJSONのプロセス内キャッシュの最大件数（0で無効）
+GCS_METADATA_CACHE_SIZE = int(os.getenv('GCS_METADATA_CACHE_SIZE', '256'))
+
+
+class MetadataCache:
+    """メタデータJSONのキャッシュ（Blobのgeneration番号で有効性を確認するLRU）"""
+
+    def __init__(self, max_entries: int = GCS_METADATA_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, blob_name: str) -> Optional[tuple]:
+        """(generation, data) を取得"""
+        with self._lock:
+            entry = self._entries.get(blob_name)
+            if entry is not None:
+                self._entries.move_to_end(blob_name)
+            return entry
+
+    def put(self, blob_name: str, generation: Optional[int], data: Dict[str, Any]) -> None:
+        if self.max_entries <= 0 or generation is None:
+            self.discard(blob_name)
+            return
+        with self._lock:
+            self._entries[blob_name] = (int(generation), copy.deepcopy(data))
+            self._entries.move_to_end(blob_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, blob_name: str) -> None:
+        with self._lock:
+            self._entries.pop(blob_name, None)
+
+    def discard_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for blob_name in [name for name in self._entries if name.startswith(prefix)]:
+                del self._entries[blob_name]
+
+
 class GCSStorageManager(StorageManager):
     """Google Cloud Storage を使用したファイル管理"""
 
     def __init__(self):
         """初期化"""
         self.bucket = get_storage_bucket()
+        self.metadata_cache = MetadataCache()
         self.mock_mode = os.getenv('FIREBASE_MOCK', 'false').lower() == 'true'
 
         if self.mock_mode:
@@ -64,7 +111,10 @@ class GCSStorageManager(StorageManager):
                     json.dumps(data, ensure_ascii=False),
                     content_type='application/json'
                 )
+                # アップロード結果のgenerationで登録し、次回の読み込みは条件付きダウンロードにする
+                self.metadata_cache.put(metadata_path, blob.generation, data)
             except Exception as e:
+                self.metadata_cache.discard(f"sessions/{session_id}/metadata/{key}.json")
                 print(f"Error saving metadata: {str(e)}")
 
     def load_metadata(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
@@ -82,12 +132,19 @@ class GCSStorageManager(StorageManager):
             session_meta = self.mock_metadata.get(session_id, {})
             return session_meta.get(key)
 
+        metadata_path = f"sessions/{session_id}/metadata/{key}.json"
+        cached = self.metadata_cache.get(metadata_path)
         try:
-            metadata_path = f"sessions/{session_id}/metadata/{key}.json"
+            # キャッシュがあればgenerationが変わった場合のみ本体を受け取る（1往復）
             blob = self.bucket.blob(metadata_path)
-            if blob.exists():
-                content = blob.download_as_text()
-                return json.loads(content)
+            content = blob.download_as_bytes(if_generation_not_match=cached[0] if cached else None)
+            data = json.loads(content.decode('utf-8'))
+            self.metadata_cache.put(metadata_path, blob.generation, data)
+            return data
+        except NotModified:
+            return copy.deepcopy(cached[1])
+        except NotFound:
+            self.metadata_cache.discard(metadata_path)
             return None
         except Exception as e:
             print(f"Error loading metadata: {str(e)}")
@@ -127,13 +184,16 @@ class GCSStorageManager(StorageManager):
             blob = self.bucket.blob(blob_name)
             blob.upload_from_string(file_data, content_type=content_type or 'application/octet-stream')
 
-            # Signed URL を生成（1時間有効）
-            url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(hours=1),
-                method="GET"
+            # Signed URL はオブジェクトごとにキャッシュし、有効期限の半分を過ぎたら作り直す
+            return self._signed_url_cache().get_or_create(
+                f"{session_id}/{file_path}",
+                SIGNED_URL_TTL_SEC,
+                lambda: blob.generate_signed_url(
+                    version="v4",
+                    expiration=timedelta(seconds=SIGNED_URL_TTL_SEC),
+                    method="GET"
+                )
             )
-            return url
         except Exception as e:
             print(f"Error saving file: {str(e)}")
             # フォールバックURLを返す
@@ -159,15 +219,93 @@ class GCSStorageManager(StorageManager):
             return None
 
         try:
-            blob_name = f"sessions/{session_id}/{file_path}"
-            blob = self.bucket.blob(blob_name)
-            if blob.exists():
-                return blob.download_as_bytes()
+            # 存在確認をせずにダウンロードし、NotFoundを「なし」として扱う（1往復）
+            blob = self.bucket.blob(f"sessions/{session_id}/{file_path}")
+            return blob.download_as_bytes()
+        except NotFound:
             return None
         except Exception as e:
             print(f"Error loading file: {str(e)}")
             return None
 
+    def stat_file(self, session_id: str, file_path: str) -> Optional[FileInfo]:
+        """
+        ファイルの属性を取得（StorageManager interface）
+
+        本体はダウンロードせず、Blobのメタデータ（generation・サイズ・更新日時）のみ取得する。
+
+        Args:
+            session_id: セッションID
+            file_path: ファイルパス（例: 'photos/user.png'）
+
+        Returns:
+            ファイルの属性、存在しない場合はNone
+        """
+        if self.mock_mode:
+            return super().stat_file(session_id, file_path)
+
+        blob = self.bucket.blob(f"sessions/{session_id}/{file_path}")
+        try:
+            blob.reload()
+        except NotFound:
+            return None
+        except Exception as e:
+            print(f"Error getting file info: {str(e)}")
+            return None
+        return _blob_info(blob)
+
+    def open_file(self, session_id: str, file_path: str, start: int = 0, end: Optional[int] = None,
+                  chunk_size: int = STREAM_CHUNK_SIZE) -> Optional[Iterator[bytes]]:
+        """
+        ファイルの [start, end) をチャンクごとに読み出す（StorageManager interface）
+
+        範囲指定のダウンロードをチャンクごとに行い、ファイル全体をメモリに載せない。
+        最初のチャンクは呼び出し時に読み、存在しない場合はNoneを返す。
+
+        Args:
+            session_id: セッションID
+            file_path: ファイルパス（例: 'photos/user.png'）
+            start: 開始位置（バイト）
+            end: 終了位置（バイト、この位置は含まない）。Noneの場合は末尾まで
+            chunk_size: 1回のダウンロードのバイト数
+
+        Returns:
+            チャンクのイテレータ、存在しない場合はNone
+        """
+        if self.mock_mode:
+            return super().open_file(session_id, file_path, start, end, chunk_size)
+
+        blob = self.bucket.blob(f"sessions/{session_id}/{file_path}")
+        try:
+            if end is None:
+                # 終了位置が未指定の場合はサイズを取得して範囲を決める
+                blob.reload()
+                end = blob.size or 0
+            if end <= start:
+                return iter(())
+            first = self._download_range(blob, start, min(start + chunk_size, end))
+        except NotFound:
+            return None
+        except Exception as e:
+            print(f"Error opening file: {str(e)}")
+            return None
+        return self._iter_ranges(blob, first, start + len(first), end, chunk_size)
+
+    @staticmethod
+    def _download_range(blob, start: int, end: int) -> bytes:
+        """[start, end) をダウンロード（2回目以降は最初に読んだgenerationに固定し、途中で置き換わったら失敗させる）"""
+        return blob.download_as_bytes(start=start, end=end - 1, if_generation_match=blob.generation)
+
+    @classmethod
+    def _iter_ranges(cls, blob, first: bytes, position: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        yield first
+        while position < end:
+            chunk = cls._download_range(blob, position, min(position + chunk_size, end))
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+
     def delete_session(self, session_id: str) -> None:
         """
         セッション全体を削除（StorageManager interface）
@@ -191,11 +329,99 @@ class GCSStorageManager(StorageManager):
             try:
                 # セッションディレクトリ内のすべてのファイルを削除
                 prefix = f"sessions/{session_id}/"
-                blobs = self.bucket.list_blobs(prefix=prefix)
-                for blob in blobs:
-                    blob.delete()
+                names = [blob.name for blob in self.bucket.list_blobs(prefix=prefix)]
+                gcs_batch_delete(self.bucket.client, self.bucket, names)
             except Exception as e:
                 print(f"Error deleting session: {str(e)}")
+            finally:
+                self.metadata_cache.discard_prefix(f"sessions/{session_id}/")
+                self._signed_url_cache().invalidate_prefix(f"{session_id}/")
+
+    def discard_file(self, session_id: str, file_path: str) -> None:
+        """
+        ファイルを1つ削除（StorageManager interface）
+
+        Args:
+            session_id: セッションID
+            file_path: ファイルパス（例: 'photos/user.png'）
+        """
+        self.delete_file(f"sessions/{session_id}/{file_path}")
+        self._signed_url_cache().invalidate(f"{session_id}/{file_path}")
+
+    def delete_files(self, session_id: str, file_paths: List[str]) -> None:
+        """
+        複数のファイルをバッチでまとめて削除（StorageManager interface）
+
+        Args:
+            session_id: セッションID
+            file_paths: ファイルパスのリスト
+        """
+        if self.mock_mode:
+            for file_path in file_paths:
+                self.discard_file(session_id, file_path)
+            return
+
+        blob_names = [f"sessions/{session_id}/{file_path}" for file_path in file_paths]
+        for blob_name, file_path in zip(blob_names, file_paths):
+            self.metadata_cache.discard(blob_name)
+            self._signed_url_cache().invalidate(f"{session_id}/{file_path}")
+        gcs_batch_delete(self.bucket.client, self.bucket, blob_names)
+
+    def move_file(self, session_id: str, src_path: str, dst_path: str) -> None:
+        """
+        ファイルを別のパスへ移動（StorageManager interface）
+
+        バケット内でコピーしてから元のファイルを削除する。
+
+        Args:
+            session_id: セッションID
+            src_path: 移動元のファイルパス（例: 'photos/user.upload'）
+            dst_path: 移動先のファイルパス（例: 'photos/user.png'）
+        """
+        if self.mock_mode:
+            super().move_file(session_id, src_path, dst_path)
+            return
+
+        src_blob = self.bucket.blob(f"sessions/{session_id}/{src_path}")
+        self.bucket.copy_blob(src_blob, self.bucket, f"sessions/{session_id}/{dst_path}")
+        self.discard_file(session_id, src_path)
+        self._signed_url_cache().invalidate(f"{session_id}/{dst_path}")
+
+    def create_upload_url(self, session_id: str, file_path: str, content_type: str,
+                          expires_in: int = SIGNED_URL_TTL_SEC) -> Optional[Dict[str, Any]]:
+        """
+        バケットへ直接PUTする署名付きURLを発行（StorageManager interface）
+
+        Returns:
+            アップロード情報。モックモードではNone（APIへのアップロードを使う）
+        """
+        if self.mock_mode:
+            return None
+
+        self._signed_url_cache().invalidate(f"{session_id}/{file_path}")
+        blob = self.bucket.blob(f"sessions/{session_id}/{file_path}")
+        url = blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=expires_in),
+            method="PUT",
+            content_type=content_type
+        )
+        return _upload_ticket(url, content_type, expires_in)
+
+    def get_download_url(self, session_id: str, file_path: str,
+                         expires_in: int = SIGNED_URL_TTL_SEC) -> Optional[str]:
+        """
+        バケットから直接GETする署名付きURLを取得（StorageManager interface）
+
+        同じファイルには有効期限の半分まで同じURLを返す。モックモードではNone。
+        """
+        if self.mock_mode:
+            return None
+
+        def create():
+            return self.get_file_url(f"sessions/{session_id}/{file_path}", expires_in / 3600)
+
+        return self._signed_url_cache().get_or_create(f"{session_id}/{file_path}", expires_in, create)
 
     # ========== Original Methods (互換性のため維持) ==========
 
@@ -306,6 +532,7 @@ class GCSStorageManager(StorageManager):
                     return True
             return False
 
+        self.metadata_cache.discard(blob_name)
         try:
             blob = self.bucket.blob(blob_name)
             blob.delete()
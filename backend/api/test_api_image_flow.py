@@ -27,7 +27,7 @@ def upload_user_image(session_id):
 # 3. パートナー画像生成API
 def generate_partner_image(session_id):
     # ダミーでprofileにpartner_face_descriptionを書き込んでおく
-    prof_path = os.path.join(DIR, f'../tmp/user_sessions/{session_id}/user_profile.json')
+    prof_path = os.path.join(DIR, f'../tmp/user_sessions/{session_id[:2]}/{session_id}/user_profile.json')
     import json
     if os.path.exists(prof_path):
         data = json.load(open(prof_path, encoding='utf-8'))
@@ -0,0 +1,63 @@
+"""
+非同期ストレージ管理のテスト
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.async_storage import AsyncStorageManager
+from utils.storage_manager import LocalStorageManager
+
+
+class SlowFlakyStorage(LocalStorageManager):
+    """保存に時間がかかり、各ファイルの初回保存が失敗するストレージ"""
+
+    def __init__(self, base_dir):
+        super().__init__(base_dir)
+        self.lock = threading.Lock()
+        self.failed = set()
+        self.active = 0
+        self.peak = 0
+
+    def save_file(self, session_id, file_path, file_data):
+        with self.lock:
+            if file_path not in self.failed:
+                self.failed.add(file_path)
+                raise ConnectionError("一時的なエラー")
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(0.1)
+            return super().save_file(session_id, file_path, file_data)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TestAsyncStorageManager:
+    """AsyncStorageManagerのテスト"""
+
+    def test_concurrent_save_with_retry(self, tmp_path):
+        """複数ファイルを上限付きで並行保存し、一時的な失敗はリトライする"""
+        storage = SlowFlakyStorage(str(tmp_path))
+        manager = AsyncStorageManager(storage, max_concurrency=3, max_attempts=2, retry_backoff=0.01)
+        files = {f"photos/child_{i}.png": f"child {i}".encode() for i in range(6)}
+
+        started = time.monotonic()
+        urls = asyncio.run(manager.save_files("s1", files))
+        elapsed = time.monotonic() - started
+
+        assert set(urls) == set(files)
+        assert storage.peak == 3
+        assert elapsed < 0.5
+
+        loaded = asyncio.run(manager.load_files("s1", list(files) + ["photos/missing.png"]))
+        assert loaded["photos/missing.png"] is None
+        assert all(loaded[path] == data for path, data in files.items())
+
+        asyncio.run(manager.delete_files("s1", ["photos/child_0.png", "photos/child_1.png"]))
+        assert storage.load_file("s1", "photos/child_0.png") is None
+        assert storage.load_file("s1", "photos/child_2.png") is not None
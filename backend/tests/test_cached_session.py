@@ -0,0 +1,127 @@
+"""
+読み込みキャッシュ付きセッション管理のテスト
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.cached_session import CachedSessionManager
+from utils.session_manager import FileSessionManager
+
+
+class CountingSessionManager(FileSessionManager):
+    """読み込みの呼び出し回数を数えるファイルセッションマネージャー"""
+
+    def __init__(self, sessions_dir):
+        super().__init__(sessions_dir)
+        self.reads = 0
+
+    def load_keys(self, session_id, keys):
+        self.reads += 1
+        return super().load_keys(session_id, keys)
+
+    def exists(self, session_id):
+        self.reads += 1
+        return super().exists(session_id)
+
+
+class TestCachedSessionManager:
+    """CachedSessionManagerのテスト"""
+
+    def test_status_polls_are_served_from_memory(self, tmp_path):
+        """存在確認と同じキーの読み込みは2回目以降メモリから返す"""
+        backend = CountingSessionManager(str(tmp_path))
+        backend.save("s1", {"user_profile": {"name": "太郎"}})
+        cache = CachedSessionManager(backend, ttl=60)
+
+        for _ in range(3):
+            assert cache.exists("s1")
+            assert cache.load_keys("s1", ["user_profile", "completion_job"]) == {"user_profile": {"name": "太郎"}}
+
+        assert backend.reads == 2
+        stats = cache.stats()
+        assert stats["hits"] == 4
+        assert stats["misses"] == 2
+
+    def test_write_through_and_invalidate(self, tmp_path):
+        """保存はキャッシュにも反映し、invalidate後は下位から読み直す"""
+        backend = CountingSessionManager(str(tmp_path))
+        cache = CachedSessionManager(backend, ttl=60)
+        assert not cache.exists("s1")
+
+        cache.save("s1", {"user_profile": {"name": "太郎"}})
+        assert cache.exists("s1")
+        assert cache.load_key("s1", "user_profile") == {"name": "太郎"}
+        reads = backend.reads
+
+        # 他のワーカーが書き込んだ想定
+        backend.save("s1", {"user_profile": {"name": "花子"}})
+        assert cache.load_key("s1", "user_profile") == {"name": "太郎"}
+        cache.invalidate("s1", ["user_profile"])
+        assert cache.load_key("s1", "user_profile") == {"name": "花子"}
+        assert backend.reads == reads + 1
+
+        cache.delete("s1")
+        assert not cache.exists("s1")
+
+    def test_ttl_and_lru_bound(self, tmp_path):
+        """期限切れのキーは読み直し、上限を超えたセッションは破棄する"""
+        backend = CountingSessionManager(str(tmp_path))
+        cache = CachedSessionManager(backend, max_sessions=2, ttl=60, key_ttls={"completion_job": 0.01})
+        cache.save("s1", {"completion_job": {"status": "running"}})
+        backend.save("s1", {"completion_job": {"status": "done"}})
+        time.sleep(0.02)
+        assert cache.load_key("s1", "completion_job") == {"status": "done"}
+
+        cache.save("s2", {"a": 1})
+        cache.save("s3", {"a": 1})
+        stats = cache.stats()
+        assert stats["sessions"] == 2
+        assert stats["evictions"] == 1
+
+    def test_listener_error_drops_cached_values(self, tmp_path, monkeypatch):
+        """無効化通知の受信に失敗したら、キャッシュを破棄し読み込み中の結果も捨てる"""
+        from utils import cached_session
+
+        class StopListening(BaseException):
+            pass
+
+        class BrokenPubSub:
+            def listen(self):
+                raise ConnectionError("disconnected")
+
+            def subscribe(self, channel):
+                raise StopListening()
+
+        monkeypatch.setattr(cached_session.time, 'sleep', lambda seconds: None)
+        backend = CountingSessionManager(str(tmp_path))
+        manager = CachedSessionManager(backend, ttl=60)
+        manager.save("s1", {"status": "active"})
+        generation = manager._generation("s1")
+
+        try:
+            manager._listen(BrokenPubSub())
+        except StopListening:
+            pass
+
+        assert manager._generation("s1") == generation + 1
+        reads = backend.reads
+        assert manager.load_keys("s1", ["status"]) == {"status": "active"}
+        assert backend.reads == reads + 1
+
+    def test_cache_defaults_to_invalidation_channel(self, tmp_path, monkeypatch):
+        """SESSION_CACHE 未指定の場合、無効化通知がなければキャッシュを挟まない"""
+        from utils import session_manager
+
+        monkeypatch.setenv('SESSION_TYPE', 'sqlite')
+        monkeypatch.setenv('SQLITE_SESSION_PATH', str(tmp_path / "sessions.sqlite3"))
+        monkeypatch.setenv('SESSION_WRITE_BEHIND', 'false')
+        monkeypatch.delenv('SESSION_CACHE', raising=False)
+        monkeypatch.delenv('SESSION_CACHE_INVALIDATION_URL', raising=False)
+        monkeypatch.setattr(session_manager, '_session_manager', None)
+        assert not isinstance(session_manager.get_session_manager(), CachedSessionManager)
+
+        monkeypatch.setenv('SESSION_CACHE', 'true')
+        monkeypatch.setattr(session_manager, '_session_manager', None)
+        assert isinstance(session_manager.get_session_manager(), CachedSessionManager)
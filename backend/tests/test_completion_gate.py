@@ -0,0 +1,60 @@
+"""
+Hera完了判定ゲートのテスト
+"""
+import os
+import sys
+import asyncio
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agents.hera.completion_gate import has_finish_intent, needs_unified_check
+from utils.session_manager import FileSessionManager
+
+
+class TestCompletionGate:
+    """needs_unified_check / has_finish_intent のテスト"""
+
+    def test_finish_intent(self):
+        """早期終了の表現を検出する"""
+        assert has_finish_intent("これで十分です")
+        assert has_finish_intent("もう大丈夫、家族と話したい")
+        assert not has_finish_intent("東京に住んでいる32歳です")
+        assert not has_finish_intent("子供は2人以上で考えています")
+
+    def test_threshold(self):
+        """不足が少ないか終了の意図があるときだけ実行"""
+        many = ["age", "gender", "location", "income_range"]
+        assert needs_unified_check([], "こんにちは", max_missing=2)
+        assert needs_unified_check(["age", "gender"], "こんにちは", max_missing=2)
+        assert not needs_unified_check(many, "こんにちは", max_missing=2)
+        assert needs_unified_check(many, "これで全部です", max_missing=2)
+
+
+class TestEvaluateSessionCompletionGate:
+    """ADKHeraAgent._evaluate_session_completion のゲート適用テスト"""
+
+    def test_skips_llm_when_many_fields_missing(self, tmp_path, monkeypatch):
+        """不足が多いターンでは統合完了チェックを呼ばない"""
+        monkeypatch.setenv("HERA_COMPLETION_CHECK_MAX_MISSING", "2")
+        from agents.hera.adk_hera_agent import ADKHeraAgent
+
+        agent = ADKHeraAgent(session_manager=FileSessionManager(str(tmp_path)))
+        calls = []
+
+        async def fake_unified(user_message, missing_fields):
+            calls.append(user_message)
+            return {"missing_info": {}, "is_complete": False, "completion_message": None}
+
+        agent._unified_completion_check = fake_unified
+
+        async def scenario():
+            await agent.start_session("s1")
+            first = await agent._evaluate_session_completion("32歳です", user_message_already_logged=True)
+            second = await agent._evaluate_session_completion("これで十分です", user_message_already_logged=True)
+            return first, second
+
+        first, second = asyncio.run(scenario())
+
+        assert first["status"] == "INCOMPLETE"
+        assert "age" in first["remaining_missing"]
+        assert calls == ["これで十分です"]
+        assert second["status"] == "INCOMPLETE"
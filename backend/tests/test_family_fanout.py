@@ -0,0 +1,152 @@
+"""
+家族メンバー応答の並行生成テスト
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agents.family.models import Persona
+from agents.family.tooling import FamilyToolSet
+
+
+class FakeModel:
+    """固定のJSONを遅延付きで返すダミーモデル"""
+
+    def __init__(self, payload, delay):
+        self.payload = payload
+        self.delay = delay
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.delay)
+        return SimpleNamespace(text=json.dumps(self.payload, ensure_ascii=False))
+
+
+def _persona(name, role):
+    return Persona(name=name, role=role, speaking_style="", traits=[], goals="", background="")
+
+
+def _state():
+    return {
+        "family_conversation_log": [],
+        "family_trip_info": {},
+        "family_plan_prompted": False,
+        "family_plan_confirmed": False,
+        "family_conversation_complete": False,
+    }
+
+
+class TestFamilyFanout:
+    """FamilyToolSet.respond_allのテスト"""
+
+    def test_parallel_and_ordered(self):
+        """応答は並行生成され、ツール順にログへ反映される"""
+        toolset = FamilyToolSet([_persona("あゆみ", "妻"), _persona("たかし", "息子"), _persona("えり", "娘")])
+        payloads = [
+            {"message": "いいね", "destination": "水族館", "activities": ["イルカショー"], "plan_response": "UNKNOWN"},
+            {"message": "ペンギン!", "destination": None, "activities": ["ペンギン見学"], "plan_response": "UNKNOWN"},
+            {"message": "楽しみ", "destination": None, "activities": ["イルカショー"], "plan_response": "UNKNOWN"},
+        ]
+        # 後のメンバーほど早く返る
+        for tool, payload, delay in zip(toolset.tools, payloads, (0.3, 0.2, 0.1)):
+            tool.model = FakeModel(payload, delay)
+
+        context = SimpleNamespace(state=_state())
+        started = time.monotonic()
+        results = asyncio.run(toolset.respond_all(context, "水族館に行こう"))
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.55
+        assert [r["speaker"] for r in results] == ["妻", "息子", "娘"]
+        assert [e["speaker"] for e in context.state["family_conversation_log"]] == ["妻", "息子", "娘"]
+        assert context.state["family_trip_info"] == {
+            "destination": "水族館",
+            "activities": ["イルカショー", "ペンギン見学"],
+        }
+
+    def test_plan_response_uses_turn_snapshot(self):
+        """同じターンで出た提案には、子供のplan_responseを反映しない"""
+        toolset = FamilyToolSet([_persona("あゆみ", "妻"), _persona("たかし", "息子")])
+        toolset.tools[0].model = FakeModel(
+            {"message": "いいね", "destination": "公園", "activities": ["ピクニック", "ブランコ"]}, 0
+        )
+        toolset.tools[1].model = FakeModel({"message": "賛成!", "plan_response": "YES"}, 0)
+
+        context = SimpleNamespace(state=_state())
+        asyncio.run(toolset.respond_all(context, "公園でピクニックとブランコ"))
+
+        assert context.state["family_plan_prompted"] is True
+        assert context.state["family_plan_confirmed"] is False
+
+    def test_error_is_logged_in_order(self):
+        """失敗したメンバーはフォールバック発話を順番どおりに記録"""
+        toolset = FamilyToolSet([_persona("あゆみ", "妻"), _persona("たかし", "息子")])
+
+        class BrokenModel:
+            def generate_content(self, prompt, **kwargs):
+                raise RuntimeError("boom")
+
+        toolset.tools[0].model = BrokenModel()
+        toolset.tools[1].model = FakeModel({"message": "やあ"}, 0)
+
+        context = SimpleNamespace(state=_state())
+        results = asyncio.run(toolset.respond_all(context, "こんにちは"))
+
+        assert "boom" in results[0]["message"]
+        assert results[1]["message"] == "やあ"
+        assert [e["speaker"] for e in context.state["family_conversation_log"]] == ["妻", "息子"]
+
+
+class CountingModel:
+    """呼び出し回数を数えるダミーモデル"""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(text=self.text)
+
+
+class TestFamilyEnsembleMode:
+    """ensembleモードのテスト"""
+
+    def test_single_request_for_all_members(self):
+        """1回のリクエストで全員分の応答を反映"""
+        toolset = FamilyToolSet([_persona("あゆみ", "妻"), _persona("たかし", "息子")], mode="ensemble")
+        toolset.model = CountingModel(json.dumps({
+            "replies": [
+                {"speaker": "妻", "message": "いいね"},
+                {"speaker": "息子", "message": "やったー"},
+            ],
+            "destination": "海",
+            "activities": ["海水浴"],
+            "plan_response": "UNKNOWN",
+        }, ensure_ascii=False))
+        for tool in toolset.tools:
+            tool.model = CountingModel("{}")
+
+        context = SimpleNamespace(state=_state())
+        results = asyncio.run(toolset.respond_all(context, "海に行こう"))
+
+        assert toolset.model.calls == 1
+        assert all(tool.model.calls == 0 for tool in toolset.tools)
+        assert [r["message"] for r in results] == ["いいね", "やったー"]
+        assert context.state["family_trip_info"] == {"destination": "海", "activities": ["海水浴"]}
+
+    def test_fallback_to_per_member_on_parse_error(self):
+        """JSON解析に失敗したら個別生成にフォールバック"""
+        toolset = FamilyToolSet([_persona("あゆみ", "妻"), _persona("たかし", "息子")], mode="ensemble")
+        toolset.model = CountingModel("not json")
+        for tool in toolset.tools:
+            tool.model = CountingModel(json.dumps({"message": f"{tool.persona.role}です"}, ensure_ascii=False))
+
+        context = SimpleNamespace(state=_state())
+        results = asyncio.run(toolset.respond_all(context, "こんにちは"))
+
+        assert [r["message"] for r in results] == ["妻です", "息子です"]
+        assert all(tool.model.calls == 1 for tool in toolset.tools)
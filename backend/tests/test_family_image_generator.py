@@ -0,0 +1,73 @@
+"""
+家族画像生成（子供の画像の並行生成）のテスト
+"""
+import asyncio
+import io
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image
+
+from agents.hera import image_generator
+from agents.hera.image_generator import FamilyImageGenerator
+from utils.async_storage import AsyncStorageManager
+from utils.storage_manager import LocalStorageManager
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color=color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class FakeModels:
+    """1回の生成に0.3秒かかる画像生成モデル"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.parent_inputs = []
+
+    def generate_content(self, model, contents):
+        with self.lock:
+            self.parent_inputs.append(tuple(id(part["inline_data"]["data"]) for part in contents[1:]))
+        time.sleep(0.3)
+        part = SimpleNamespace(inline_data=SimpleNamespace(data=b"child image", mime_type="image/png"), text=None)
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+class TestFamilyImageGenerator:
+    """FamilyImageGeneratorのテスト"""
+
+    def test_children_are_generated_concurrently(self, tmp_path, monkeypatch):
+        """両親の画像は1度だけ変換し、子供の画像は並行して生成してストレージに保存する"""
+        monkeypatch.setenv('GEMINI_API_KEY', 'dummy')
+        conversions = []
+        original = image_generator._to_png
+        monkeypatch.setattr(image_generator, '_to_png', lambda data: conversions.append(data) or original(data))
+
+        local = LocalStorageManager(str(tmp_path))
+        local.save_file("s1", "photos/user.png", _png('white'))
+        local.save_file("s1", "photos/partner.png", _png('black'))
+
+        generator = FamilyImageGenerator(storage=AsyncStorageManager(local), max_concurrency=3)
+        generator.client = SimpleNamespace(models=FakeModels())
+        generator.current_session = "s1"
+        children = [{"name": f"child{i}", "desired_gender": "female"} for i in range(3)]
+
+        async def scenario():
+            user_image_path = await generator.get_user_image_path("s1")
+            started = time.monotonic()
+            images = await generator.generate_children_images(children, "photos/partner.png", user_image_path)
+            return images, time.monotonic() - started
+
+        images, elapsed = asyncio.run(scenario())
+
+        assert elapsed < 0.6
+        assert len(conversions) == 2
+        assert len(set(generator.client.models.parent_inputs)) == 1
+        assert [image["image_path"] for image in images] == [f"photos/child_child{i}.png" for i in range(3)]
+        assert local.load_file("s1", "photos/child_child0.png") == b"child image"
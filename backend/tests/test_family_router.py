@@ -0,0 +1,64 @@
+"""
+家族会話の発話者ルーティングのテスト
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agents.family.models import Persona
+from agents.family.router import SpeakerRouter
+from agents.family.tooling import FamilyToolSet
+
+
+def _toolset():
+    personas = [
+        Persona(name="あゆみ", role="妻", speaking_style="", traits=[], goals="", background=""),
+        Persona(name="たかしくん", role="長男", speaking_style="", traits=[], goals="", background=""),
+        Persona(name="えり", role="長女", speaking_style="", traits=[], goals="", background=""),
+        Persona(name="けん", role="次男", speaking_style="", traits=[], goals="", background=""),
+    ]
+    return FamilyToolSet(personas)
+
+
+def _roles(tools):
+    return [tool.persona.role for tool in tools]
+
+
+class TestSpeakerRouter:
+    """SpeakerRouterのテスト"""
+
+    def test_addressed_member_only(self):
+        """名前で呼びかけられたメンバーだけが応答する"""
+        tools = _toolset().tools
+        router = SpeakerRouter(max_speakers=2)
+        assert _roles(router.select(tools, {}, "たかし、今日は何して遊ぶ？")) == ["長男"]
+        assert _roles(router.select(tools, {}, "えりと長男はどう思う？")) == ["長男", "長女"]
+
+    def test_group_address_selects_everyone(self):
+        """全体への呼びかけでは全員が応答する"""
+        tools = _toolset().tools
+        assert len(SpeakerRouter(max_speakers=2).select(tools, {}, "みんなはどこに行きたい？")) == 4
+
+    def test_rotation_avoids_previous_speaker(self):
+        """直前の発話者を避け、話していないメンバーを優先する"""
+        tools = _toolset().tools
+        state = {"family_conversation_log": [
+            {"speaker": "user", "message": "やあ"},
+            {"speaker": "妻", "message": "こんにちは"},
+            {"speaker": "長男", "message": "遊ぼう"},
+        ]}
+        assert _roles(SpeakerRouter(max_speakers=2).select(tools, state, "今日はいい天気だね")) == ["長女", "次男"]
+
+    def test_partner_included_while_plan_pending(self):
+        """計画の提案中はパートナーを必ず含める"""
+        tools = _toolset().tools
+        state = {
+            "family_plan_prompted": True,
+            "family_conversation_log": [{"speaker": "妻", "message": "この計画でいい？"}],
+        }
+        assert _roles(SpeakerRouter(max_speakers=2).select(tools, state, "いいよ")) == ["妻", "長男"]
+
+    def test_unlimited(self):
+        """上限0以下では全員が応答する"""
+        tools = _toolset().tools
+        assert len(SpeakerRouter(max_speakers=0).select(tools, {}, "こんにちは")) == 4
@@ -0,0 +1,62 @@
+"""
+FamilyConversationSession の保存処理のテスト（イベントループを塞がず、状態のコピーを保存する）
+"""
+import os
+import sys
+import threading
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def app_module(monkeypatch, tmp_path):
+    """APIモジュール（読み込み時のエージェント初期化にAPIキーが必要なため、テスト中だけ設定する）"""
+    monkeypatch.setenv('GEMINI_API_KEY', os.getenv('GEMINI_API_KEY') or 'dummy')
+    monkeypatch.setenv('SESSIONS_DIR', str(tmp_path))
+    from api import app
+    return app
+
+
+class TestFamilySessionPersist:
+    """FamilyConversationSession.persist / snapshot のテスト"""
+
+    def test_persist_runs_off_the_event_loop(self, app_module, monkeypatch):
+        """保存はスレッドプールで行い、保存中に状態が変わっても保存する値は変わらない"""
+        saved = {}
+        threads = set()
+
+        def fake_save(session_id, key, data):
+            threads.add(threading.current_thread().name)
+            saved[key] = data
+
+        monkeypatch.setattr(app_module, 'save_session_data', fake_save)
+        session = app_module.FamilyConversationSession('persist-test')
+        session.state["family_conversation_log"] = [{"speaker": "user", "message": "こんにちは"}]
+        session.state["family_trip_info"] = {"destination": "京都"}
+
+        loop_thread = app_module.run_async(_current_thread_name())
+        app_module.run_async(session.persist())
+        session.state["family_trip_info"]["destination"] = "大阪"
+
+        assert loop_thread not in threads
+        assert saved['family_conversation'] == [{"speaker": "user", "message": "こんにちは"}]
+        assert saved['family_trip_info'] == {"destination": "京都"}
+        assert 'family_plan' not in saved
+
+    def test_snapshot_reports_plan_ready(self, app_module):
+        """snapshot は状態のコピーと計画生成の要否を返す"""
+        session = app_module.FamilyConversationSession('snapshot-test')
+        assert app_module.run_async(session.snapshot())['plan_ready'] is False
+
+        session.state["family_plan_confirmed"] = True
+        status = app_module.run_async(session.snapshot())
+        assert status['plan_ready'] is True
+        status['family_trip_info']['destination'] = "変更"
+        assert session.state["family_trip_info"] == {}
+
+        session.state["family_plan_generated"] = True
+        assert app_module.run_async(session.snapshot())['plan_ready'] is False
+
+
+async def _current_thread_name():
+    return threading.current_thread().name
@@ -0,0 +1,62 @@
+"""
+家族旅行ストーリーのストリーミング生成テスト
+"""
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agents.family.models import Persona
+from agents.family.letter_generator import LetterGenerator
+from agents.family.story_generator import StoryGenerator
+
+
+class StreamingModel:
+    """指定した断片を順に返すダミーモデル"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.prompts.append(prompt)
+        if stream:
+            return (SimpleNamespace(text=chunk) for chunk in self.chunks)
+        return SimpleNamespace(text="".join(self.chunks))
+
+
+def _personas():
+    return [Persona(name="あゆみ", role="妻", speaking_style="", traits=["明るい"], goals="", background="")]
+
+
+TRIP_INFO = {"destination": "水族館", "activities": ["イルカショー", "ペンギン見学"]}
+
+
+class TestStoryStream:
+    """StoryGenerator.stream_storyとLetterGeneratorのテスト"""
+
+    def test_stream_story_yields_paragraphs(self):
+        """断片の境界に関係なく、空行区切りの段落単位で返す"""
+        generator = StoryGenerator()
+        generator.model = StreamingModel(["週末の朝、", "家族は\n", "\n水族館へ。", "\n\n", "イルカが跳ねた。\n\n  \n", "楽しみだね！"])
+
+        async def collect():
+            return [paragraph async for paragraph in generator.stream_story([], TRIP_INFO, _personas())]
+
+        assert asyncio.run(collect()) == ["週末の朝、家族は", "水族館へ。", "イルカが跳ねた。", "楽しみだね！"]
+
+    def test_letter_from_partial_story(self):
+        """ストーリーが未生成でも旅行情報から手紙を生成できる"""
+        generator = LetterGenerator()
+        generator.model = StreamingModel(["未来のあなたへ"])
+
+        letter = asyncio.run(generator.generate_letter(
+            story="",
+            trip_info=TRIP_INFO,
+            family_members=_personas(),
+            story_is_partial=True,
+        ))
+
+        assert letter == "未来のあなたへ"
+        assert "物語は作成中です" in generator.model.prompts[0]
@@ -0,0 +1,288 @@
+"""
+Firestoreセッションの会話履歴追記・読み込みのテスト
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from api.session.firebase_session_manager import FirebaseSessionManager
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.path.rsplit("/", 1)[-1]
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def collection(self, name):
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+    def get(self, **kwargs):
+        self.db.reads += 1
+        return FakeSnapshot(self, self.db.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        self.db.writes += 1
+        if merge:
+            self.db.docs.setdefault(self.path, {}).update(data)
+        else:
+            self.db.docs[self.path] = dict(data)
+
+    def update(self, data):
+        self.db.writes += 1
+        self.db.docs[self.path].update(data)
+
+
+class FakeCollection:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def document(self, doc_id):
+        return FakeDocument(self.db, f"{self.path}/{doc_id}")
+
+    def select(self, fields):
+        return self
+
+    def order_by(self, field):
+        return self
+
+    def get(self):
+        self.db.round_trips += 1
+        return sorted(self.stream(), key=lambda doc: doc.to_dict().get("orderIndex", 0))
+
+    def stream(self):
+        prefix = f"{self.path}/"
+        for path, data in sorted(self.db.docs.items()):
+            if path.startswith(prefix) and "/" not in path[len(prefix):]:
+                self.db.reads += 1
+                yield FakeSnapshot(FakeDocument(self.db, path), data)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        if merge:
+            self.ops.append(lambda: self.db.docs.setdefault(ref.path, {}).update(data))
+        else:
+            self.ops.append(lambda: self.db.docs.__setitem__(ref.path, dict(data)))
+
+    def update(self, ref, data):
+        self.ops.append(lambda: self.db.docs[ref.path].update(data))
+
+    def delete(self, ref):
+        self.ops.append(lambda: self.db.docs.pop(ref.path, None))
+
+    def commit(self):
+        self.db.commits += 1
+        self.db.writes += len(self.ops)
+        for op in self.ops:
+            op()
+
+
+class FakeFirestore:
+    """読み書き回数を数えるだけの最小限のFirestore"""
+
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+        self.round_trips = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def get_all(self, refs):
+        self.round_trips += 1
+        for ref in refs:
+            self.reads += 1
+            yield FakeSnapshot(ref, self.docs.get(ref.path))
+
+
+def _make_manager(mock_mode=False, snapshot_enabled=False):
+    manager = FirebaseSessionManager.__new__(FirebaseSessionManager)
+    manager.db = None if mock_mode else FakeFirestore()
+    manager.mock_mode = mock_mode
+    manager.mock_storage = {}
+    manager.load_budget = 5
+    manager.snapshot_enabled = snapshot_enabled
+    manager._read_executor = ThreadPoolExecutor(max_workers=4)
+    manager._conversation_counts = OrderedDict()
+    return manager
+
+
+def _history(count):
+    return [{"speaker": "user" if i % 2 == 0 else "hera", "message": f"m{i}"} for i in range(count)]
+
+
+class TestFirestoreConversationAppend:
+    """会話履歴の追記保存のテスト"""
+
+    def test_only_new_messages_are_written(self):
+        """保存済みの件数より後ろのメッセージだけを書き込む"""
+        manager = _make_manager()
+        db = manager.db
+        manager.save("s1", {"created_at": "2025-01-01T00:00:00", "conversation_history": _history(10)})
+
+        db.reads = db.writes = 0
+        manager.save("s1", {"conversation_history": _history(12)})
+
+        # 読み取りなしで、メインドキュメント・新規2件・カウンターの書き込みのみ
+        assert db.reads == 0
+        assert db.writes == 4
+        assert db.docs["sessions/s1"]["conversationCount"] == 12
+
+        conversations = [
+            data for path, data in sorted(db.docs.items())
+            if path.startswith("sessions/s1/conversations/")
+        ]
+        assert [c["message"] for c in conversations] == [f"m{i}" for i in range(12)]
+        assert [c["orderIndex"] for c in conversations] == list(range(12))
+
+    def test_shorter_history_is_rewritten(self):
+        """履歴が短くなった場合は全件を書き直す"""
+        manager = _make_manager()
+        manager.save("s1", {"family_conversation": _history(5)})
+        manager.save("s1", {"family_conversation": _history(2)})
+
+        paths = [path for path in manager.db.docs if path.startswith("sessions/s1/familyConversations/")]
+        assert len(paths) == 2
+        assert manager.db.docs["sessions/s1"]["familyConversationCount"] == 2
+
+    def test_mock_mode_appends(self):
+        """モックモードでも追記とorderIndexの採番が一致する"""
+        manager = _make_manager(mock_mode=True)
+        session_id = manager.create_session()
+        manager.save(session_id, {"conversation_history": _history(2)})
+        manager.add_conversation(session_id, "m2", "user")
+        manager.save(session_id, {"conversation_history": _history(4)})
+
+        conversations = manager.get_conversations(session_id)
+        assert [c["message"] for c in conversations] == ["m0", "m1", "m2", "m3"]
+        assert [c["orderIndex"] for c in conversations] == [0, 1, 2, 3]
+
+
+class TestFirestoreSessionLoad:
+    """セッション読み込みのテスト"""
+
+    def test_load_keys_batches_point_reads(self):
+        """プロファイル・メタデータはget_all 1回、会話履歴は並列のクエリ1回で取得する"""
+        manager = _make_manager()
+        manager.save("s1", {
+            "created_at": "2025-01-01T00:00:00",
+            "user_profile": {"name": "太郎"},
+            "conversation_history": _history(3),
+            "completion_job": {"status": "done"},
+        })
+        db = manager.db
+        db.round_trips = 0
+
+        data = manager.load_keys("s1", ["user_profile", "conversation_history", "completion_job", "created_at"])
+
+        assert data["user_profile"] == {"name": "太郎"}
+        assert data["completion_job"] == {"status": "done"}
+        assert [c["message"] for c in data["conversation_history"]] == ["m0", "m1", "m2"]
+        assert data["created_at"]
+        assert db.round_trips == 2
+        assert manager.load_keys("missing", ["user_profile"]) is None
+
+    def test_load_returns_all_parts(self):
+        """loadは並列取得した結果をまとめて返す"""
+        manager = _make_manager()
+        manager.save("s1", {
+            "created_at": "2025-01-01T00:00:00",
+            "user_profile": {"name": "太郎"},
+            "family_conversation": _history(2),
+            "family_plan": {"story": "..."},
+            "completed": True,
+        })
+
+        data = manager.load("s1")
+
+        assert data["user_profile"] == {"name": "太郎"}
+        assert len(data["family_conversation"]) == 2
+        assert data["family_plan"] == {"story": "..."}
+        assert data["completed"] is True
+        assert data["status"] == "active"
+        assert manager.load("missing") is None
+
+    def test_snapshot_serves_status_keys(self):
+        """スナップショット有効時はプロファイルと進捗フラグをスナップショット1件から読む"""
+        manager = _make_manager(snapshot_enabled=True)
+        manager.save("s1", {
+            "created_at": "2025-01-01T00:00:00",
+            "user_profile": {"name": "太郎"},
+            "completion_job": {"status": "running"},
+        })
+        manager.save("s1", {"completion_job": {"status": "done"}})
+        db = manager.db
+        db.reads = 0
+
+        data = manager.load_keys("s1", ["user_profile", "completion_job", "status"])
+
+        assert data == {"user_profile": {"name": "太郎"}, "completion_job": {"status": "done"}, "status": "active"}
+        assert db.reads == 1
+
+        # スナップショットのない既存セッションは通常の経路で読む
+        del db.docs["sessions/s1/snapshot/current"]
+        assert manager.load_keys("s1", ["user_profile"]) == {"user_profile": {"name": "太郎"}}
+
+    def test_save_without_prior_read(self):
+        """新規セッションの保存とメタデータの更新は読み込みなしで行う"""
+        manager = _make_manager(snapshot_enabled=True)
+        db = manager.db
+        manager.save("s1", {"created_at": "2025-01-01T00:00:00", "user_profile": {"name": "太郎"}})
+        manager.save("s1", {"family_plan": {"letter": "手紙"}, "completion_job": {"status": "done"}})
+
+        assert db.reads == 0
+        assert db.docs["sessions/s1"]["createdAt"] == "2025-01-01T00:00:00"
+        assert db.docs["sessions/s1"]["letter"] == "手紙"
+        handle = manager.get_or_none("s1", ["user_profile", "completion_job", "status"])
+        assert handle.get("user_profile") == {"name": "太郎"}
+        assert handle.get("completion_job") == {"status": "done"}
+        assert handle.get("status") == "active"
+        assert manager.get_or_none("missing", ["user_profile"]) is None
+
+    def test_slow_load_is_not_reported_as_missing(self):
+        """時間予算を超えた読み込みは「存在しない」（None）ではなくTimeoutErrorにする"""
+        manager = _make_manager()
+        manager.save("s1", {"created_at": "2025-01-01T00:00:00", "user_profile": {"name": "太郎"}})
+        manager.load_budget = 0.05
+        release = threading.Event()
+        get_all = manager.db.get_all
+
+        def slow_get_all(refs):
+            release.wait(5)
+            return get_all(refs)
+
+        manager.db.get_all = slow_get_all
+        try:
+            with pytest.raises(TimeoutError):
+                manager.load_keys("s1", ["user_profile"])
+            with pytest.raises(TimeoutError):
+                manager.load("s1")
+            with pytest.raises(TimeoutError):
+                manager.get_or_none("s1", ["user_profile"])
+        finally:
+            release.set()
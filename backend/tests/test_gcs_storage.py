@@ -0,0 +1,186 @@
+"""
+GCSStorageManagerのキャッシュと読み込みのテスト（GCSの代わりにメモリ上のバケットを使う）
+"""
+import os
+import sys
+from datetime import datetime, timezone
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from google.api_core.exceptions import NotFound, NotModified, PreconditionFailed
+
+from api.storage import gcs_storage
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.generation = None
+        self.size = None
+        self.updated = None
+        self.etag = None
+        self.md5_hash = None
+        self.content_type = None
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.calls.append(('upload', self.name))
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        generation = self.bucket.objects.get(self.name, (0, b''))[0] + 1
+        self.bucket.objects[self.name] = (generation, data)
+        self.generation = generation
+
+    def download_as_bytes(self, start=None, end=None, if_generation_match=None, if_generation_not_match=None):
+        self.bucket.calls.append(('download', self.name))
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+        generation, data = self.bucket.objects[self.name]
+        if if_generation_not_match == generation:
+            raise NotModified(self.name)
+        if if_generation_match is not None and if_generation_match != generation:
+            raise PreconditionFailed(self.name)
+        self.generation = generation
+        if start is not None:
+            return data[start:None if end is None else end + 1]
+        return data
+
+    def reload(self):
+        self.bucket.calls.append(('reload', self.name))
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+        self.generation, data = self.bucket.objects[self.name]
+        self.size = len(data)
+        self.updated = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.etag = f"etag-{self.generation}"
+        self.content_type = 'image/png'
+
+    def generate_signed_url(self, **kwargs):
+        self.bucket.calls.append(('sign', self.name))
+        return f"https://storage.example/{self.name}?sig={len(self.bucket.calls)}"
+
+    def exists(self):
+        self.bucket.calls.append(('exists', self.name))
+        return self.name in self.bucket.objects
+
+    def delete(self):
+        self.bucket.calls.append(('delete', self.name))
+        if self.bucket.objects.pop(self.name, None) is None:
+            raise NotFound(self.name)
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def copy_blob(self, blob, destination_bucket, new_name):
+        self.calls.append(('copy', blob.name, new_name))
+        if blob.name not in self.objects:
+            raise NotFound(blob.name)
+        data = self.objects[blob.name][1]
+        generation = self.objects.get(new_name, (0, b''))[0] + 1
+        self.objects[new_name] = (generation, data)
+        return FakeBlob(self, new_name)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    bucket = FakeBucket()
+    monkeypatch.setenv('FIREBASE_MOCK', 'false')
+    monkeypatch.setattr(gcs_storage, 'get_storage_bucket', lambda: bucket)
+    return gcs_storage.GCSStorageManager()
+
+
+class TestGCSStorageManager:
+    """GCSStorageManagerのテスト"""
+
+    def test_metadata_is_validated_by_generation(self, manager):
+        """キャッシュ済みのメタデータは条件付きダウンロード1回で返し、更新されたら読み直す"""
+        bucket = manager.bucket
+        manager.save_metadata("s1", "user_photo", {"image_url": "a"})
+        bucket.calls.clear()
+
+        loaded = manager.load_metadata("s1", "user_photo")
+        assert loaded == {"image_url": "a"}
+        assert bucket.calls == [('download', 'sessions/s1/metadata/user_photo.json')]
+
+        # 返した値を書き換えてもキャッシュは変わらない
+        loaded["image_url"] = "changed"
+        assert manager.load_metadata("s1", "user_photo") == {"image_url": "a"}
+
+        # 他のプロセスが書き換えた場合はgenerationが変わるので読み直す
+        bucket.objects["sessions/s1/metadata/user_photo.json"] = (99, b'{"image_url": "b"}')
+        assert manager.load_metadata("s1", "user_photo") == {"image_url": "b"}
+        assert manager.load_metadata("s1", "missing") is None
+
+    def test_single_round_trip_reads_and_cached_urls(self, manager):
+        """ファイルの読み込みは存在確認なしの1回、署名付きURLはオブジェクトごとに再利用する"""
+        bucket = manager.bucket
+        first_url = manager.save_file("s1", "photos/user.png", b"one")
+        second_url = manager.save_file("s1", "photos/user.png", b"two")
+        assert first_url == second_url
+        assert [call for call in bucket.calls if call[0] == 'sign'] == [('sign', 'sessions/s1/photos/user.png')]
+        assert manager.get_download_url("s1", "photos/user.png") == first_url
+
+        bucket.calls.clear()
+        assert manager.load_file("s1", "photos/user.png") == b"two"
+        assert manager.load_file("s1", "photos/missing.png") is None
+        assert [call[0] for call in bucket.calls] == ['download', 'download']
+
+    def test_upload_url_uses_shared_ticket(self, manager):
+        """直接アップロードのURLは他のストレージと同じ形式（タイムゾーン付きの期限）で返す"""
+        from datetime import datetime
+
+        upload = manager.create_upload_url("s1", "photos/user.png", "image/png", expires_in=60)
+        assert upload['url'].startswith("https://storage.example/sessions/s1/photos/user.png")
+        assert upload['method'] == 'PUT'
+        assert upload['headers'] == {'Content-Type': 'image/png'}
+        assert datetime.fromisoformat(upload['expires_at']).tzinfo is not None
+
+    def test_move_file_copies_within_bucket(self, manager):
+        """移動はバケット内のコピーと削除で行い、本体をダウンロードしない"""
+        bucket = manager.bucket
+        manager.save_file("s1", "photos/user.upload", b"new")
+        bucket.calls.clear()
+
+        manager.move_file("s1", "photos/user.upload", "photos/user.png")
+        assert bucket.objects["sessions/s1/photos/user.png"][1] == b"new"
+        assert "sessions/s1/photos/user.upload" not in bucket.objects
+        assert [call[0] for call in bucket.calls] == ['copy', 'delete']
+
+    def test_stat_and_ranged_reads(self, manager):
+        """属性はメタデータのみ取得し、読み込みは範囲指定のダウンロードをチャンクごとに行う"""
+        bucket = manager.bucket
+        data = bytes(range(256)) * 4
+        manager.save_file("s1", "photos/user.png", data)
+        bucket.calls.clear()
+
+        info = manager.stat_file("s1", "photos/user.png")
+        assert (info.size, info.etag, info.content_type) == (len(data), "etag-1", 'image/png')
+        assert info.last_modified is not None
+        assert manager.stat_file("s1", "photos/missing.png") is None
+        assert [call[0] for call in bucket.calls] == ['reload', 'reload']
+
+        bucket.calls.clear()
+        chunks = list(manager.open_file("s1", "photos/user.png", 100, 700, chunk_size=256))
+        assert b"".join(chunks) == data[100:700]
+        assert [len(chunk) for chunk in chunks] == [256, 256, 88]
+        assert [call[0] for call in bucket.calls] == ['download'] * 3
+
+        assert b"".join(manager.open_file("s1", "photos/user.png", 1000, chunk_size=256)) == data[1000:]
+        assert manager.open_file("s1", "photos/missing.png", 0, 10) is None
+        assert manager.open_file("s1", "photos/missing.png") is None
+
+    def test_ranged_read_fails_if_replaced(self, manager):
+        """読み込み中にファイルが置き換わった場合は、別の版の内容を混ぜずに失敗する"""
+        manager.save_file("s1", "photos/user.png", b"a" * 512)
+        chunks = manager.open_file("s1", "photos/user.png", 0, 512, chunk_size=256)
+        assert next(chunks) == b"a" * 256
+
+        manager.save_file("s1", "photos/user.png", b"b" * 512)
+        with pytest.raises(PreconditionFailed):
+            next(chunks)
@@ -0,0 +1,81 @@
+"""
+Heraの返答先行・完了処理後回し（バックグラウンドジョブ）のテスト
+"""
+import os
+import sys
+import json
+import asyncio
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.session_manager import FileSessionManager
+
+
+class TestDeferredCompletion:
+    """ADKHeraAgent.run(defer_completion=True) のテスト"""
+
+    def test_reply_returns_before_completion(self, tmp_path):
+        """返答は完了処理を待たずに返り、ジョブ状態が保存される"""
+        from agents.hera.adk_hera_agent import ADKHeraAgent
+
+        manager = FileSessionManager(str(tmp_path))
+        agent = ADKHeraAgent(session_manager=manager)
+        release = asyncio.Event()
+
+        async def fake_generate(user_message):
+            return "ありがとうございます"
+
+        async def slow_evaluate(user_message, *, user_message_already_logged):
+            await release.wait()
+            return {"status": "COMPLETED", "completion_message": "完了です", "remaining_missing": []}
+
+        agent._generate_hera_response_with_extraction = fake_generate
+        agent._evaluate_session_completion = slow_evaluate
+
+        async def scenario():
+            await agent.start_session("s1")
+            payload = json.loads(await agent.run("これで十分です", session_id="s1", defer_completion=True))
+            job_while_running = agent.get_completion_job("s1")
+            release.set()
+            await asyncio.gather(*list(agent._background_tasks))
+            return payload, job_while_running
+
+        payload, job_while_running = asyncio.run(scenario())
+
+        assert payload["message"] == "ありがとうございます"
+        assert payload["session_status"] == "PENDING"
+        assert payload["completion_job"]["status"] == "pending"
+        assert job_while_running["status"] in ("pending", "running")
+
+        stored = manager.load("s1")["completion_job"]
+        assert stored["status"] == "completed"
+        assert stored["result"]["session_status"] == "COMPLETED"
+        assert stored["result"]["completion_message"] == "完了です"
+
+    def test_gated_turn_runs_inline(self, tmp_path):
+        """統合完了チェックが不要なターンはジョブを作らず、その場で判定結果を返す"""
+        from agents.hera.adk_hera_agent import ADKHeraAgent
+
+        manager = FileSessionManager(str(tmp_path))
+        agent = ADKHeraAgent(session_manager=manager)
+
+        async def fake_generate(user_message):
+            return "よろしくお願いします"
+
+        async def unexpected_check(*args, **kwargs):
+            raise AssertionError("統合完了チェックは呼ばれない")
+
+        agent._generate_hera_response_with_extraction = fake_generate
+        agent._unified_completion_check = unexpected_check
+
+        async def scenario():
+            await agent.start_session("s1")
+            payload = json.loads(await agent.run("こんにちは", session_id="s1", defer_completion=True))
+            return payload, list(agent._background_tasks)
+
+        payload, tasks = asyncio.run(scenario())
+
+        assert payload["session_status"] == "INCOMPLETE"
+        assert payload["missing_fields"]
+        assert "completion_job" not in payload
+        assert tasks == []
+        assert "completion_job" not in (manager.load("s1") or {})
@@ -0,0 +1,49 @@
+"""
+Heraのストリーミング返答分割のテスト
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agents.hera.reply_stream import EXTRACTION_DELIMITER, ReplyStreamSplitter
+
+
+def _feed_all(splitter, chunks):
+    emitted = [splitter.feed(chunk) for chunk in chunks]
+    emitted.append(splitter.finish())
+    return "".join(emitted)
+
+
+class TestReplyStreamSplitter:
+    """ReplyStreamSplitterのテスト"""
+
+    def test_delimiter_split_across_chunks(self):
+        """チャンク境界をまたぐ区切り行も本文に混ざらない"""
+        text = "はじめまして。お話を聞かせてね。\n" + EXTRACTION_DELIMITER + '\n```json\n{"age": 30}\n```'
+        chunks = [text[i:i + 5] for i in range(0, len(text), 5)]
+
+        splitter = ReplyStreamSplitter()
+        emitted = _feed_all(splitter, chunks)
+
+        assert EXTRACTION_DELIMITER not in emitted
+        assert "<<<" not in emitted
+        assert splitter.reply == "はじめまして。お話を聞かせてね。"
+        assert splitter.found_delimiter
+        assert splitter.extracted_info() == {"age": 30}
+
+    def test_text_is_emitted_without_waiting_for_delimiter(self):
+        """区切り行と無関係な本文はすぐに流す"""
+        splitter = ReplyStreamSplitter()
+        assert splitter.feed("こんにちは") == "こんにちは"
+        # 区切り行の先頭になりうる末尾だけ保留する
+        assert splitter.feed("。<<") == "。"
+        assert splitter.feed("まだ本文") == "<<まだ本文"
+
+    def test_missing_delimiter(self):
+        """区切り行がない場合は全文を本文として扱い、抽出情報は空"""
+        splitter = ReplyStreamSplitter()
+        emitted = _feed_all(splitter, ["ありがとう", "ございます<"])
+
+        assert emitted == "ありがとうございます<"
+        assert not splitter.found_delimiter
+        assert splitter.extracted_info() == {}
@@ -0,0 +1,107 @@
+"""
+Heraセッション状態レジストリのテスト
+"""
+import os
+import sys
+import json
+import asyncio
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agents.hera.session_state import HeraSessionRegistry, HeraSessionState
+from utils.session_manager import FileSessionManager
+
+
+def _factory(session_id):
+    return HeraSessionState(session_id=session_id, user_profile={}, session_state="collecting")
+
+
+class TestHeraSessionRegistry:
+    """HeraSessionRegistryのテスト"""
+
+    def test_get_returns_same_state(self):
+        """同じsession_idには同じ状態を返す"""
+        registry = HeraSessionRegistry(_factory, max_sessions=10, idle_ttl=0)
+        assert registry.get("a") is registry.get("a")
+        assert registry.get("a") is not registry.get("b")
+
+    def test_lru_eviction(self):
+        """最大数を超えると最も古いセッションを破棄"""
+        registry = HeraSessionRegistry(_factory, max_sessions=2, idle_ttl=0)
+        registry.get("a")
+        registry.get("b")
+        registry.get("a")  # aを最近使用に
+        registry.get("c")
+
+        assert "a" in registry
+        assert "b" not in registry
+        assert len(registry) == 2
+
+    def test_idle_ttl_eviction(self):
+        """アイドル時間を超えたセッションは再生成される"""
+        registry = HeraSessionRegistry(_factory, max_sessions=10, idle_ttl=60)
+        state = registry.get("a")
+        state.last_access -= 120
+
+        assert registry.get("a") is not state
+
+    def test_loader_rehydrates(self):
+        """未登録セッションはloaderで復元される"""
+        def loader(state):
+            state.conversation_history = [{"speaker": "user", "message": "こんにちは"}]
+
+        registry = HeraSessionRegistry(_factory, loader=loader, max_sessions=10, idle_ttl=0)
+        assert registry.get("a").conversation_history[0]["message"] == "こんにちは"
+        # resetでは復元しない
+        assert registry.reset("a").conversation_history == []
+
+    def test_locked_state_not_evicted(self):
+        """処理中のセッションは破棄されない"""
+        registry = HeraSessionRegistry(_factory, max_sessions=1, idle_ttl=0)
+        busy = registry.get("busy")
+
+        async def hold():
+            async with busy.lock:
+                registry.get("other")
+                return "busy" in registry
+
+        assert asyncio.run(hold()) is True
+
+
+class TestADKHeraAgentSessionIsolation:
+    """ADKHeraAgentのセッション分離テスト"""
+
+    def test_concurrent_sessions_do_not_share_state(self, tmp_path):
+        """並行するセッションのプロファイルと履歴が混ざらない"""
+        from agents.hera.adk_hera_agent import ADKHeraAgent
+
+        agent = ADKHeraAgent(session_manager=FileSessionManager(str(tmp_path)))
+
+        async def fake_generate(user_message):
+            await asyncio.sleep(0.01)
+            agent.user_profile.location = user_message
+            return f"reply:{user_message}"
+
+        async def fake_evaluate(user_message, *, user_message_already_logged):
+            return {"status": "INCOMPLETE", "completion_message": None, "remaining_missing": []}
+
+        agent._generate_hera_response_with_extraction = fake_generate
+        agent._evaluate_session_completion = fake_evaluate
+
+        async def scenario():
+            await asyncio.gather(agent.start_session("s1"), agent.start_session("s2"))
+            return await asyncio.gather(
+                agent.run("東京", session_id="s1"),
+                agent.run("大阪", session_id="s2"),
+            )
+
+        first, second = [json.loads(item) for item in asyncio.run(scenario())]
+
+        assert first["user_profile"]["location"] == "東京"
+        assert second["user_profile"]["location"] == "大阪"
+        assert [e["message"] for e in agent.get_conversation_history("s1")] == ["東京", "reply:東京"]
+
+        # メモリから破棄しても永続化データから復元される
+        agent._sessions.discard("s2")
+        restored = agent._sessions.get("s2")
+        assert restored.user_profile.location == "大阪"
+        assert len(restored.conversation_history) == 2
@@ -0,0 +1,143 @@
+"""
+バックグラウンドジョブキューのテスト
+"""
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.job_queue import (
+    JOB_FAILED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    Job,
+    JobQueue,
+    SessionJobStore,
+)
+from utils.session_manager import FileSessionManager
+
+
+def _make_queue(tmp_path, **kwargs):
+    store = SessionJobStore(FileSessionManager(str(tmp_path)))
+    kwargs.setdefault("workers", 1)
+    kwargs.setdefault("max_attempts", 3)
+    kwargs.setdefault("retry_backoff", 0)
+    return JobQueue(store, **kwargs)
+
+
+class TestJobQueue:
+    """JobQueueのテスト"""
+
+    def test_enqueue_is_idempotent(self, tmp_path):
+        """同じセッション・種別のジョブは1回だけ実行される"""
+        calls = []
+        release = threading.Event()
+
+        def handler(job):
+            calls.append(job.job_id)
+            release.wait(5)
+            return {"ok": True}
+
+        queue = _make_queue(tmp_path)
+        queue.register("images", handler)
+        queue.start()
+        try:
+            first = queue.enqueue("s1", "images")
+            second = queue.enqueue("s1", "images")
+            assert first is second
+            release.set()
+            job = queue.wait("s1", "images", timeout=5)
+            assert job.status == JOB_SUCCEEDED
+            # 成功済みのジョブは再登録しても実行されない
+            assert queue.enqueue("s1", "images").status == JOB_SUCCEEDED
+            assert calls == ["s1:images"]
+        finally:
+            queue.stop(timeout=2)
+
+    def test_priority_order(self, tmp_path):
+        """優先度の小さいジョブから実行される"""
+        order = []
+        queue = _make_queue(tmp_path)
+        queue.register("low", lambda job: order.append(job.job_type), priority=50)
+        queue.register("high", lambda job: order.append(job.job_type), priority=10)
+
+        queue.enqueue("s1", "low")
+        queue.enqueue("s1", "high")
+        queue.start()
+        try:
+            queue.wait("s1", "low", timeout=5)
+            queue.wait("s1", "high", timeout=5)
+            assert order == ["high", "low"]
+        finally:
+            queue.stop(timeout=2)
+
+    def test_retry_until_success(self, tmp_path):
+        """失敗したジョブは最大試行回数までリトライされる"""
+        attempts = []
+
+        def flaky(job):
+            attempts.append(job.attempts)
+            if len(attempts) < 3:
+                raise RuntimeError("一時的なエラー")
+            return {"attempt": job.attempts}
+
+        queue = _make_queue(tmp_path)
+        queue.register("plan", flaky)
+        queue.start()
+        try:
+            queue.enqueue("s1", "plan")
+            job = queue.wait("s1", "plan", timeout=5)
+            assert job.status == JOB_SUCCEEDED
+            assert job.result == {"attempt": 3}
+            assert attempts == [1, 2, 3]
+        finally:
+            queue.stop(timeout=2)
+
+    def test_failed_job_is_persisted(self, tmp_path):
+        """最終的に失敗したジョブの状態はセッションに保存され、別インスタンスから参照できる"""
+        def broken(job):
+            raise RuntimeError("生成に失敗")
+
+        queue = _make_queue(tmp_path, max_attempts=2)
+        queue.register("personas", broken)
+        queue.start()
+        try:
+            queue.enqueue("s1", "personas")
+            job = queue.wait("s1", "personas", timeout=5)
+            assert job.status == JOB_FAILED
+            assert job.attempts == 2
+        finally:
+            queue.stop(timeout=2)
+
+        reloaded = _make_queue(tmp_path)
+        stored = reloaded.get("s1", "personas")
+        assert stored.status == JOB_FAILED
+        assert stored.error == "生成に失敗"
+        assert [job.job_type for job in reloaded.list("s1")] == ["personas"]
+
+    def test_interrupted_job_is_recovered(self, tmp_path):
+        """実行中のまま保存されたジョブは参照時に再実行され、未登録の種別は失敗として記録される"""
+        store = SessionJobStore(FileSessionManager(str(tmp_path)))
+        store.save(Job(session_id="s1", job_type="images", status=JOB_RUNNING, attempts=1))
+        store.save(Job(session_id="s1", job_type="legacy", status=JOB_RUNNING, attempts=1))
+
+        queue = _make_queue(tmp_path)
+        queue.register("images", lambda job: {"attempt": job.attempts})
+        queue.start()
+        try:
+            jobs = {job.job_type: job for job in queue.list("s1")}
+            assert jobs["legacy"].status == JOB_FAILED
+            assert jobs["legacy"].error
+
+            job = queue.wait("s1", "images", timeout=5)
+            assert job.status == JOB_SUCCEEDED
+            assert job.result == {"attempt": 2}
+            # 終了したジョブは保存後にメモリから外れる（状態の更新と保存の間は待つ）
+            deadline = time.monotonic() + 5
+            while queue._jobs and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert queue._jobs == {}
+            assert queue.get("s1", "images").status == JOB_SUCCEEDED
+        finally:
+            queue.stop(timeout=2)
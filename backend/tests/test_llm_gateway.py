@@ -0,0 +1,101 @@
+"""
+LLMゲートウェイのテスト
+"""
+import os
+import sys
+import time
+import asyncio
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.llm_gateway import LLMGateway
+
+
+class SlowModel:
+    """generate_contentが同期的にブロックするダミーモデル"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.request_options = []
+
+    def generate_content(self, prompt, request_options=None):
+        self.request_options.append(request_options)
+        time.sleep(self.delay)
+        return f"ok:{prompt}"
+
+
+class TestLLMGateway:
+    """LLMGatewayのテスト"""
+
+    def test_calls_run_in_parallel(self):
+        """複数の呼び出しが並列に実行される"""
+        gateway = LLMGateway(max_concurrency=10, timeout=5)
+        model = SlowModel(0.2)
+
+        async def scenario():
+            started = time.monotonic()
+            results = await asyncio.gather(
+                *(gateway.generate_content(model, i) for i in range(10))
+            )
+            return results, time.monotonic() - started
+
+        results, elapsed = asyncio.run(scenario())
+        gateway.shutdown()
+
+        assert results == [f"ok:{i}" for i in range(10)]
+        assert elapsed < 1.0
+        assert model.request_options[0] == {"timeout": 5}
+
+    def test_event_loop_not_blocked(self):
+        """LLM呼び出し中もイベントループが応答する"""
+        gateway = LLMGateway(max_concurrency=2, timeout=5)
+        model = SlowModel(0.3)
+
+        async def scenario():
+            task = asyncio.create_task(gateway.generate_content(model, "x"))
+            ticks = 0
+            while not task.done():
+                await asyncio.sleep(0.01)
+                ticks += 1
+            return ticks
+
+        assert asyncio.run(scenario()) > 5
+        gateway.shutdown()
+
+    def test_timeout(self):
+        """タイムアウト時はTimeoutErrorを送出"""
+        gateway = LLMGateway(max_concurrency=1, timeout=0.05)
+
+        with pytest.raises(TimeoutError):
+            asyncio.run(gateway.generate_content(SlowModel(0.5), "x"))
+        with pytest.raises(TimeoutError):
+            gateway.generate_content_sync(SlowModel(0.5), "x")
+        gateway.shutdown()
+
+    def test_stream_content(self):
+        """ストリームの断片を順に返す（本文のない断片は読み飛ばす）"""
+
+        class Chunk:
+            def __init__(self, text):
+                self._text = text
+
+            @property
+            def text(self):
+                if self._text is None:
+                    raise ValueError("no parts")
+                return self._text
+
+        class StreamingModel:
+            def generate_content(self, prompt, stream=False, request_options=None):
+                assert stream is True
+                for text in ("こんに", None, "ちは", ""):
+                    time.sleep(0.01)
+                    yield Chunk(text)
+
+        gateway = LLMGateway(max_concurrency=2, timeout=5)
+
+        async def scenario():
+            return [text async for text in gateway.stream_content(StreamingModel(), "x")]
+
+        assert asyncio.run(scenario()) == ["こんに", "ちは"]
+        gateway.shutdown()
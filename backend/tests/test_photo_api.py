@@ -0,0 +1,186 @@
+"""
+画像配信・直接アップロードAPIのテスト（Flaskのテストクライアントとローカルストレージを使う）
+"""
+import os
+import sys
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.session_manager import FileSessionManager
+from utils.storage_manager import LocalStorageManager
+
+
+SESSION_ID = "photo-session"
+PNG_DATA = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+
+
+@pytest.fixture
+def app_module(monkeypatch, tmp_path):
+    """ローカルストレージ・ファイルセッションに差し替えたAPIモジュール"""
+    monkeypatch.setenv('GEMINI_API_KEY', os.getenv('GEMINI_API_KEY') or 'dummy')
+    monkeypatch.setenv('SESSIONS_DIR', str(tmp_path))
+    from api import app
+    session_mgr = FileSessionManager(str(tmp_path))
+    storage_mgr = LocalStorageManager(str(tmp_path))
+    monkeypatch.setattr(app, 'session_mgr', session_mgr)
+    monkeypatch.setattr(app, 'storage_mgr', storage_mgr)
+    session_mgr.save(SESSION_ID, {"status": "active"})
+    storage_mgr.save_file(SESSION_ID, "photos/user.png", PNG_DATA)
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+class TestGetPhoto:
+    """GET /api/sessions/<id>/photos/<filename> のテスト"""
+
+    def test_etag_and_not_modified(self, client, app_module):
+        """ETagを返し、If-None-Matchが一致すれば本体なしの304を返す"""
+        response = client.get(f"/api/sessions/{SESSION_ID}/photos/user.png")
+        assert response.status_code == 200
+        assert response.data == PNG_DATA
+        assert response.headers['Content-Type'] == 'image/png'
+        assert response.headers['Cache-Control'] == app_module.PHOTO_CACHE_CONTROL
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        etag = response.headers['ETag']
+
+        response = client.get(f"/api/sessions/{SESSION_ID}/photos/user.png", headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+
+        response = client.get(f"/api/sessions/{SESSION_ID}/photos/user.png", headers={'If-None-Match': '"other"'})
+        assert response.status_code == 200
+
+    def test_range_requests(self, client):
+        """単一範囲は206、範囲外は416、If-Rangeが一致しなければ全体を返す"""
+        response = client.get(f"/api/sessions/{SESSION_ID}/photos/user.png", headers={'Range': 'bytes=8-15'})
+        assert response.status_code == 206
+        assert response.data == PNG_DATA[8:16]
+        assert response.headers['Content-Range'] == f'bytes 8-15/{len(PNG_DATA)}'
+        assert response.headers['Content-Length'] == '8'
+
+        response = client.get(
+            f"/api/sessions/{SESSION_ID}/photos/user.png",
+            headers={'Range': f'bytes={len(PNG_DATA) + 10}-'},
+        )
+        assert response.status_code == 416
+        assert response.headers['Content-Range'] == f'bytes */{len(PNG_DATA)}'
+
+        response = client.get(
+            f"/api/sessions/{SESSION_ID}/photos/user.png",
+            headers={'Range': 'bytes=0-7', 'If-Range': '"stale"'},
+        )
+        assert response.status_code == 200
+        assert response.data == PNG_DATA
+
+    def test_immutable_cache_control(self, client, app_module):
+        """ETag付きのURLと内容のハッシュを含むファイル名は長期キャッシュ可能にする"""
+        etag = client.get(f"/api/sessions/{SESSION_ID}/photos/user.png").headers['ETag'].strip('"')
+        response = client.get(f"/api/sessions/{SESSION_ID}/photos/user.png?v={etag}")
+        assert response.headers['Cache-Control'] == app_module.PHOTO_IMMUTABLE_CACHE_CONTROL
+
+        response = client.get(f"/api/sessions/{SESSION_ID}/photos/user.png?v=stale")
+        assert response.headers['Cache-Control'] == app_module.PHOTO_CACHE_CONTROL
+
+        app_module.storage_mgr.save_file(SESSION_ID, "photos/partner.3f2a9c0d1e4b5a67.png", PNG_DATA)
+        response = client.get(f"/api/sessions/{SESSION_ID}/photos/partner.3f2a9c0d1e4b5a67.png")
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == app_module.PHOTO_IMMUTABLE_CACHE_CONTROL
+
+    def test_missing_photo_and_session(self, client):
+        """画像がなければ404、セッションがなければ404"""
+        assert client.get(f"/api/sessions/{SESSION_ID}/photos/missing.png").status_code == 404
+        response = client.get("/api/sessions/no-such-session/photos/user.png")
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'セッションが存在しません'
+
+    def test_signed_redirect_requires_session(self, client, app_module, monkeypatch):
+        """署名付きURLへのリダイレクトは、セッションが存在する場合のみ行う"""
+        monkeypatch.setattr(app_module, 'PHOTO_SIGNED_URL_REDIRECT', True)
+        monkeypatch.setattr(
+            app_module.storage_mgr, 'get_download_url',
+            lambda session_id, file_path: f"https://storage.example/{session_id}/{file_path}",
+        )
+        response = client.get(f"/api/sessions/{SESSION_ID}/photos/user.png")
+        assert response.status_code == 302
+        assert response.headers['Location'] == f"https://storage.example/{SESSION_ID}/photos/user.png"
+
+        response = client.get("/api/sessions/no-such-session/photos/user.png")
+        assert response.status_code == 404
+
+
+class TestSignedUpload:
+    """署名付きURLでの直接アップロード（upload-url → PUT → finalize）のテスト"""
+
+    def _upload_url(self, client):
+        response = client.post(f"/api/sessions/{SESSION_ID}/photos/user/upload-url", json={"content_type": "image/png"})
+        assert response.status_code == 200
+        return response.get_json()
+
+    def test_round_trip(self, client, app_module):
+        """発行したURLへPUTし、finalizeで検証した画像をETag付きURLで配信する"""
+        app_module.storage_mgr.discard_file(SESSION_ID, "photos/user.png")
+        ticket = self._upload_url(client)
+        upload = ticket['upload']
+        assert upload['method'] == 'PUT'
+        assert ticket['finalize_url'] == f"/api/sessions/{SESSION_ID}/photos/user/finalize"
+
+        response = client.put(upload['url'], data=PNG_DATA, headers=upload['headers'])
+        assert response.status_code == 204
+        # finalizeで検証するまでは配信しない
+        assert app_module.storage_mgr.stat_file(SESSION_ID, "photos/user.png") is None
+        assert client.get(f"/api/sessions/{SESSION_ID}/photos/user.upload").status_code == 404
+
+        response = client.post(ticket['finalize_url'])
+        assert response.status_code == 200
+        image_url = response.get_json()['image_url']
+        info = app_module.storage_mgr.stat_file(SESSION_ID, "photos/user.png")
+        assert image_url == f"/api/sessions/{SESSION_ID}/photos/user.png?v={info.etag}"
+        assert app_module.storage_mgr.stat_file(SESSION_ID, app_module.USER_PHOTO_UPLOAD_PATH) is None
+
+        response = client.get(image_url)
+        assert response.data == PNG_DATA
+        assert response.headers['Cache-Control'] == app_module.PHOTO_IMMUTABLE_CACHE_CONTROL
+
+    def test_tampered_or_expired_signature_is_rejected(self, client, app_module):
+        """署名の改ざん・別のパス・期限切れのURLは403"""
+        url = self._upload_url(client)['upload']['url']
+        tampered = url[:-1] + ('0' if url[-1] != '0' else '1')
+        assert client.put(tampered, data=PNG_DATA).status_code == 403
+        assert client.put(url.replace('photos/user.upload', 'photos/user.png'), data=PNG_DATA).status_code == 403
+
+        upload_path = app_module.USER_PHOTO_UPLOAD_PATH
+        expired = app_module.storage_mgr.create_upload_url(SESSION_ID, upload_path, "image/png", expires_in=-10)
+        assert client.put(expired['url'], data=PNG_DATA).status_code == 403
+        assert app_module.storage_mgr.stat_file(SESSION_ID, upload_path) is None
+
+    def test_size_limit(self, client, app_module, monkeypatch):
+        """上限を超えるPUTは413、上限を超える画像はfinalizeで破棄し、以前の画像は残す"""
+        monkeypatch.setattr(app_module, 'UPLOAD_MAX_BYTES', 64)
+        url = self._upload_url(client)['upload']['url']
+        assert client.put(url, data=PNG_DATA).status_code == 413
+
+        # ストレージへ直接アップロードした場合はPUTの時点で上限を確認できない
+        upload_path = app_module.USER_PHOTO_UPLOAD_PATH
+        app_module.storage_mgr.save_file(SESSION_ID, upload_path, PNG_DATA)
+        response = client.post(f"/api/sessions/{SESSION_ID}/photos/user/finalize")
+        assert response.status_code == 400
+        assert response.get_json()['error'] == '画像サイズが上限を超えています'
+        assert app_module.storage_mgr.stat_file(SESSION_ID, upload_path) is None
+        assert app_module.storage_mgr.load_file(SESSION_ID, "photos/user.png") == PNG_DATA
+
+    def test_finalize_rejects_missing_or_invalid_image(self, client, app_module):
+        """アップロードされていない場合と画像でない場合はfinalizeで400、以前の画像は残す"""
+        finalize_url = f"/api/sessions/{SESSION_ID}/photos/user/finalize"
+        url = self._upload_url(client)['upload']['url']
+        assert client.put(url, data=b'not an image').status_code == 204
+        response = client.post(finalize_url)
+        assert response.status_code == 400
+        assert app_module.storage_mgr.stat_file(SESSION_ID, app_module.USER_PHOTO_UPLOAD_PATH) is None
+        assert app_module.storage_mgr.load_file(SESSION_ID, "photos/user.png") == PNG_DATA
+
+        assert client.post(finalize_url).status_code == 400
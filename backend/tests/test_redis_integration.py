@@ -2,6 +2,8 @@
 Redis統合の統合テスト
 """
 import os
+import json
+import fnmatch
 import pytest
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -86,6 +88,126 @@ class TestRedisSessionManager:
         assert loaded_data["user_profile"]["partner_name"] == "山田花子"
         assert "読書" in loaded_data["user_profile"]["hobbies"]
 
+    def test_load_keys(self, redis_manager):
+        """指定キーのみの読み込みテスト"""
+        session_id = "test-session-005"
+        redis_manager.save(session_id, {"user_profile": {"name": "太郎"}, "family_plan": {"story": "..."}})
+
+        assert redis_manager.load_keys(session_id, ["user_profile", "missing"]) == {"user_profile": {"name": "太郎"}}
+        assert redis_manager.load_key(session_id, "missing", []) == []
+        assert redis_manager.load_keys("no-such-session", ["user_profile"]) is None
+
+    def test_partial_saves_are_merged(self, redis_manager):
+        """キーを分けて保存しても以前のキーが失われない"""
+        session_id = "test-session-006"
+        redis_manager.save(session_id, {"user_profile": {"name": "太郎"}})
+        redis_manager.save(session_id, {"conversation_history": ["こんにちは"]})
+
+        assert redis_manager.load(session_id) == {
+            "user_profile": {"name": "太郎"},
+            "conversation_history": ["こんにちは"],
+        }
+        assert redis_manager.redis.ttl(redis_manager._get_key(session_id)) > 0
+
+    def test_legacy_layout_is_migrated(self, redis_manager):
+        """旧形式（キーごとの文字列）のセッションを読み込み、ハッシュへ移行する"""
+        session_id = "test-session-007"
+        r = redis_manager.redis
+        r.setex(f"session:{session_id}:user_profile", 60, json.dumps({"name": "太郎"}))
+        r.setex(f"session:{session_id}:conversation_history", 60, json.dumps(["こんにちは"]))
+        # 旧形式の _meta は最後に保存したキーしか持っていない
+        r.setex(f"session:{session_id}:_meta", 60, json.dumps({"keys": ["conversation_history"]}))
+
+        assert redis_manager.exists(session_id)
+        assert redis_manager.load(session_id) == {
+            "user_profile": {"name": "太郎"},
+            "conversation_history": ["こんにちは"],
+        }
+        assert not r.exists(f"session:{session_id}:_meta")
+
+        redis_manager.delete(session_id)
+        assert not redis_manager.exists(session_id)
+
+
+class _MemoryRedis:
+    """移行処理のテスト用の最小限のインメモリRedis（文字列とハッシュのみ）"""
+
+    def __init__(self):
+        self.data = {}
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def exists(self, *keys):
+        return sum(key in self.data for key in keys)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match, count=None):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+
+class _MemoryPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((getattr(self.redis, name), args, kwargs))
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.calls]
+
+
+class TestRedisLegacyMigration:
+    """旧形式からの移行処理のテスト（Redisサーバーなしで実行する）"""
+
+    @pytest.fixture
+    def memory_manager(self):
+        manager = RedisSessionManager.__new__(RedisSessionManager)
+        manager.redis = _MemoryRedis()
+        manager.ttl = 60
+        manager._migration_checked = set()
+        return manager
+
+    def test_storage_metadata_survives_migration(self, memory_manager):
+        """同じセッションIDのストレージのメタデータは移行・削除の対象にしない"""
+        session_id = "test-session-008"
+        r = memory_manager.redis
+        r.setex(f"session:{session_id}:user_profile", 60, json.dumps({"name": "太郎"}))
+        r.setex(f"session:{session_id}:_meta", 60, json.dumps({"keys": ["user_profile"]}))
+        storage_key = f"session:{session_id}:meta:photos/user.png"
+        r.setex(storage_key, 60, json.dumps({"size": 10}))
+
+        assert memory_manager.load(session_id) == {"user_profile": {"name": "太郎"}}
+        assert r.get(storage_key) == json.dumps({"size": 10})
+        assert not any(field.startswith("meta:") for field in r.hgetall(f"session:{session_id}"))
+
+        r.setex(f"session:{session_id}:_meta", 60, json.dumps({"keys": []}))
+        memory_manager.delete(session_id)
+        assert not memory_manager.exists(session_id)
+        assert r.get(storage_key) == json.dumps({"size": 10})
+
 
 class TestFileSessionManager:
     """FileSessionManagerの統合テスト"""
@@ -140,6 +262,92 @@ class TestFileSessionManager:
         file_manager.delete(session_id)
         assert not file_manager.exists(session_id)
 
+    def test_load_keys(self, file_manager, monkeypatch):
+        """指定キーのファイルのみ読み込むテスト"""
+        session_id = "test-session-104"
+        file_manager.save(session_id, {
+            "user_profile": {"name": "太郎"},
+            "conversation_history": ["こんにちは"],
+            "family_plan": {"story": "..."},
+        })
+
+        # 全ファイルを走査するload()は呼ばれない
+        monkeypatch.setattr(file_manager, "load", lambda *_: pytest.fail("load() should not be called"))
+
+        assert file_manager.load_keys(session_id, ["user_profile", "missing"]) == {"user_profile": {"name": "太郎"}}
+        assert file_manager.load_key(session_id, "conversation_history") == ["こんにちは"]
+        assert file_manager.load_key(session_id, "missing", {}) == {}
+        assert file_manager.load_keys("no-such-session", ["user_profile"]) is None
+
+    def test_conversation_is_appended(self, file_manager):
+        """会話履歴は追加分のみJSONLに追記し、変更があれば書き直す"""
+        session_id = "test-session-105"
+        history = [{"speaker": "user", "message": f"m{i}"} for i in range(3)]
+        file_manager.save(session_id, {"conversation_history": history[:2]})
+        session_dir = file_manager._get_session_path(session_id)
+        jsonl_path = os.path.join(session_dir, "conversation_history.jsonl")
+        size = os.path.getsize(jsonl_path)
+
+        file_manager.save(session_id, {"conversation_history": history})
+        with open(jsonl_path, "rb") as f:
+            assert f.read()[:size].count(b"\n") == 2
+        assert file_manager.load_key(session_id, "conversation_history") == history
+        assert file_manager.load_messages(session_id, start=-2) == history[1:]
+        assert file_manager.load_messages(session_id, start=1, limit=1) == history[1:2]
+
+        # 既存メッセージの変更は全体を書き直す
+        edited = [{"speaker": "user", "message": "edited"}] + history[1:2]
+        file_manager.save(session_id, {"conversation_history": edited})
+        assert file_manager.load(session_id)["conversation_history"] == edited
+
+        # 索引がなくても本体から再構築して読める
+        os.remove(os.path.join(session_dir, "conversation_history.idx"))
+        assert file_manager.load_messages(session_id, start=-1) == history[1:2]
+
+    def test_early_edit_is_not_dropped(self, file_manager):
+        """件数が同じか増えていても、先頭側のメッセージの変更は書き直して反映する"""
+        session_id = "test-session-107"
+        history = [{"speaker": "user", "message": f"m{i}"} for i in range(3)]
+        file_manager.save(session_id, {"conversation_history": history})
+
+        edited = [{"speaker": "user", "message": "edited"}] + history[1:]
+        file_manager.save(session_id, {"conversation_history": edited})
+        assert file_manager.load_key(session_id, "conversation_history") == edited
+
+        grown = edited[:1] + [{"speaker": "hera", "message": "changed"}] + history[2:] + history[:1]
+        file_manager.save(session_id, {"conversation_history": grown})
+        assert file_manager.load_key(session_id, "conversation_history") == grown
+
+    def test_legacy_index_is_rebuilt(self, file_manager):
+        """ハッシュのない旧形式の索引は本体から作り直し、変更の検出に使う"""
+        import struct
+        session_id = "test-session-108"
+        history = [{"speaker": "user", "message": f"m{i}"} for i in range(2)]
+        file_manager.save(session_id, {"conversation_history": history})
+        session_dir = file_manager._get_session_path(session_id)
+        jsonl_path = os.path.join(session_dir, "conversation_history.jsonl")
+        with open(jsonl_path, "rb") as f:
+            first_line = f.readline()
+        with open(os.path.join(session_dir, "conversation_history.idx"), "wb") as f:
+            f.write(struct.pack("<QQ", 0, len(first_line)))
+
+        assert file_manager.load_messages(session_id, start=-1) == history[1:]
+        edited = [{"speaker": "user", "message": "edited"}] + history[1:]
+        file_manager.save(session_id, {"conversation_history": edited})
+        assert file_manager.load_key(session_id, "conversation_history") == edited
+
+    def test_legacy_conversation_json(self, file_manager, tmp_path):
+        """旧形式の conversation_history.json も読み込め、次の保存でJSONLへ移行する"""
+        session_id = "test-session-106"
+        session_dir = tmp_path / session_id
+        session_dir.mkdir()
+        (session_dir / "conversation_history.json").write_text(json.dumps(["こんにちは"]), encoding="utf-8")
+
+        assert file_manager.load_key(session_id, "conversation_history") == ["こんにちは"]
+        file_manager.save(session_id, {"conversation_history": ["こんにちは", "はじめまして"]})
+        assert not (session_dir / "conversation_history.json").exists()
+        assert file_manager.load(session_id) == {"conversation_history": ["こんにちは", "はじめまして"]}
+
 
 class TestSessionManagerFactory:
     """セッションマネージャーファクトリーのテスト"""
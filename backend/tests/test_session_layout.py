@@ -0,0 +1,104 @@
+"""
+セッションディレクトリのシャーディングとセッションインデックスのテスト
+"""
+import json
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.session_layout import SessionIndex, migrate_sessions, session_dir, shard_name
+from utils.session_manager import FileSessionManager
+
+
+COMPLETE_PROFILE = {
+    "age": 30,
+    "gender": "male",
+    "relationship_status": "single",
+    "location": "東京",
+    "income_range": "500-700万円",
+    "user_personality_traits": {"openness": 0.6, "extraversion": 0.4},
+    "partner_face_description": "優しい目元",
+    "children_info": [{"name": "花子", "desired_gender": "female"}],
+    "ideal_partner": {"name": "さくら", "temperament": "穏やか", "appearance": "笑顔が素敵"},
+}
+
+
+class TestSessionLayout:
+    """シャーディング構成とインデックスのテスト"""
+
+    def test_sharded_path_and_legacy_fallback(self, tmp_path):
+        """新規セッションはシャード配下に作り、旧構成のディレクトリはそのまま使う"""
+        base_dir = str(tmp_path)
+        assert session_dir(base_dir, "abcdef") == os.path.join(base_dir, "ab", "abcdef")
+
+        os.makedirs(os.path.join(base_dir, "legacy-session"))
+        assert session_dir(base_dir, "legacy-session") == os.path.join(base_dir, "legacy-session")
+
+    def test_index_tracks_latest_session_with_profile(self, tmp_path):
+        """保存のたびにインデックスを更新し、プロファイル（age）のある最新のセッションを返す"""
+        index = SessionIndex(str(tmp_path / "index.sqlite3"))
+        manager = FileSessionManager(str(tmp_path / "sessions"), index=index)
+
+        manager.save("session-a", {"user_profile": COMPLETE_PROFILE})
+        manager.save("session-b", {"user_profile": {"age": 20}})
+        manager.save("session-c", {"user_profile": {"name": "太郎"}})
+        assert index.latest_session() == "session-c"
+        assert index.latest_session(has_profile=True) == "session-b"
+
+        manager.delete("session-b")
+        assert index.latest_session(has_profile=True) == "session-a"
+        manager.delete("session-a")
+        assert index.latest_session(has_profile=True) is None
+
+    def test_migrate_and_rebuild(self, tmp_path):
+        """旧構成のディレクトリをシャードへ移し、インデックスを再構築する"""
+        base_dir = str(tmp_path)
+        for session_id, profile in (("session-old", COMPLETE_PROFILE), ("other-old", {})):
+            os.makedirs(os.path.join(base_dir, session_id))
+            with open(os.path.join(base_dir, session_id, "user_profile.json"), "w", encoding="utf-8") as f:
+                json.dump(profile, f)
+        os.makedirs(os.path.join(base_dir, "generated_content"))
+
+        assert migrate_sessions(base_dir) == 2
+        assert os.path.isdir(os.path.join(base_dir, "se", "session-old"))
+        assert os.path.isdir(os.path.join(base_dir, "generated_content"))
+
+        index = SessionIndex(str(tmp_path / "index.sqlite3"))
+        assert index.rebuild(base_dir) == 2
+        assert index.latest_session(has_profile=True) == "session-old"
+
+    def test_empty_index_is_built_from_existing_sessions(self, tmp_path):
+        """インデックスが空なら既存のセッションディレクトリから作成し、新しい順に返す"""
+        base_dir = str(tmp_path / "sessions")
+        for updated_at, session_id in ((100, "session-old"), (200, "session-new")):
+            path = os.path.join(base_dir, shard_name(session_id), session_id)
+            os.makedirs(path)
+            with open(os.path.join(path, "user_profile.json"), "w", encoding="utf-8") as f:
+                json.dump({"age": 30}, f)
+            os.utime(os.path.join(path, "user_profile.json"), (updated_at, updated_at))
+            os.utime(path, (updated_at, updated_at))
+
+        index = SessionIndex(str(tmp_path / "index.sqlite3"), base_dir=base_dir)
+        assert index.latest_session() == "session-new"
+        assert index.latest_session(has_profile=True) == "session-new"
+
+    def test_legacy_index_is_rebuilt(self, tmp_path):
+        """profile_complete 列を持つ旧形式のインデックスは作り直す"""
+        import sqlite3
+        base_dir = str(tmp_path / "sessions")
+        path = os.path.join(base_dir, shard_name("session-a"), "session-a")
+        os.makedirs(path)
+        with open(os.path.join(path, "user_profile.json"), "w", encoding="utf-8") as f:
+            json.dump({"age": 30}, f)
+        db_path = str(tmp_path / "index.sqlite3")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE session_index (session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, "
+            "profile_complete INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("INSERT INTO session_index VALUES ('session-a', 1, 0)")
+        conn.commit()
+        conn.close()
+
+        index = SessionIndex(db_path, base_dir=base_dir)
+        assert index.latest_session(has_profile=True) == "session-a"
@@ -0,0 +1,129 @@
+"""
+SQLiteセッション管理のテスト
+"""
+import os
+import sys
+import threading
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.session_manager import SqliteSessionManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SqliteSessionManager(str(tmp_path / "sessions.sqlite3"))
+    yield manager
+    manager.close()
+
+
+def _history(count):
+    return [{"speaker": "user" if i % 2 == 0 else "hera", "message": f"m{i}"} for i in range(count)]
+
+
+class TestSqliteSessionManager:
+    """SqliteSessionManagerのテスト"""
+
+    def test_save_and_load(self, manager):
+        """種類の異なるキーを保存し、全体・指定キーのみで読み込める"""
+        manager.save("s1", {
+            "user_profile": {"name": "太郎"},
+            "conversation_history": _history(3),
+            "created_at": "2025-01-01T00:00:00",
+            "completion_job": None,
+        })
+
+        data = manager.load("s1")
+        assert data["user_profile"] == {"name": "太郎"}
+        assert [c["message"] for c in data["conversation_history"]] == ["m0", "m1", "m2"]
+        assert data["created_at"] == "2025-01-01T00:00:00"
+        assert data["completion_job"] is None
+
+        assert manager.load_keys("s1", ["user_profile", "family_plan"]) == {"user_profile": {"name": "太郎"}}
+        assert manager.load("missing") is None
+        assert manager.exists("s1")
+
+        manager.delete("s1")
+        assert not manager.exists("s1")
+        assert manager.load_keys("s1", ["user_profile"]) is None
+
+    def test_messages_are_appended(self, manager):
+        """会話履歴は追加分のみ行として追記し、短くなった場合は書き直す"""
+        manager.save("s1", {"conversation_history": _history(2)})
+        manager.save("s1", {"conversation_history": _history(5)})
+        assert len(manager.load_keys("s1", ["conversation_history"])["conversation_history"]) == 5
+
+        manager.save("s1", {"conversation_history": _history(1)})
+        conn = manager._connection()
+        (count,) = conn.execute("SELECT COUNT(*) FROM session_messages WHERE session_id = 's1'").fetchone()
+        assert count == 1
+
+    def test_edited_history_is_rewritten(self, manager):
+        """件数が同じか増えていても、保存済みのメッセージが変わっていれば書き直す"""
+        manager.save("s1", {"conversation_history": _history(3)})
+        edited = _history(3)
+        edited[2]["message"] = "edited"
+        manager.save("s1", {"conversation_history": edited})
+        assert manager.load_keys("s1", ["conversation_history"])["conversation_history"] == edited
+
+        replaced = [{"speaker": "user", "message": "new"}] + _history(4)[1:]
+        replaced[2]["message"] = "changed"
+        manager.save("s1", {"conversation_history": replaced})
+        assert manager.load_keys("s1", ["conversation_history"])["conversation_history"] == replaced
+
+    def test_early_edit_is_rewritten(self, manager):
+        """件数が同じでも、先頭側のメッセージの変更は書き直して反映する"""
+        manager.save("s1", {"conversation_history": _history(3)})
+        edited = _history(3)
+        edited[0]["message"] = "edited"
+        manager.save("s1", {"conversation_history": edited})
+        assert manager.load_key("s1", "conversation_history") == edited
+
+        grown = _history(5)
+        grown[1]["message"] = "changed"
+        manager.save("s1", {"conversation_history": grown})
+        assert manager.load_key("s1", "conversation_history") == grown
+
+    def test_database_without_digest_column(self, tmp_path):
+        """ハッシュ列のない既存のデータベースも読み書きでき、次の保存で書き直す"""
+        import sqlite3
+        db_path = str(tmp_path / "legacy.sqlite3")
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE sessions (session_id TEXT PRIMARY KEY, created_at TEXT NOT NULL, updated_at TEXT NOT NULL);
+            CREATE TABLE session_messages (
+                session_id TEXT NOT NULL, kind TEXT NOT NULL, order_index INTEGER NOT NULL, message TEXT NOT NULL,
+                PRIMARY KEY (session_id, kind, order_index)
+            ) WITHOUT ROWID;
+            INSERT INTO sessions VALUES ('s1', 'now', 'now');
+            INSERT INTO session_messages VALUES ('s1', 'conversation_history', 0, '"old"');
+        """)
+        conn.close()
+
+        manager = SqliteSessionManager(db_path)
+        try:
+            assert manager.load_key("s1", "conversation_history") == ["old"]
+            manager.save("s1", {"conversation_history": ["new", "next"]})
+            assert manager.load_key("s1", "conversation_history") == ["new", "next"]
+        finally:
+            manager.close()
+
+    def test_concurrent_writes(self, manager):
+        """複数スレッドからの同時書き込みでもデータが壊れない"""
+        def worker(index):
+            for turn in range(10):
+                manager.save(f"s{index}", {
+                    "user_profile": {"turn": turn},
+                    "conversation_history": _history(turn + 1),
+                })
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index in range(4):
+            data = manager.load(f"s{index}")
+            assert data["user_profile"] == {"turn": 9}
+            assert len(data["conversation_history"]) == 10
@@ -93,6 +93,65 @@ class TestLocalStorageManager:
             loaded_data = storage_manager.load_file(session_id, file_path)
             assert loaded_data == expected_data
 
+    def test_stat_and_stream_file(self, storage_manager):
+        """属性の取得と、指定範囲のチャンク読み出しテスト"""
+        session_id = "test-session-205"
+        file_data = bytes(range(256)) * 4
+        storage_manager.save_file(session_id, "photos/user.png", file_data)
+
+        info = storage_manager.stat_file(session_id, "photos/user.png")
+        assert info.size == len(file_data)
+        assert info.content_type == "image/png"
+
+        chunks = list(storage_manager.open_file(session_id, "photos/user.png", 100, 700, chunk_size=256))
+        assert b"".join(chunks) == file_data[100:700]
+        assert max(len(chunk) for chunk in chunks) <= 256
+
+        assert storage_manager.stat_file(session_id, "photos/missing.png") is None
+        assert storage_manager.open_file(session_id, "photos/missing.png") is None
+
+    def test_signed_upload_and_stream_save(self, storage_manager):
+        """署名付きアップロードURLの検証と、ストリームからの保存・破棄テスト"""
+        import io
+        from urllib.parse import parse_qs, urlparse
+        session_id = "test-session-206"
+
+        upload = storage_manager.create_upload_url(session_id, "photos/user.png", "image/png", expires_in=60)
+        assert upload["method"] == "PUT"
+        url = urlparse(upload["url"])
+        assert url.path == f"/api/sessions/{session_id}/uploads/photos/user.png"
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        assert storage_manager.verify_upload(session_id, "photos/user.png", query["expires"], query["signature"])
+        assert not storage_manager.verify_upload(session_id, "photos/other.png", query["expires"], query["signature"])
+        assert not storage_manager.verify_upload(session_id, "photos/user.png", "0", query["signature"])
+
+        # ローカルストレージはAPIから配信する
+        assert storage_manager.get_download_url(session_id, "photos/user.png") is None
+
+        file_data = b"\x89PNG\r\n\x1a\n" + bytes(1000)
+        storage_manager.save_stream(session_id, "photos/user.png", io.BytesIO(file_data))
+        assert storage_manager.load_file(session_id, "photos/user.png") == file_data
+
+        storage_manager.save_stream(session_id, "photos/user.upload", io.BytesIO(file_data[::-1]))
+        storage_manager.move_file(session_id, "photos/user.upload", "photos/user.png")
+        assert storage_manager.load_file(session_id, "photos/user.png") == file_data[::-1]
+        assert storage_manager.stat_file(session_id, "photos/user.upload") is None
+
+        storage_manager.discard_file(session_id, "photos/user.png")
+        assert storage_manager.stat_file(session_id, "photos/user.png") is None
+
+    def test_signing_key_is_shared_by_directory(self, tmp_path, monkeypatch):
+        """UPLOAD_SIGNING_SECRET が未設定でも、同じディレクトリを使うインスタンスは同じ鍵で検証できる"""
+        from urllib.parse import parse_qs, urlparse
+        from utils import storage_manager as storage_module
+        monkeypatch.setattr(storage_module, 'UPLOAD_SIGNING_SECRET', None)
+
+        upload = LocalStorageManager(str(tmp_path / "shared")).create_upload_url("s1", "photos/user.png", "image/png")
+        query = {k: v[0] for k, v in parse_qs(urlparse(upload["url"]).query).items()}
+        assert LocalStorageManager(str(tmp_path / "shared")).verify_upload("s1", "photos/user.png", query["expires"], query["signature"])
+        assert not LocalStorageManager(str(tmp_path / "other")).verify_upload("s1", "photos/user.png", query["expires"], query["signature"])
+        assert oct(os.stat(tmp_path / "shared" / storage_module.UPLOAD_SECRET_FILENAME).st_mode & 0o777) == '0o600'
+
 
 class TestStorageManagerFactory:
     """ストレージマネージャーファクトリーのテスト"""
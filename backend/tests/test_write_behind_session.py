@@ -0,0 +1,81 @@
+"""
+ライトビハインド方式のセッション管理のテスト
+"""
+import os
+import sys
+import time
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.session_manager import FileSessionManager
+from utils.write_behind_session import WriteBehindSessionManager
+
+
+class CountingSessionManager(FileSessionManager):
+    """save()の呼び出しを記録するファイルセッションマネージャー"""
+
+    def __init__(self, sessions_dir):
+        super().__init__(sessions_dir)
+        self.saves = []
+
+    def save(self, session_id, data):
+        self.saves.append((session_id, sorted(data.keys())))
+        super().save(session_id, data)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return CountingSessionManager(str(tmp_path))
+
+
+class TestWriteBehindSessionManager:
+    """WriteBehindSessionManagerのテスト"""
+
+    def test_turn_writes_are_coalesced(self, backend):
+        """1ターン内の複数回の保存は flush() で1回にまとまる"""
+        manager = WriteBehindSessionManager(backend, flush_delay=-1)
+        history = [{"speaker": "user", "message": "こんにちは"}]
+        manager.save("s1", {"conversation_history": list(history)})
+        history.append({"speaker": "hera", "message": "はじめまして"})
+        manager.save("s1", {"conversation_history": list(history)})
+        manager.save("s1", {"user_profile": {"name": "太郎"}, "conversation_history": list(history)})
+        manager.save("s1", {"user_profile": {"name": "太郎"}})
+
+        # 未反映でも読める（read-your-writes）
+        assert backend.saves == []
+        assert manager.exists("s1")
+        assert manager.load_key("s1", "conversation_history") == history
+
+        manager.flush("s1")
+
+        assert backend.saves == [("s1", ["conversation_history", "user_profile"])]
+        assert backend.load("s1") == {"conversation_history": history, "user_profile": {"name": "太郎"}}
+
+    def test_identical_writes_are_persisted(self, backend):
+        """前回と同じ値でも保存する（下位のデータが外部で変わっていても失われない）"""
+        manager = WriteBehindSessionManager(backend, flush_delay=-1)
+        manager.save("s1", {"family_trip_info": {"place": "京都"}})
+        manager.flush("s1")
+
+        # 別インスタンスやTTL切れなどで下位のデータが消えた場合
+        backend.delete("s1")
+        manager.save("s1", {"family_trip_info": {"place": "京都"}})
+        manager.flush("s1")
+
+        assert backend.saves == [("s1", ["family_trip_info"]), ("s1", ["family_trip_info"])]
+        assert backend.load_key("s1", "family_trip_info") == {"place": "京都"}
+        assert manager._flush_locks == {}
+
+    def test_timer_and_close_flush(self, backend):
+        """タイマーとclose()で未反映の変更が反映される"""
+        manager = WriteBehindSessionManager(backend, flush_delay=0.05)
+        manager.save("s1", {"user_profile": {"name": "太郎"}})
+        deadline = time.monotonic() + 2
+        while not backend.saves and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert backend.saves == [("s1", ["user_profile"])]
+
+        manager.flush_delay = -1
+        manager.save("s2", {"user_profile": {"name": "花子"}})
+        manager.close()
+        assert backend.load_key("s2", "user_profile") == {"name": "花子"}
@@ -0,0 +1,126 @@
+"""
+非同期ストレージ管理
+同期的な StorageManager の呼び出しを専用スレッドプールへ逃がし、
+複数ファイルの転送を同時実行数の上限付きで並行に行う（失敗時はバックオフ付きでリトライ）
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .storage_manager import FileInfo, StorageManager, create_storage_manager
+
+
+class AsyncStorageManager:
+    """StorageManager の非同期版（複数ファイルの並行転送と一括削除）"""
+
+    def __init__(
+        self,
+        storage: StorageManager,
+        max_concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+    ):
+        """
+        Args:
+            storage: 実際の読み書きを行う StorageManager
+            max_concurrency: 同時に実行する転送の上限（デフォルト: STORAGE_MAX_CONCURRENCY or 8）
+            max_attempts: 1操作あたりの最大試行回数（デフォルト: STORAGE_RETRY_ATTEMPTS or 3）
+            retry_backoff: リトライ待機の基準秒数。試行ごとに倍増（デフォルト: STORAGE_RETRY_BACKOFF_SEC or 0.5）
+        """
+        self.storage = storage
+        self.max_concurrency = max_concurrency or int(os.getenv('STORAGE_MAX_CONCURRENCY', '8'))
+        self.max_attempts = max(1, max_attempts or int(os.getenv('STORAGE_RETRY_ATTEMPTS', '3')))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(
+            os.getenv('STORAGE_RETRY_BACKOFF_SEC', '0.5')
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="storage",
+        )
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """同期関数をスレッドプールで実行（例外時はバックオフしてリトライ）"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+            except Exception as e:
+                if attempt >= self.max_attempts:
+                    raise
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                print(f"[WARN] ストレージ操作に失敗しました（{attempt}/{self.max_attempts}回目、{delay}秒後に再試行）: {e}")
+                await asyncio.sleep(delay)
+
+    async def save_file(self, session_id: str, file_path: str, file_data: bytes) -> str:
+        """ファイルを保存してURLを返す"""
+        return await self._run(self.storage.save_file, session_id, file_path, file_data)
+
+    async def load_file(self, session_id: str, file_path: str) -> Optional[bytes]:
+        """ファイルを読み込み"""
+        return await self._run(self.storage.load_file, session_id, file_path)
+
+    async def stat_file(self, session_id: str, file_path: str) -> Optional[FileInfo]:
+        """ファイルの属性を取得（存在しない場合はNone）"""
+        return await self._run(self.storage.stat_file, session_id, file_path)
+
+    async def save_metadata(self, session_id: str, key: str, data: Dict[str, Any]) -> None:
+        """メタデータを保存"""
+        await self._run(self.storage.save_metadata, session_id, key, data)
+
+    async def load_metadata(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """メタデータを読み込み"""
+        return await self._run(self.storage.load_metadata, session_id, key)
+
+    async def save_files(self, session_id: str, files: Dict[str, bytes]) -> Dict[str, str]:
+        """複数のファイルを並行して保存
+
+        Args:
+            session_id: セッションID
+            files: {ファイルパス: データ}
+
+        Returns:
+            {ファイルパス: URL}
+        """
+        urls = await asyncio.gather(*(
+            self.save_file(session_id, file_path, file_data)
+            for file_path, file_data in files.items()
+        ))
+        return dict(zip(files, urls))
+
+    async def load_files(self, session_id: str, file_paths: List[str]) -> Dict[str, Optional[bytes]]:
+        """複数のファイルを並行して読み込み
+
+        Returns:
+            {ファイルパス: データ}（存在しないファイルはNone）
+        """
+        contents = await asyncio.gather(*(self.load_file(session_id, file_path) for file_path in file_paths))
+        return dict(zip(file_paths, contents))
+
+    async def delete_files(self, session_id: str, file_paths: List[str]) -> None:
+        """複数のファイルを一括削除"""
+        await self._run(self.storage.delete_files, session_id, list(file_paths))
+
+    async def delete_session(self, session_id: str) -> None:
+        """セッション全体を削除"""
+        await self._run(self.storage.delete_session, session_id)
+
+
+_async_storage_manager: Optional[AsyncStorageManager] = None
+_async_storage_manager_lock = threading.Lock()
+
+
+def get_async_storage_manager(storage: Optional[StorageManager] = None) -> AsyncStorageManager:
+    """グローバル非同期ストレージマネージャーを取得
+
+    Args:
+        storage: 包む StorageManager（初回のみ有効、省略時は create_storage_manager()）
+    """
+    global _async_storage_manager
+    if _async_storage_manager is None:
+        with _async_storage_manager_lock:
+            if _async_storage_manager is None:
+                _async_storage_manager = AsyncStorageManager(storage or create_storage_manager())
+    return _async_storage_manager
@@ -0,0 +1,295 @@
+"""
+読み込みキャッシュ付きのセッション管理
+SessionManagerの前段にプロセス内のLRUキャッシュを置き、
+存在確認やステータスのポーリングをメモリから返す
+
+- キー単位のTTL（key_ttlsで個別に指定可能）と、保存時のライトスルー更新
+- キャッシュするセッション数の上限（超えたら最も古いセッションから破棄）
+- SESSION_CACHE_INVALIDATION_URL を指定すると、Redis Pub/Subで他のワーカー・インスタンスに
+  更新・削除を通知してキャッシュを破棄する
+- stats() でヒット率などを取得できる
+"""
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from .session_manager import SessionManager
+
+
+_MISSING = object()
+
+
+class _SessionEntry:
+    """1セッション分のキャッシュ"""
+
+    __slots__ = ("exists", "exists_expires", "values", "generation")
+
+    def __init__(self):
+        self.exists: Optional[bool] = None
+        self.exists_expires = 0.0
+        # key -> (value or _MISSING, expires_at)
+        self.values: Dict[str, tuple] = {}
+        # 保存・破棄のたびに増やし、読み込み中に更新されたら結果をキャッシュしない
+        self.generation = 0
+
+
+class CachedSessionManager(SessionManager):
+    """読み込み結果をキャッシュし、書き込みはそのまま下位へ反映するラッパー"""
+
+    def __init__(
+        self,
+        backend: SessionManager,
+        max_sessions: Optional[int] = None,
+        ttl: Optional[float] = None,
+        key_ttls: Optional[Dict[str, float]] = None,
+        invalidation_url: Optional[str] = None,
+        channel: Optional[str] = None,
+    ):
+        """
+        Args:
+            backend: 実際に読み書きするセッションマネージャー
+            max_sessions: キャッシュするセッション数の上限（デフォルト: SESSION_CACHE_SIZE or 1024）
+            ttl: キャッシュの有効期限（秒）（デフォルト: SESSION_CACHE_TTL_SEC or 5）
+            key_ttls: キーごとの有効期限（秒）。指定のないキーはttl
+            invalidation_url: 無効化通知に使うRedisのURL（デフォルト: SESSION_CACHE_INVALIDATION_URL）
+            channel: 無効化通知のチャンネル名（デフォルト: SESSION_CACHE_CHANNEL or hera:session-cache）
+        """
+        self.backend = backend
+        self.max_sessions = max_sessions or int(os.getenv('SESSION_CACHE_SIZE', '1024'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('SESSION_CACHE_TTL_SEC', '5'))
+        self.key_ttls = dict(key_ttls or {})
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+        self._instance_id = uuid.uuid4().hex
+        self._redis = None
+        self._channel = channel or os.getenv('SESSION_CACHE_CHANNEL', 'hera:session-cache')
+        invalidation_url = invalidation_url or os.getenv('SESSION_CACHE_INVALIDATION_URL')
+        if invalidation_url:
+            self._start_invalidation_listener(invalidation_url)
+
+    # ===== SessionManager =====
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        """下位へ保存し、キャッシュも同じ値で更新（ライトスルー）"""
+        self.backend.save(session_id, data)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(session_id)
+            entry.generation += 1
+            entry.exists = True
+            entry.exists_expires = now + self.ttl
+            for key, value in data.items():
+                entry.values[key] = (copy.deepcopy(value), now + self._ttl_for(key))
+        self._publish(session_id, list(data.keys()))
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """全キーを下位から読み込み、結果をキャッシュに反映"""
+        with self._lock:
+            generation = self._generation(session_id)
+        data = self.backend.load(session_id)
+        now = time.monotonic()
+        with self._lock:
+            self._stats["misses"] += 1
+            if self._generation(session_id) == generation:
+                entry = self._entry(session_id)
+                entry.exists = data is not None
+                entry.exists_expires = now + self.ttl
+                for key, value in (data or {}).items():
+                    entry.values[key] = (copy.deepcopy(value), now + self._ttl_for(key))
+        return data
+
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """キャッシュにあるキーはメモリから返し、足りないキーだけ下位から読む"""
+        keys = list(keys)
+        now = time.monotonic()
+        result: Dict[str, Any] = {}
+        missing: List[str] = []
+
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.exists is False and entry.exists_expires > now:
+                self._stats["hits"] += 1
+                return None
+            for key in keys:
+                cached = entry.values.get(key) if entry is not None else None
+                if cached is not None and cached[1] > now:
+                    if cached[0] is not _MISSING:
+                        result[key] = copy.deepcopy(cached[0])
+                else:
+                    missing.append(key)
+            if entry is not None:
+                self._entries.move_to_end(session_id)
+            if not missing and entry is not None and entry.exists:
+                self._stats["hits"] += 1
+                return result
+            self._stats["misses"] += 1
+            generation = entry.generation if entry is not None else 0
+
+        data = self.backend.load_keys(session_id, missing)
+        now = time.monotonic()
+        with self._lock:
+            if self._generation(session_id) == generation:
+                entry = self._entry(session_id)
+                entry.exists = data is not None
+                entry.exists_expires = now + self.ttl
+                if data is not None:
+                    for key in missing:
+                        value = copy.deepcopy(data[key]) if key in data else _MISSING
+                        entry.values[key] = (value, now + self._ttl_for(key))
+        if data is None:
+            return None
+        result.update(data)
+        return result
+
+    def delete(self, session_id: str) -> None:
+        """下位から削除し、キャッシュも破棄"""
+        self.backend.delete(session_id)
+        self.invalidate(session_id)
+        self._publish(session_id, None)
+
+    def exists(self, session_id: str) -> bool:
+        """存在確認の結果もTTLの間キャッシュする"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.exists is not None and entry.exists_expires > now:
+                self._stats["hits"] += 1
+                self._entries.move_to_end(session_id)
+                return entry.exists
+            self._stats["misses"] += 1
+            generation = entry.generation if entry is not None else 0
+
+        exists = self.backend.exists(session_id)
+        with self._lock:
+            if self._generation(session_id) == generation:
+                entry = self._entry(session_id)
+                entry.exists = exists
+                entry.exists_expires = time.monotonic() + self.ttl
+        return exists
+
+    # ===== キャッシュ管理 =====
+
+    def invalidate(self, session_id: str, keys: Optional[Iterable[str]] = None) -> None:
+        """キャッシュを破棄
+
+        Args:
+            session_id: セッションID
+            keys: 破棄するキー（Noneの場合はセッション全体）
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            self._stats["invalidations"] += 1
+            if keys is None:
+                # 読み込み中の結果を捨てられるよう、世代だけ残して中身を空にする
+                entry.exists = None
+                entry.values.clear()
+            else:
+                for key in keys:
+                    entry.values.pop(key, None)
+                if entry.exists is False:
+                    entry.exists = None
+            entry.generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット率・件数などの統計"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_sessions"] = self.max_sessions
+        stats["ttl_sec"] = self.ttl
+        stats["invalidation_channel"] = self._channel if self._redis is not None else None
+        return stats
+
+    def _ttl_for(self, key: str) -> float:
+        return self.key_ttls.get(key, self.ttl)
+
+    def _generation(self, session_id: str) -> int:
+        entry = self._entries.get(session_id)
+        return entry.generation if entry is not None else 0
+
+    def _entry(self, session_id: str) -> _SessionEntry:
+        """セッションのキャッシュを取得（なければ作成し、上限を超えたら古いものを破棄）"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = _SessionEntry()
+            self._entries[session_id] = entry
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        self._entries.move_to_end(session_id)
+        return entry
+
+    # ===== ワーカー間の無効化通知 =====
+
+    def _start_invalidation_listener(self, redis_url: str) -> None:
+        try:
+            import redis
+        except ImportError:
+            raise ImportError(
+                "セッションキャッシュの無効化通知を使用するには、redisパッケージが必要です。\n"
+                "pip install redis をして実行してください。"
+            )
+
+        self._redis = redis.from_url(redis_url, decode_responses=True)
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._channel)
+        thread = threading.Thread(
+            target=self._listen, args=(pubsub,), name="session-cache-invalidation", daemon=True
+        )
+        thread.start()
+
+    def _listen(self, pubsub) -> None:
+        while True:
+            try:
+                for message in pubsub.listen():
+                    self._handle_invalidation(message.get("data"))
+            except Exception as e:
+                # 接続が切れた間の更新は取りこぼすため、キャッシュ全体を破棄してから再購読する
+                # （エントリは残して世代を進め、読み込み中の結果もキャッシュしない）
+                print(f"[WARN] セッションキャッシュの無効化通知の受信に失敗しました: {e}")
+                with self._lock:
+                    for entry in self._entries.values():
+                        entry.exists = None
+                        entry.values.clear()
+                        entry.generation += 1
+                time.sleep(1)
+                try:
+                    pubsub.subscribe(self._channel)
+                except Exception:
+                    pass
+
+    def _handle_invalidation(self, data: Any) -> None:
+        try:
+            payload = json.loads(data or "{}")
+        except (TypeError, json.JSONDecodeError):
+            return
+        if payload.get("origin") == self._instance_id or not payload.get("session_id"):
+            return
+        self.invalidate(payload["session_id"], payload.get("keys"))
+
+    def _publish(self, session_id: str, keys: Optional[List[str]]) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.publish(self._channel, json.dumps({
+                "origin": self._instance_id,
+                "session_id": session_id,
+                "keys": keys,
+            }))
+        except Exception as e:
+            print(f"[WARN] セッションキャッシュの無効化通知に失敗しました ({session_id}): {e}")
+
+
+__all__ = ["CachedSessionManager"]
@@ -0,0 +1,346 @@
+"""
+バックグラウンドジョブキュー
+画像・ペルソナ・ストーリー/手紙などの重い生成処理をリクエストスレッドから切り離し、
+プロセス内のワーカースレッドで優先度順・リトライ付きで実行する
+
+ジョブは (session_id, job_type) で一意（冪等キー）に扱い、
+状態はセッションマネージャーの 'jobs' キーに保存する。
+終了したジョブは保存後にメモリから外し、以降は保存済みの記録を返す。
+実行待ち・実行中のまま保存されていてメモリにないジョブ（プロセス再起動などで中断）は、
+参照時に再登録する（ハンドラー未登録や試行回数切れの場合は失敗として記録する）。
+"""
+import itertools
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .session_manager import SessionManager
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+INTERRUPTED_ERROR = "プロセスの再起動などで中断されました"
+
+
+@dataclass
+class Job:
+    """ジョブ1件の状態"""
+
+    session_id: str
+    job_type: str
+    priority: int = 100
+    max_attempts: int = 3
+    status: str = JOB_QUEUED
+    attempts: int = 0
+    payload: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+    @staticmethod
+    def make_id(session_id: str, job_type: str) -> str:
+        """冪等キー（session_id + job_type）"""
+        return f"{session_id}:{job_type}"
+
+    @property
+    def job_id(self) -> str:
+        return self.make_id(self.session_id, self.job_type)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["job_id"] = self.job_id
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        fields = {key: value for key, value in data.items() if key in cls.__dataclass_fields__}
+        return cls(**fields)
+
+
+class SessionJobStore:
+    """セッションマネージャーにジョブテーブルを保存するストア"""
+
+    KEY = "jobs"
+
+    def __init__(self, session_manager: SessionManager):
+        self.session_manager = session_manager
+        self._lock = threading.Lock()
+
+    def load_all(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        """セッションの全ジョブを {job_type: job_dict} で取得"""
+        jobs = self.session_manager.load_key(session_id, self.KEY)
+        return jobs if isinstance(jobs, dict) else {}
+
+    def load(self, session_id: str, job_type: str) -> Optional[Dict[str, Any]]:
+        return self.load_all(session_id).get(job_type)
+
+    def save(self, job: Job) -> None:
+        """ジョブの状態を保存（同一セッション内の他ジョブは保持）"""
+        with self._lock:
+            jobs = self.load_all(job.session_id)
+            jobs[job.job_type] = job.to_dict()
+            self.session_manager.save(job.session_id, {self.KEY: jobs})
+
+
+class JobQueue:
+    """優先度・リトライ・冪等キー付きのプロセス内ジョブキュー"""
+
+    def __init__(
+        self,
+        store: SessionJobStore,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+    ):
+        """
+        Args:
+            store: ジョブの保存先
+            workers: ワーカースレッド数（デフォルト: JOB_WORKERS or 4）
+            max_attempts: 最大試行回数（デフォルト: JOB_MAX_ATTEMPTS or 3）
+            retry_backoff: リトライ待機の基準秒数。試行ごとに倍増（デフォルト: JOB_RETRY_BACKOFF_SEC or 2）
+        """
+        self.store = store
+        self.workers = workers or int(os.getenv('JOB_WORKERS', '4'))
+        self.max_attempts = max_attempts or int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(
+            os.getenv('JOB_RETRY_BACKOFF_SEC', '2')
+        )
+
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def register(
+        self,
+        job_type: str,
+        handler: Callable[[Job], Any],
+        priority: int = 100,
+        max_attempts: Optional[int] = None,
+    ) -> None:
+        """ジョブ種別とハンドラーを登録
+
+        Args:
+            job_type: ジョブ種別
+            handler: Jobを受け取り結果（JSON化可能な値）を返す関数
+            priority: 優先度（小さいほど先に実行）
+            max_attempts: この種別の最大試行回数
+        """
+        self._handlers[job_type] = {
+            "handler": handler,
+            "priority": priority,
+            "max_attempts": max_attempts or self.max_attempts,
+        }
+
+    def start(self) -> None:
+        """ワーカースレッドを起動"""
+        if self._threads:
+            return
+        self._stopped.clear()
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """ワーカースレッドを停止"""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(
+        self,
+        session_id: str,
+        job_type: str,
+        payload: Optional[Dict[str, Any]] = None,
+        priority: Optional[int] = None,
+        force: bool = False,
+        attempts: int = 0,
+    ) -> Job:
+        """ジョブを登録（同じ冪等キーのジョブが実行待ち・実行中・成功済みならそれを返す）
+
+        Args:
+            force: Trueの場合、成功済みでも再実行する
+            attempts: これまでの試行回数（中断されたジョブの再登録用）
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"未登録のジョブ種別です: {job_type}")
+
+        key = Job.make_id(session_id, job_type)
+        with self._lock:
+            existing = self._jobs.get(key)
+        if existing is None and not force:
+            # 成功済みの記録のみ再利用する。実行待ち・実行中のまま残った記録
+            # （プロセス再起動など）や失敗した記録は新しいジョブとして再実行する
+            stored = self.store.load(session_id, job_type)
+            if stored and stored.get("status") == JOB_SUCCEEDED:
+                return Job.from_dict(stored)
+
+        spec = self._handlers[job_type]
+        with self._lock:
+            existing = self._jobs.get(key)
+            if existing is not None:
+                if existing.status in ACTIVE_STATUSES:
+                    return existing
+                if existing.status == JOB_SUCCEEDED and not force:
+                    return existing
+
+            job = Job(
+                session_id=session_id,
+                job_type=job_type,
+                priority=spec["priority"] if priority is None else priority,
+                max_attempts=spec["max_attempts"],
+                attempts=attempts,
+                payload=dict(payload or {}),
+            )
+            self._jobs[key] = job
+
+        self._persist(job)
+        self._queue.put((job.priority, next(self._sequence), key))
+        return job
+
+    def get(self, session_id: str, job_type: str) -> Optional[Job]:
+        """ジョブの状態を取得"""
+        with self._lock:
+            job = self._jobs.get(Job.make_id(session_id, job_type))
+        if job is not None:
+            return job
+        stored = self.store.load(session_id, job_type)
+        return self._recover(Job.from_dict(stored)) if stored else None
+
+    def list(self, session_id: str) -> List[Job]:
+        """セッションの全ジョブを取得"""
+        jobs = {job_type: Job.from_dict(data) for job_type, data in self.store.load_all(session_id).items()}
+        with self._lock:
+            in_memory = {job.job_type: job for job in self._jobs.values() if job.session_id == session_id}
+        for job_type, job in jobs.items():
+            if job_type not in in_memory:
+                jobs[job_type] = self._recover(job)
+        jobs.update(in_memory)
+        return sorted(jobs.values(), key=lambda job: job.created_at)
+
+    def _recover(self, stored: Job) -> Job:
+        """保存済みの記録のうち、メモリにない実行待ち・実行中のジョブを再登録または失敗にする"""
+        if stored.status not in ACTIVE_STATUSES:
+            return stored
+        with self._lock:
+            current = self._jobs.get(stored.job_id)
+        if current is not None:
+            return current
+
+        if stored.job_type in self._handlers and stored.attempts < self._handlers[stored.job_type]["max_attempts"]:
+            print(f"[INFO] 中断されたジョブを再登録します: {stored.job_id}")
+            return self.enqueue(stored.session_id, stored.job_type, payload=stored.payload, attempts=stored.attempts)
+
+        print(f"[WARN] 中断されたジョブを失敗として記録します: {stored.job_id}")
+        stored.status = JOB_FAILED
+        stored.error = INTERRUPTED_ERROR
+        stored.finished_at = datetime.now().isoformat()
+        stored.updated_at = stored.finished_at
+        self._persist(stored)
+        return stored
+
+    def wait(self, session_id: str, job_type: str, timeout: float = 30.0) -> Optional[Job]:
+        """ジョブが終了するまで待つ（主にテスト・CLI用）"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.get(session_id, job_type)
+            if job is None or job.status not in ACTIVE_STATUSES:
+                return job
+            time.sleep(0.05)
+        return self.get(session_id, job_type)
+
+    def _worker(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                _, _, key = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._lock:
+                job = self._jobs.get(key)
+                if job is None or job.status != JOB_QUEUED:
+                    continue
+                job.status = JOB_RUNNING
+                job.attempts += 1
+                job.started_at = datetime.now().isoformat()
+                job.updated_at = job.started_at
+            self._persist(job)
+            self._execute(job)
+
+    def _execute(self, job: Job) -> None:
+        handler = self._handlers[job.job_type]["handler"]
+        try:
+            result = handler(job)
+        except Exception as e:
+            print(f"[WARN] ジョブ失敗 ({job.job_id}, 試行{job.attempts}/{job.max_attempts}): {e}")
+            with self._lock:
+                job.error = str(e)
+                job.updated_at = datetime.now().isoformat()
+                retry = job.attempts < job.max_attempts
+                if retry:
+                    job.status = JOB_QUEUED
+                else:
+                    job.status = JOB_FAILED
+                    job.finished_at = job.updated_at
+            self._persist(job, release=not retry)
+            if retry:
+                delay = self.retry_backoff * (2 ** (job.attempts - 1))
+                timer = threading.Timer(delay, self._queue.put, args=((job.priority, next(self._sequence), job.job_id),))
+                timer.daemon = True
+                timer.start()
+            return
+
+        with self._lock:
+            job.status = JOB_SUCCEEDED
+            job.result = result
+            job.error = None
+            job.finished_at = datetime.now().isoformat()
+            job.updated_at = job.finished_at
+        self._persist(job, release=True)
+
+    def _persist(self, job: Job, release: bool = False) -> None:
+        """ジョブの状態を保存
+
+        Args:
+            release: Trueの場合、保存できたらメモリから外す（終了したジョブ用）
+        """
+        try:
+            self.store.save(job)
+        except Exception as e:
+            print(f"[WARN] ジョブ状態の保存に失敗しました ({job.job_id}): {e}")
+            return
+        if release:
+            with self._lock:
+                if self._jobs.get(job.job_id) is job:
+                    del self._jobs[job.job_id]
+
+
+def create_job_queue(session_manager: SessionManager) -> JobQueue:
+    """
+    環境変数に基づいてジョブキューを作成
+
+    環境変数:
+        JOB_WORKERS: ワーカースレッド数（デフォルト: 4）
+        JOB_MAX_ATTEMPTS: 最大試行回数（デフォルト: 3）
+        JOB_RETRY_BACKOFF_SEC: リトライ待機の基準秒数（デフォルト: 2）
+
+    Returns:
+        JobQueue: ジョブキュー（未起動）
+    """
+    return JobQueue(SessionJobStore(session_manager))
@@ -0,0 +1,158 @@
+"""
+LLM呼び出しゲートウェイ
+同期的なGemini SDK呼び出しを専用スレッドプールへ逃がし、
+イベントループをブロックせずに同時実行数とタイムアウトを制御する
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Callable, Optional
+
+
+class LLMGateway:
+    """全エージェント共通のLLM呼び出し窓口"""
+
+    def __init__(self, max_concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Args:
+            max_concurrency: 同時に実行するLLM呼び出しの上限（デフォルト: LLM_MAX_CONCURRENCY or 16）
+            timeout: 1呼び出しあたりのタイムアウト秒数（デフォルト: LLM_TIMEOUT_SEC or 120）
+        """
+        self.max_concurrency = max_concurrency or int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+        self.timeout = timeout if timeout is not None else float(os.getenv('LLM_TIMEOUT_SEC', '120'))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="llm-gateway",
+        )
+
+    def _resolve_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        value = self.timeout if timeout is None else timeout
+        return value if value and value > 0 else None
+
+    async def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """同期関数をスレッドプールで実行して結果を待つ
+
+        Raises:
+            TimeoutError: タイムアウトした場合
+        """
+        limit = self._resolve_timeout(timeout)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, limit)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"LLM呼び出しが{limit}秒でタイムアウトしました") from None
+
+    def call(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """同期コードからスレッドプール経由で実行（同時実行数とタイムアウトを共有）"""
+        limit = self._resolve_timeout(timeout)
+        future = self._executor.submit(func, *args, **kwargs)
+        try:
+            return future.result(timeout=limit)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"LLM呼び出しが{limit}秒でタイムアウトしました") from None
+
+    def _request_options(self, timeout: Optional[float]) -> dict:
+        limit = self._resolve_timeout(timeout)
+        # SDK側にもタイムアウトを渡し、待ち切れなかったスレッドが残り続けないようにする
+        return {"timeout": limit} if limit else {}
+
+    async def generate_content(self, model: Any, prompt: Any, *, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """GenerativeModel.generate_content を非同期に実行"""
+        kwargs.setdefault("request_options", self._request_options(timeout))
+        return await self.run(model.generate_content, prompt, timeout=timeout, **kwargs)
+
+    def generate_content_sync(self, model: Any, prompt: Any, *, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """GenerativeModel.generate_content を同期コードから実行"""
+        kwargs.setdefault("request_options", self._request_options(timeout))
+        return self.call(model.generate_content, prompt, timeout=timeout, **kwargs)
+
+    async def stream_content(
+        self,
+        model: Any,
+        prompt: Any,
+        *,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[str]:
+        """GenerativeModel.generate_content(stream=True) のテキスト断片を順次返す
+
+        SDKのストリームはスレッドプール上で読み進め（同時実行数を共有）、
+        断片をイベントループ側のキューへ渡す。タイムアウトは次の断片が届くまでの待ち時間に適用する。
+
+        Raises:
+            TimeoutError: 次の断片がタイムアウトまでに届かなかった場合
+        """
+        limit = self._resolve_timeout(timeout)
+        kwargs.setdefault("request_options", self._request_options(timeout))
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        cancelled = threading.Event()
+
+        def _put(item: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, item)
+            except RuntimeError:
+                # イベントループ停止済み
+                cancelled.set()
+
+        def _produce() -> None:
+            try:
+                for chunk in model.generate_content(prompt, stream=True, **kwargs):
+                    if cancelled.is_set():
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # 安全性フィルタ等で本文のない断片
+                        continue
+                    if text:
+                        _put(text)
+            except Exception as e:
+                _put(e)
+            finally:
+                _put(finished)
+
+        loop.run_in_executor(self._executor, _produce)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(chunks.get(), limit)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"LLMストリームが{limit}秒間応答しませんでした") from None
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # 呼び出し側が途中で読むのをやめた場合もSDKのストリームを打ち切る
+            cancelled.set()
+
+    def shutdown(self) -> None:
+        """スレッドプールを停止"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# グローバルインスタンス（シングルトン）
+_llm_gateway: Optional[LLMGateway] = None
+_llm_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """
+    グローバルLLMゲートウェイを取得
+
+    Returns:
+        LLMGateway: LLM呼び出しゲートウェイ
+    """
+    global _llm_gateway
+    if _llm_gateway is None:
+        with _llm_gateway_lock:
+            if _llm_gateway is None:
+                _llm_gateway = LLMGateway()
+    return _llm_gateway
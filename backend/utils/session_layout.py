@@ -0,0 +1,290 @@
+"""
+ローカルのセッションディレクトリ構成とセッションインデックス
+
+- セッションディレクトリはセッションIDの先頭2文字でシャーディングする
+  （``<SESSIONS_DIR>/<id[:2]>/<id>``）。旧構成（``<SESSIONS_DIR>/<id>``）のディレクトリもそのまま使える
+- セッションインデックス（SQLite）に最終更新時刻とプロファイルの有無（ageが入っているか）を記録し、
+  「最新のセッション」「プロファイルのある最新のセッション」をディレクトリ走査なしで返す
+- 既存の構成は ``python -m utils.session_layout migrate`` でシャーディング構成へ移行できる
+- インデックスが空の場合は、初回に1度だけセッションディレクトリを走査して作成する
+  （``python -m utils.session_layout rebuild-index`` で手動で作り直すこともできる）
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+# シャーディングに使うセッションIDの先頭文字数
+SHARD_PREFIX_LENGTH = 2
+# セッション以外の用途で SESSIONS_DIR 直下に置かれるディレクトリ
+RESERVED_DIRS = ('generated_content',)
+INDEX_FILENAME = 'session_index.sqlite3'
+
+
+def sharding_enabled() -> bool:
+    """新規セッションをシャーディング構成で作成するか（SESSIONS_SHARDING、デフォルト: true）"""
+    return os.getenv('SESSIONS_SHARDING', 'true').lower() == 'true'
+
+
+def shard_name(session_id: str) -> str:
+    """セッションIDからシャードディレクトリ名を取得"""
+    return session_id[:SHARD_PREFIX_LENGTH].lower()
+
+
+def session_dir(base_dir: str, session_id: str) -> str:
+    """セッションディレクトリのパスを取得
+
+    シャーディング構成のディレクトリがなく、旧構成のディレクトリがある場合は旧構成のパスを返す。
+
+    Args:
+        base_dir: セッションディレクトリのルート（SESSIONS_DIR）
+        session_id: セッションID
+
+    Returns:
+        str: セッションディレクトリのパス
+    """
+    legacy = os.path.join(base_dir, session_id)
+    if not sharding_enabled():
+        return legacy
+    sharded = os.path.join(base_dir, shard_name(session_id), session_id)
+    if not os.path.isdir(sharded) and os.path.isdir(legacy) and len(session_id) > SHARD_PREFIX_LENGTH:
+        return legacy
+    return sharded
+
+
+def _is_shard_dir(name: str) -> bool:
+    return len(name) == SHARD_PREFIX_LENGTH
+
+
+def iter_session_dirs(base_dir: str) -> Iterator[Tuple[str, str]]:
+    """全セッションの (セッションID, ディレクトリ) を列挙（移行・インデックス再構築用）"""
+    if not os.path.isdir(base_dir):
+        return
+    for entry in os.scandir(base_dir):
+        if not entry.is_dir() or entry.name in RESERVED_DIRS:
+            continue
+        if not _is_shard_dir(entry.name):
+            yield entry.name, entry.path
+            continue
+        for child in os.scandir(entry.path):
+            if child.is_dir():
+                yield child.name, child.path
+
+
+class SessionIndex:
+    """セッションの最終更新時刻とプロファイルの有無を保持するインデックス（SQLite）"""
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS session_index (
+            session_id TEXT PRIMARY KEY,
+            updated_at REAL NOT NULL,
+            has_profile INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_session_index_updated ON session_index (updated_at)",
+        """
+        CREATE INDEX IF NOT EXISTS idx_session_index_profile
+        ON session_index (has_profile, updated_at)
+        """,
+    )
+
+    SQL_TOUCH = (
+        "INSERT INTO session_index (session_id, updated_at) VALUES (?, ?) "
+        "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at"
+    )
+    SQL_TOUCH_PROFILE = (
+        "INSERT INTO session_index (session_id, updated_at, has_profile) VALUES (?, ?, ?) "
+        "ON CONFLICT(session_id) DO UPDATE SET "
+        "updated_at = excluded.updated_at, has_profile = excluded.has_profile"
+    )
+    SQL_LATEST = "SELECT session_id FROM session_index ORDER BY updated_at DESC LIMIT 1"
+    SQL_LATEST_WITH_PROFILE = (
+        "SELECT session_id FROM session_index WHERE has_profile = 1 "
+        "ORDER BY updated_at DESC LIMIT 1"
+    )
+    SQL_REMOVE = "DELETE FROM session_index WHERE session_id = ?"
+    SQL_HAS_ROWS = "SELECT 1 FROM session_index LIMIT 1"
+
+    def __init__(self, db_path: str, base_dir: Optional[str] = None):
+        """
+        Args:
+            db_path: インデックスのSQLiteファイルのパス
+            base_dir: セッションディレクトリのルート。指定した場合、インデックスが空なら走査して作成する
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # 旧形式（profile_complete 列）のインデックスは作り直す（内容はセッションディレクトリから再構築できる）
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(session_index)")}
+        if columns and 'has_profile' not in columns:
+            self._conn.execute("DROP TABLE session_index")
+        for statement in self.SCHEMA:
+            self._conn.execute(statement)
+        if base_dir is not None and self._conn.execute(self.SQL_HAS_ROWS).fetchone() is None:
+            count = self.rebuild(base_dir)
+            if count:
+                print(f"[INFO] セッションインデックスを作成しました: {count}件")
+
+    def touch(self, session_id: str, has_profile: Optional[bool] = None, updated_at: Optional[float] = None) -> None:
+        """セッションの更新を記録
+
+        Args:
+            session_id: セッションID
+            has_profile: プロファイルがあるか（Noneの場合は変更しない）
+            updated_at: 更新時刻（UNIX秒、デフォルト: 現在時刻）
+        """
+        updated_at = time.time() if updated_at is None else updated_at
+        with self._lock:
+            if has_profile is None:
+                self._conn.execute(self.SQL_TOUCH, (session_id, updated_at))
+            else:
+                self._conn.execute(self.SQL_TOUCH_PROFILE, (session_id, updated_at, int(has_profile)))
+
+    def remove(self, session_id: str) -> None:
+        """セッションをインデックスから削除"""
+        with self._lock:
+            self._conn.execute(self.SQL_REMOVE, (session_id,))
+
+    def latest_session(self, has_profile: bool = False) -> Optional[str]:
+        """最後に更新されたセッションIDを取得
+
+        Args:
+            has_profile: Trueの場合、プロファイル（age）のあるセッションに限る
+        """
+        sql = self.SQL_LATEST_WITH_PROFILE if has_profile else self.SQL_LATEST
+        with self._lock:
+            row = self._conn.execute(sql).fetchone()
+        return row[0] if row else None
+
+    def rebuild(self, base_dir: str) -> int:
+        """セッションディレクトリを走査してインデックスを作り直す
+
+        Returns:
+            int: 登録したセッション数
+        """
+        rows = []
+        for session_id, path in iter_session_dirs(base_dir):
+            updated_at = max(
+                [os.path.getmtime(path)]
+                + [entry.stat().st_mtime for entry in os.scandir(path) if entry.is_file()]
+            )
+            profile = _read_json(os.path.join(path, 'user_profile.json'))
+            rows.append((session_id, updated_at, int(has_profile(profile))))
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM session_index")
+                self._conn.executemany(self.SQL_TOUCH_PROFILE, rows)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def has_profile(profile: Any) -> bool:
+    """家族エージェントが使えるプロファイルか（ageが入っているか）"""
+    return isinstance(profile, dict) and bool(profile.get("age"))
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def migrate_sessions(base_dir: str, dry_run: bool = False) -> int:
+    """旧構成のセッションディレクトリをシャーディング構成へ移動
+
+    Args:
+        base_dir: セッションディレクトリのルート
+        dry_run: Trueの場合は移動せず対象を表示するだけ
+
+    Returns:
+        int: 移動した（dry_runの場合は移動対象の）セッション数
+    """
+    moved = 0
+    for entry in list(os.scandir(base_dir)):
+        if not entry.is_dir() or entry.name in RESERVED_DIRS or _is_shard_dir(entry.name):
+            continue
+        target = os.path.join(base_dir, shard_name(entry.name), entry.name)
+        if os.path.exists(target):
+            print(f"[WARN] 移動先が既に存在するためスキップします: {target}")
+            continue
+        print(f"[INFO] {entry.path} -> {target}")
+        if not dry_run:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.rename(entry.path, target)
+        moved += 1
+    return moved
+
+
+_session_index: Optional[SessionIndex] = None
+_session_index_lock = threading.Lock()
+
+
+def get_session_index() -> SessionIndex:
+    """グローバルセッションインデックスを取得
+
+    環境変数:
+        SESSION_INDEX_PATH: インデックスのパス（デフォルト: SESSIONS_DIR/session_index.sqlite3）
+    """
+    global _session_index
+    with _session_index_lock:
+        if _session_index is None:
+            from config import get_sessions_dir
+            base_dir = get_sessions_dir()
+            path = os.getenv('SESSION_INDEX_PATH') or os.path.join(base_dir, INDEX_FILENAME)
+            _session_index = SessionIndex(path, base_dir=base_dir)
+        return _session_index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ローカルのセッションディレクトリをシャーディング構成へ移行")
+    parser.add_argument('command', choices=['migrate', 'rebuild-index'])
+    parser.add_argument('--sessions-dir', help="セッションディレクトリ（デフォルト: SESSIONS_DIR）")
+    parser.add_argument('--dry-run', action='store_true', help="移動せずに対象を表示する")
+    args = parser.parse_args()
+
+    from config import get_sessions_dir
+    base_dir = args.sessions_dir or get_sessions_dir()
+
+    if args.command == 'migrate':
+        moved = migrate_sessions(base_dir, dry_run=args.dry_run)
+        print(f"[INFO] 移行対象のセッション: {moved}件")
+        if args.dry_run:
+            return
+
+    index = SessionIndex(os.getenv('SESSION_INDEX_PATH') or os.path.join(base_dir, INDEX_FILENAME))
+    count = index.rebuild(base_dir)
+    print(f"[INFO] セッションインデックスを再構築しました: {count}件")
+
+
+__all__ = [
+    "SessionIndex",
+    "get_session_index",
+    "iter_session_dirs",
+    "migrate_sessions",
+    "session_dir",
+    "shard_name",
+]
+
+
+if __name__ == "__main__":
+    main()
+
@@ -1,13 +1,33 @@
 """
 セッション管理モジュール
-ファイルベースとRedisベースの両方をサポート
+ファイル・SQLite・Redisなどのバックエンドをサポート
 """
 import os
 import json
+import hashlib
+import sqlite3
+import struct
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional
 from datetime import datetime, timedelta
 
+from .session_layout import SessionIndex, get_session_index, has_profile, session_dir
+
+
+@dataclass
+class SessionHandle:
+    """存在が確認できたセッションと、読み込んだデータ"""
+
+    session_id: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """読み込んだ値を取得（ない場合はdefault）"""
+        return self.data.get(key, default)
+
 
 class SessionManager(ABC):
     """セッション管理の基底クラス"""
@@ -32,28 +52,100 @@ class SessionManager(ABC):
         """セッションが存在するか確認"""
         pass
 
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """指定したキーのみ読み込み
+
+        デフォルト実装は load() の結果を絞り込むだけなので、
+        各バックエンドは必要なデータだけを取得するよう上書きする。
+
+        Returns:
+            存在するキーのみを含む辞書。セッションが存在しない場合はNone
+        """
+        data = self.load(session_id)
+        if data is None:
+            return None
+        return {key: data[key] for key in keys if key in data}
+
+    def load_key(self, session_id: str, key: str, default: Any = None) -> Any:
+        """1つのキーを読み込み（セッションまたはキーが存在しない場合はdefault）"""
+        data = self.load_keys(session_id, [key])
+        if not data or key not in data:
+            return default
+        return data[key]
+
+    def get_or_none(self, session_id: str, keys: Optional[Iterable[str]] = None) -> Optional[SessionHandle]:
+        """存在確認と読み込みを1回で行う
+
+        Args:
+            session_id: セッションID
+            keys: 読み込むキー（Noneの場合は全キー）
+
+        Returns:
+            SessionHandle: セッションが存在しない場合はNone
+        """
+        data = self.load(session_id) if keys is None else self.load_keys(session_id, keys)
+        if data is None:
+            return None
+        return SessionHandle(session_id, data)
+
 
 class FileSessionManager(SessionManager):
-    """ファイルベースのセッション管理（ローカル開発用）"""
+    """ファイルベースのセッション管理（ローカル開発用）
+
+    キーごとに ``<key>.json`` を保存する。会話履歴（CONVERSATION_KEYS）は
+    1メッセージ1行の追記専用 ``<key>.jsonl`` と、各行の開始位置と内容のハッシュを並べた
+    ``<key>.idx`` で保存し、毎ターンの書き込みを追加分だけにする。
+    既存メッセージのどれかが変更・削除された場合は（索引のハッシュで判定）、
+    一時ファイルに書き直して置き換える（コンパクション）。
+
+    セッションディレクトリはIDの先頭でシャーディングし（utils.session_layout）、
+    indexを渡すと保存・削除のたびにセッションインデックスを更新する。
+    """
+
+    CONVERSATION_KEYS = ('conversation_history', 'family_conversation')
+    # 索引の先頭に置く形式の識別子（ない索引は旧形式として本体から作り直す）
+    _INDEX_MAGIC = b'HIX1'
+    # 索引の1エントリ（行の開始位置: リトルエンディアンの符号なし64bit、行の内容のハッシュ: 8バイト）
+    _INDEX_ENTRY = struct.Struct('<Q8s')
 
-    def __init__(self, base_dir: str):
+    def __init__(self, base_dir: str, fsync: Optional[bool] = None, index: Optional["SessionIndex"] = None):
+        """
+        Args:
+            base_dir: セッションディレクトリ
+            fsync: 会話履歴の追記ごとにfsyncするか（デフォルト: FILE_SESSION_FSYNC or true）
+            index: 更新を記録するセッションインデックス（Noneの場合は記録しない）
+        """
         self.base_dir = base_dir
+        self.index = index
+        self.fsync = fsync if fsync is not None else os.getenv('FILE_SESSION_FSYNC', 'true').lower() == 'true'
         os.makedirs(base_dir, exist_ok=True)
+        self._locks_guard = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
 
     def _get_session_path(self, session_id: str) -> str:
         """セッションファイルのパスを取得"""
-        return os.path.join(self.base_dir, session_id)
+        return session_dir(self.base_dir, session_id)
 
     def save(self, session_id: str, data: Dict[str, Any]) -> None:
         """セッションデータをファイルに保存"""
-        session_dir = self._get_session_path(session_id)
-        os.makedirs(session_dir, exist_ok=True)
+        session_path = self._get_session_path(session_id)
+        os.makedirs(session_path, exist_ok=True)
 
         for key, value in data.items():
-            file_path = os.path.join(session_dir, f"{key}.json")
+            if key in self.CONVERSATION_KEYS and isinstance(value, list):
+                self._save_messages(session_path, key, value)
+                continue
+            file_path = os.path.join(session_path, f"{key}.json")
             with open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(value, f, ensure_ascii=False, indent=2)
 
+        if self.index is not None:
+            try:
+                profile_flag = has_profile(data['user_profile']) if 'user_profile' in data else None
+                self.index.touch(session_id, has_profile=profile_flag)
+            except Exception as e:
+                print(f"[WARN] セッションインデックスの更新に失敗しました ({session_id}): {e}")
+
     def load(self, session_id: str) -> Optional[Dict[str, Any]]:
         """セッションデータをファイルから読み込み"""
         session_dir = self._get_session_path(session_id)
@@ -64,26 +156,258 @@ class FileSessionManager(SessionManager):
         for filename in os.listdir(session_dir):
             if filename.endswith('.json'):
                 key = filename[:-5]  # .json を除去
+                if key in self.CONVERSATION_KEYS:
+                    continue
                 file_path = os.path.join(session_dir, filename)
                 with open(file_path, 'r', encoding='utf-8') as f:
                     data[key] = json.load(f)
 
+        for key in self.CONVERSATION_KEYS:
+            messages = self._load_messages(session_dir, key)
+            if messages is not None:
+                data[key] = messages
+
+        return data
+
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """指定したキーのファイルのみ読み込み"""
+        session_dir = self._get_session_path(session_id)
+        if not os.path.exists(session_dir):
+            return None
+
+        data = {}
+        for key in keys:
+            if key in self.CONVERSATION_KEYS:
+                messages = self._load_messages(session_dir, key)
+                if messages is not None:
+                    data[key] = messages
+                continue
+            file_path = os.path.join(session_dir, f"{key}.json")
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data[key] = json.load(f)
+            except FileNotFoundError:
+                continue
+
         return data
 
+    def load_messages(
+        self,
+        session_id: str,
+        key: str = 'conversation_history',
+        start: int = 0,
+        limit: Optional[int] = None,
+    ) -> list:
+        """会話履歴の一部を、ファイル全体を読まずに取得
+
+        Args:
+            session_id: セッションID
+            key: 会話履歴のキー
+            start: 取得開始位置（負の値は末尾からの位置。-10で最新10件）
+            limit: 取得件数（Noneの場合は最後まで）
+
+        Returns:
+            list: メッセージのリスト（セッションや履歴がない場合は空）
+        """
+        session_dir = self._get_session_path(session_id)
+        jsonl_path, _ = self._message_paths(session_dir, key)
+        if not os.path.exists(jsonl_path):
+            # 旧形式（<key>.json）の場合は全体を読んでから切り出す
+            messages = self._load_messages(session_dir, key) or []
+            start, stop = self._page_range(len(messages), start, limit)
+            return messages[start:stop]
+
+        with self._lock(jsonl_path):
+            entries = self._read_index(session_dir, key)
+            start, stop = self._page_range(len(entries), start, limit)
+            return self._read_lines(jsonl_path, [offset for offset, _ in entries[start:stop]])
+
+    @staticmethod
+    def _page_range(count: int, start: int, limit: Optional[int]) -> tuple:
+        if start < 0:
+            start = max(count + start, 0)
+        stop = count if limit is None else min(start + limit, count)
+        return start, max(start, stop)
+
     def delete(self, session_id: str) -> None:
         """セッションデータを削除"""
         import shutil
-        session_dir = self._get_session_path(session_id)
-        if os.path.exists(session_dir):
-            shutil.rmtree(session_dir)
+        session_path = self._get_session_path(session_id)
+        if os.path.exists(session_path):
+            shutil.rmtree(session_path)
+        if self.index is not None:
+            try:
+                self.index.remove(session_id)
+            except Exception as e:
+                print(f"[WARN] セッションインデックスの更新に失敗しました ({session_id}): {e}")
 
     def exists(self, session_id: str) -> bool:
         """セッションが存在するか確認"""
         return os.path.exists(self._get_session_path(session_id))
 
+    # ===== 会話履歴（JSONL + 索引） =====
+
+    def _lock(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    @staticmethod
+    def _message_paths(session_dir: str, key: str) -> tuple:
+        return os.path.join(session_dir, f"{key}.jsonl"), os.path.join(session_dir, f"{key}.idx")
+
+    @staticmethod
+    def _encode_message(message: Any) -> bytes:
+        return json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+    @staticmethod
+    def _line_digest(line: bytes) -> bytes:
+        return hashlib.blake2b(line, digest_size=8).digest()
+
+    def _sync(self, f) -> None:
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _save_messages(self, session_dir: str, key: str, messages: list) -> None:
+        """保存済みの件数より後ろのメッセージだけを追記（既存分が変わっていれば書き直す）"""
+        jsonl_path, index_path = self._message_paths(session_dir, key)
+        with self._lock(jsonl_path):
+            if not os.path.exists(jsonl_path):
+                self._compact(session_dir, key, messages)
+                return
+
+            entries = self._read_index(session_dir, key)
+            count = len(entries)
+            lines = [self._encode_message(message) for message in messages]
+            # 保存済みの行はすべて索引のハッシュと比べる（どこかが変わっていれば書き直す）
+            if len(lines) < count or any(
+                self._line_digest(line) != digest for line, (_, digest) in zip(lines, entries)
+            ):
+                self._compact(session_dir, key, messages)
+                return
+            if len(lines) == count:
+                return
+
+            # 本体を書き込んでから索引を追記する（途中で落ちても索引にない行は読まれない）
+            new_entries = []
+            with open(jsonl_path, 'ab') as f:
+                position = f.seek(0, os.SEEK_END)
+                for line in lines[count:]:
+                    new_entries.append((position, self._line_digest(line)))
+                    f.write(line)
+                    position += len(line)
+                self._sync(f)
+            with open(index_path, 'ab') as f:
+                f.write(b''.join(self._INDEX_ENTRY.pack(*entry) for entry in new_entries))
+                self._sync(f)
+
+    def _compact(self, session_dir: str, key: str, messages: list) -> None:
+        """会話履歴を一時ファイルに書き直して置き換え、旧形式のファイルがあれば削除"""
+        jsonl_path, index_path = self._message_paths(session_dir, key)
+        entries = []
+        position = 0
+        tmp_path = f"{jsonl_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for message in messages:
+                line = self._encode_message(message)
+                entries.append((position, self._line_digest(line)))
+                f.write(line)
+                position += len(line)
+            self._sync(f)
+
+        # 索引を先に消し、本体の置き換え後に作り直す（索引がなければ読み込み時に再構築される）
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.replace(tmp_path, jsonl_path)
+        self._write_index(index_path, entries)
+
+        legacy_path = os.path.join(session_dir, f"{key}.json")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def _write_index(self, index_path: str, entries: list) -> None:
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._INDEX_MAGIC + b''.join(self._INDEX_ENTRY.pack(*entry) for entry in entries))
+            self._sync(f)
+        os.replace(tmp_path, index_path)
+
+    def _read_index(self, session_dir: str, key: str) -> list:
+        """索引を読み込み（ない・壊れている・旧形式の場合は本体を走査して作り直す）
+
+        Returns:
+            list: 行ごとの (開始位置, 内容のハッシュ)
+        """
+        jsonl_path, index_path = self._message_paths(session_dir, key)
+        size = os.path.getsize(jsonl_path)
+        try:
+            with open(index_path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = None
+
+        if raw is not None and raw.startswith(self._INDEX_MAGIC):
+            body = raw[len(self._INDEX_MAGIC):]
+            usable = len(body) - len(body) % self._INDEX_ENTRY.size
+            entries = list(self._INDEX_ENTRY.iter_unpack(body[:usable]))
+            if not entries or entries[-1][0] < size:
+                return entries
+
+        entries = []
+        position = 0
+        with open(jsonl_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # 書き込み途中の行
+                entries.append((position, self._line_digest(line)))
+                position += len(line)
+        self._write_index(index_path, entries)
+        return entries
+
+    def _load_messages(self, session_dir: str, key: str) -> Optional[list]:
+        """会話履歴を全件読み込み（旧形式の <key>.json にも対応）"""
+        jsonl_path, _ = self._message_paths(session_dir, key)
+        if not os.path.exists(jsonl_path):
+            legacy_path = os.path.join(session_dir, f"{key}.json")
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                return None
+
+        with self._lock(jsonl_path):
+            return self._read_lines(jsonl_path, [offset for offset, _ in self._read_index(session_dir, key)])
+
+    @staticmethod
+    def _read_lines(jsonl_path: str, offsets: list) -> list:
+        """索引の位置から行を読み込み（連続している間はシークせずに順に読む）"""
+        messages = []
+        with open(jsonl_path, 'rb') as f:
+            for offset in offsets:
+                if f.tell() != offset:
+                    f.seek(offset)
+                messages.append(json.loads(f.readline()))
+        return messages
+
 
 class RedisSessionManager(SessionManager):
-    """Redisベースのセッション管理（本番環境用）"""
+    """Redisベースのセッション管理（本番環境用）
+
+    1セッションを1つのハッシュ ``session:<id>`` に保存し、フィールド名をキー、
+    値をJSON文字列とする。書き込みは MULTI/EXEC でまとめて1往復、TTLはハッシュ単位で更新する。
+
+    旧形式（キーごとの ``session:<id>:<key>`` と ``session:<id>:_meta``）のセッションは
+    読み込み時・初回書き込み時にハッシュへ移行する。
+    """
+
+    CREATED_AT_FIELD = "_created_at"
+    UPDATED_AT_FIELD = "_updated_at"
+    RESERVED_FIELDS = (CREATED_AT_FIELD, UPDATED_AT_FIELD)
+    SCAN_COUNT = 100
+    # 同じRedisを使うストレージのメタデータのキー空間（session:<id>:meta:<key>）
+    STORAGE_META_NAMESPACE = "meta:"
+    # 旧形式の確認済みセッションIDを保持する上限（超えたらクリア）
+    MIGRATION_CACHE_SIZE = 10000
 
     def __init__(self, redis_url: str, ttl: int = 86400):
         """
@@ -101,66 +425,142 @@ class RedisSessionManager(SessionManager):
 
         self.redis = redis.from_url(redis_url, decode_responses=True)
         self.ttl = ttl
+        self._migration_checked: set = set()
 
     def _get_key(self, session_id: str, field: str = None) -> str:
-        """Redisキーを生成"""
+        """Redisキーを生成（fieldは旧形式のキー用）"""
         if field:
             return f"session:{session_id}:{field}"
         return f"session:{session_id}"
 
+    @classmethod
+    def _decode_fields(cls, fields: Dict[str, str]) -> Dict[str, Any]:
+        return {
+            key: json.loads(value)
+            for key, value in fields.items()
+            if key not in cls.RESERVED_FIELDS and value is not None
+        }
+
     def save(self, session_id: str, data: Dict[str, Any]) -> None:
-        """セッションデータをRedisに保存"""
-        for key, value in data.items():
-            redis_key = self._get_key(session_id, key)
-            self.redis.setex(
-                redis_key,
-                self.ttl,
-                json.dumps(value, ensure_ascii=False)
-            )
+        """セッションデータをRedisに保存（HSET + EXPIRE を1トランザクションで実行）"""
+        self._ensure_migrated(session_id)
 
-        # セッションのメタデータも保存
-        meta_key = self._get_key(session_id, "_meta")
-        self.redis.setex(
-            meta_key,
-            self.ttl,
-            json.dumps({
-                "created_at": datetime.now().isoformat(),
-                "keys": list(data.keys())
-            })
-        )
+        key = self._get_key(session_id)
+        now = datetime.now().isoformat()
+        mapping = {field: json.dumps(value, ensure_ascii=False) for field, value in data.items()}
+        mapping[self.UPDATED_AT_FIELD] = now
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(key, mapping=mapping)
+        pipe.hsetnx(key, self.CREATED_AT_FIELD, now)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
 
     def load(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """セッションデータをRedisから読み込み"""
-        meta_key = self._get_key(session_id, "_meta")
-        meta_data = self.redis.get(meta_key)
+        """セッションデータをRedisから読み込み（HGETALL 1回）"""
+        fields = self.redis.hgetall(self._get_key(session_id))
+        if not fields:
+            fields = self._migrate_legacy(session_id)
+            if fields is None:
+                return None
+        return self._decode_fields(fields)
+
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """指定したキーのみ読み込み（EXISTS + HMGET を1往復）"""
+        keys = [key for key in keys if key not in self.RESERVED_FIELDS]
+        key = self._get_key(session_id)
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.exists(key)
+        if keys:
+            pipe.hmget(key, keys)
+        results = pipe.execute()
+
+        if not results[0]:
+            fields = self._migrate_legacy(session_id)
+            if fields is None:
+                return None
+            return self._decode_fields({field: fields.get(field) for field in keys})
+        if not keys:
+            return {}
+        return self._decode_fields(dict(zip(keys, results[1])))
 
-        if not meta_data:
-            return None
+    def delete(self, session_id: str) -> None:
+        """セッションデータを削除（旧形式のキーが残っていればSCANで探して削除）"""
+        keys = [self._get_key(session_id)]
+        if self.redis.exists(self._get_key(session_id, "_meta")):
+            keys.extend(self._scan_legacy_keys(session_id))
+        self.redis.delete(*keys)
+        self._migration_checked.discard(session_id)
 
-        meta = json.loads(meta_data)
-        data = {}
+    def exists(self, session_id: str) -> bool:
+        """セッションが存在するか確認"""
+        return self.redis.exists(self._get_key(session_id), self._get_key(session_id, "_meta")) > 0
 
-        for key in meta.get("keys", []):
-            redis_key = self._get_key(session_id, key)
-            value = self.redis.get(redis_key)
-            if value:
-                data[key] = json.loads(value)
+    # ===== 旧形式からの移行 =====
 
-        return data
+    def _scan_legacy_keys(self, session_id: str) -> list:
+        """旧形式のキー（session:<id>:*）をSCANで列挙
 
-    def delete(self, session_id: str) -> None:
-        """セッションデータを削除"""
-        # セッションに関連する全キーを取得
+        ストレージのメタデータ（CloudStorageManager の ``session:<id>:meta:<key>``）も
+        同じパターンに一致するため除外する。
+        """
         pattern = self._get_key(session_id, "*")
-        keys = self.redis.keys(pattern)
-
-        if keys:
-            self.redis.delete(*keys)
-
-    def exists(self, session_id: str) -> bool:
-        """セッションが存在するか確認"""
+        storage_prefix = self._get_key(session_id, self.STORAGE_META_NAMESPACE)
+        return [
+            key for key in self.redis.scan_iter(match=pattern, count=self.SCAN_COUNT)
+            if not key.startswith(storage_prefix)
+        ]
+
+    def _ensure_migrated(self, session_id: str) -> None:
+        """書き込み前に旧形式のデータをハッシュへ移す（プロセス内でセッションごとに1回だけ確認）"""
+        if session_id in self._migration_checked:
+            return
+        if not self.redis.exists(self._get_key(session_id)):
+            self._migrate_legacy(session_id)
+        if len(self._migration_checked) >= self.MIGRATION_CACHE_SIZE:
+            self._migration_checked.clear()
+        self._migration_checked.add(session_id)
+
+    def _migrate_legacy(self, session_id: str) -> Optional[Dict[str, str]]:
+        """旧形式のセッションを読み込んでハッシュへ移行
+
+        旧形式の _meta は最後の保存で書いたキーしか持たないため、
+        SCANで見つかった全キーを取り込む。
+
+        Returns:
+            移行したフィールド（JSON文字列）。旧形式のデータがなければNone
+        """
         meta_key = self._get_key(session_id, "_meta")
-        return self.redis.exists(meta_key) > 0
+        if not self.redis.exists(meta_key):
+            return None
+        legacy_keys = self._scan_legacy_keys(session_id)
+
+        values = self.redis.mget(legacy_keys)
+        prefix = f"{self._get_key(session_id)}:"
+        fields: Dict[str, str] = {}
+        meta: Dict[str, Any] = {}
+        for redis_key, value in zip(legacy_keys, values):
+            if value is None:
+                continue
+            if redis_key == meta_key:
+                meta = json.loads(value)
+            else:
+                fields[redis_key[len(prefix):]] = value
+
+        now = datetime.now().isoformat()
+        mapping = dict(fields)
+        mapping[self.CREATED_AT_FIELD] = meta.get("created_at", now)
+        mapping[self.UPDATED_AT_FIELD] = now
+
+        key = self._get_key(session_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, self.ttl)
+        pipe.delete(*legacy_keys)
+        pipe.execute()
+        print(f"[INFO] Redisセッションを旧形式から移行しました: {session_id} ({len(fields)}キー)")
+        return mapping
 
 
 class FirebaseSessionManager(SessionManager):
@@ -185,22 +585,15 @@ class FirebaseSessionManager(SessionManager):
         return self.db.collection('sessions').document(session_id)
 
     def save(self, session_id: str, data: Dict[str, Any]) -> None:
-        """セッションデータをFirestoreに保存"""
-        ref = self._get_session_ref(session_id)
+        """セッションデータをFirestoreに保存
 
-        # 既存のデータを読み込み
-        doc = ref.get()
-        if doc.exists:
-            # 既存データとマージ
-            existing_data = doc.to_dict()
-            existing_data.update(data)
-            existing_data['updated_at'] = datetime.utcnow().isoformat()
-            ref.set(existing_data)
-        else:
-            # 新規作成
-            data['created_at'] = datetime.utcnow().isoformat()
-            data['updated_at'] = datetime.utcnow().isoformat()
-            ref.set(data)
+        事前に読み込まず、指定したフィールドだけを置き換えるマージ書き込みで作成・更新する。
+        created_at は呼び出し側がセッション作成時に保存する。
+        """
+        ref = self._get_session_ref(session_id)
+        payload = dict(data)
+        payload['updated_at'] = datetime.utcnow().isoformat()
+        ref.set(payload, merge=list(payload.keys()))
 
     def load(self, session_id: str) -> Optional[Dict[str, Any]]:
         """セッションデータをFirestoreから読み込み"""
@@ -212,6 +605,18 @@ class FirebaseSessionManager(SessionManager):
 
         return doc.to_dict()
 
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """指定したフィールドのみ読み込み（フィールドマスクで転送量を削減）"""
+        keys = list(keys)
+        ref = self._get_session_ref(session_id)
+        doc = ref.get(field_paths=keys) if keys else ref.get()
+
+        if not doc.exists:
+            return None
+
+        data = doc.to_dict() or {}
+        return {key: data[key] for key in keys if key in data}
+
     def delete(self, session_id: str) -> None:
         """セッションデータを削除"""
         ref = self._get_session_ref(session_id)
@@ -224,6 +629,241 @@ class FirebaseSessionManager(SessionManager):
         return doc.exists
 
 
+class SqliteSessionManager(SessionManager):
+    """SQLiteベースのセッション管理（単一ノードの本番環境用）
+
+    WALモードの1ファイルに、データの種類ごとのテーブルで保存する。
+
+    - session_profiles: user_profile（1セッション1行）
+    - session_messages: conversation_history / family_conversation（1メッセージ1行、追記のみ。
+      行ごとに内容のハッシュを持ち、保存済みのメッセージが変わっていれば書き直す）
+    - session_values: その他のキー（created_at、family_plan、ジョブ状態など）
+
+    接続はスレッドごとに1本持ち回し（sqlite3の文キャッシュでSQLは準備済みのまま再利用される）、
+    書き込みは BEGIN IMMEDIATE のトランザクションで1回にまとめてコミットする。
+    """
+
+    PROFILE_KEY = 'user_profile'
+    MESSAGE_KEYS = ('conversation_history', 'family_conversation')
+    # 接続ごとに保持する準備済みステートメント数
+    STATEMENT_CACHE_SIZE = 64
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS session_profiles (
+            session_id TEXT PRIMARY KEY REFERENCES sessions(session_id) ON DELETE CASCADE,
+            profile TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS session_messages (
+            session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+            kind TEXT NOT NULL,
+            order_index INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            digest BLOB,
+            PRIMARY KEY (session_id, kind, order_index)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS session_values (
+            session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (session_id, key)
+        ) WITHOUT ROWID
+        """,
+    )
+
+    SQL_UPSERT_SESSION = (
+        "INSERT INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at"
+    )
+    SQL_EXISTS = "SELECT 1 FROM sessions WHERE session_id = ?"
+    SQL_UPSERT_PROFILE = (
+        "INSERT INTO session_profiles (session_id, profile) VALUES (?, ?) "
+        "ON CONFLICT(session_id) DO UPDATE SET profile = excluded.profile"
+    )
+    SQL_SELECT_PROFILE = "SELECT profile FROM session_profiles WHERE session_id = ?"
+    SQL_MESSAGE_DIGESTS = (
+        "SELECT digest FROM session_messages WHERE session_id = ? AND kind = ? ORDER BY order_index"
+    )
+    SQL_INSERT_MESSAGE = (
+        "INSERT OR REPLACE INTO session_messages (session_id, kind, order_index, message, digest) "
+        "VALUES (?, ?, ?, ?, ?)"
+    )
+    SQL_DELETE_MESSAGES = "DELETE FROM session_messages WHERE session_id = ? AND kind = ?"
+    SQL_SELECT_MESSAGES = (
+        "SELECT message FROM session_messages WHERE session_id = ? AND kind = ? ORDER BY order_index"
+    )
+    SQL_UPSERT_VALUE = (
+        "INSERT INTO session_values (session_id, key, value) VALUES (?, ?, ?) "
+        "ON CONFLICT(session_id, key) DO UPDATE SET value = excluded.value"
+    )
+    SQL_SELECT_VALUES = "SELECT key, value FROM session_values WHERE session_id = ?"
+    SQL_DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+
+    def __init__(self, db_path: str, busy_timeout: float = 5.0):
+        """
+        Args:
+            db_path: SQLiteデータベースファイルのパス
+            busy_timeout: 他の接続が書き込み中の場合に待つ秒数
+        """
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections_lock = threading.Lock()
+        self._connections: list = []
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+        # ハッシュ列のない既存のデータベースには列を追加（既存の行は次の保存で書き直される）
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(session_messages)")}
+        if 'digest' not in columns:
+            conn.execute("ALTER TABLE session_messages ADD COLUMN digest BLOB")
+
+    def _connection(self):
+        """スレッドごとの接続を取得（なければ作成）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # 自動コミットにして、トランザクションは _transaction() で明示的に張る
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=self.STATEMENT_CACHE_SIZE,
+            )
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """書き込み用トランザクション（書き込みロックを最初に取得して競合時のデッドロックを防ぐ）"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _dumps(value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False)
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        """セッションデータを1トランザクションで保存（会話履歴は未保存のメッセージのみ追記）"""
+        now = datetime.now().isoformat()
+        with self._transaction() as conn:
+            conn.execute(self.SQL_UPSERT_SESSION, (session_id, now, now))
+            for key, value in data.items():
+                if key == self.PROFILE_KEY:
+                    conn.execute(self.SQL_UPSERT_PROFILE, (session_id, self._dumps(value)))
+                elif key in self.MESSAGE_KEYS and isinstance(value, list):
+                    self._save_messages(conn, session_id, key, value)
+                else:
+                    conn.execute(self.SQL_UPSERT_VALUE, (session_id, key, self._dumps(value)))
+
+    def _save_messages(self, conn, session_id: str, kind: str, messages: list) -> None:
+        """保存済みの件数より後ろのメッセージだけを追記
+
+        短くなった場合や、保存済みのメッセージのどれかが渡された履歴の同じ位置と異なる場合
+        （行ごとの内容のハッシュで判定）は書き直す。
+        """
+        encoded = [self._dumps(message) for message in messages]
+        digests = [hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest() for text in encoded]
+        stored = [row[0] for row in conn.execute(self.SQL_MESSAGE_DIGESTS, (session_id, kind))]
+        count = len(stored)
+        if count > len(digests) or stored != digests[:count]:
+            conn.execute(self.SQL_DELETE_MESSAGES, (session_id, kind))
+            count = 0
+        conn.executemany(
+            self.SQL_INSERT_MESSAGE,
+            (
+                (session_id, kind, index, encoded[index], digests[index])
+                for index in range(count, len(encoded))
+            ),
+        )
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """セッションデータを読み込み"""
+        return self._load(session_id, None)
+
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """指定したキーに対応するテーブルのみ読み込み"""
+        return self._load(session_id, list(keys))
+
+    def _load(self, session_id: str, keys: Optional[list]) -> Optional[Dict[str, Any]]:
+        conn = self._connection()
+        # 読み込みも1トランザクションにして、途中で書き込まれても一貫した内容を返す
+        conn.execute("BEGIN")
+        try:
+            if conn.execute(self.SQL_EXISTS, (session_id,)).fetchone() is None:
+                return None
+
+            data: Dict[str, Any] = {}
+            if keys is None or self.PROFILE_KEY in keys:
+                row = conn.execute(self.SQL_SELECT_PROFILE, (session_id,)).fetchone()
+                if row is not None:
+                    data[self.PROFILE_KEY] = json.loads(row[0])
+
+            for kind in self.MESSAGE_KEYS:
+                if keys is not None and kind not in keys:
+                    continue
+                rows = conn.execute(self.SQL_SELECT_MESSAGES, (session_id, kind)).fetchall()
+                if rows:
+                    data[kind] = [json.loads(row[0]) for row in rows]
+
+            value_keys = None if keys is None else [
+                key for key in keys if key != self.PROFILE_KEY and key not in self.MESSAGE_KEYS
+            ]
+            if value_keys is None or value_keys:
+                for key, value in conn.execute(self.SQL_SELECT_VALUES, (session_id,)):
+                    if value_keys is None or key in value_keys:
+                        data[key] = json.loads(value)
+            return data
+        finally:
+            conn.execute("COMMIT")
+
+    def delete(self, session_id: str) -> None:
+        """セッションデータを削除（外部キーのカスケードで関連データも削除）"""
+        with self._transaction() as conn:
+            conn.execute(self.SQL_DELETE_SESSION, (session_id,))
+
+    def exists(self, session_id: str) -> bool:
+        """セッションが存在するか確認"""
+        return self._connection().execute(self.SQL_EXISTS, (session_id,)).fetchone() is not None
+
+    def close(self) -> None:
+        """全スレッドの接続を閉じる"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
 class SupabaseSessionManager(SessionManager):
     """Supabaseベースのセッション管理（本番環境用）"""
 
@@ -332,63 +972,90 @@ class SupabaseSessionManager(SessionManager):
             'updated_at': datetime.now().isoformat()
         }).eq('session_id', session_id).execute()
 
+    # load()で読み込むキー（sessionsテーブルの created_at / status を含む）
+    LOADABLE_KEYS = (
+        'user_profile',
+        'conversation_history',
+        'family_conversation',
+        'family_trip_info',
+        'family_plan',
+        'created_at',
+        'status',
+    )
+
     def load(self, session_id: str) -> Optional[Dict[str, Any]]:
         """セッションデータをSupabaseから読み込み"""
+        return self.load_keys(session_id, self.LOADABLE_KEYS)
+
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """指定したキーに対応するテーブルのみ読み込み"""
         # セッションが存在するか確認
         session_response = self.client.table('sessions').select('*').eq('session_id', session_id).execute()
 
         if not session_response.data:
             return None
 
-        data = {}
+        session_row = session_response.data[0]
+        loaders = {
+            'user_profile': self._load_user_profile,
+            'conversation_history': lambda sid: self._load_conversations('conversation_history', sid),
+            'family_conversation': lambda sid: self._load_conversations('family_conversations', sid),
+            'family_trip_info': self._load_family_trip_info,
+            'family_plan': self._load_family_plan,
+        }
 
-        # user_profilesから読み込み
-        profile_response = self.client.table('user_profiles').select('*').eq('session_id', session_id).execute()
-        if profile_response.data:
-            profile = profile_response.data[0]
-            # session_id, id, created_at を除外
-            data['user_profile'] = {k: v for k, v in profile.items()
-                                   if k not in ['id', 'session_id', 'created_at', 'updated_at']}
-
-        # conversation_historyから読み込み
-        conv_response = self.client.table('conversation_history').select('*').eq('session_id', session_id).order('order_index').execute()
-        if conv_response.data:
-            data['conversation_history'] = [
-                {
-                    'message': conv['message'],
-                    'speaker': conv['speaker'],
-                    'timestamp': conv.get('timestamp')
-                }
-                for conv in conv_response.data
-            ]
+        data = {}
+        for key in keys:
+            if key in ('created_at', 'status'):
+                # その他のメタデータ
+                data[key] = session_row.get(key)
+                continue
+            loader = loaders.get(key)
+            if loader is None:
+                continue
+            value = loader(session_id)
+            if value is not None:
+                data[key] = value
 
-        # family_conversationsから読み込み
-        family_conv_response = self.client.table('family_conversations').select('*').eq('session_id', session_id).order('order_index').execute()
-        if family_conv_response.data:
-            data['family_conversation'] = [
-                {
-                    'message': conv['message'],
-                    'speaker': conv['speaker'],
-                    'timestamp': conv.get('timestamp')
-                }
-                for conv in family_conv_response.data
-            ]
+        return data
 
-        # family_trip_infoから読み込み
+    def _load_user_profile(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """user_profilesから読み込み"""
+        profile_response = self.client.table('user_profiles').select('*').eq('session_id', session_id).execute()
+        if not profile_response.data:
+            return None
+        profile = profile_response.data[0]
+        # session_id, id, created_at を除外
+        return {k: v for k, v in profile.items()
+                if k not in ['id', 'session_id', 'created_at', 'updated_at']}
+
+    def _load_conversations(self, table: str, session_id: str) -> Optional[list]:
+        """conversation_history / family_conversations から読み込み"""
+        conv_response = self.client.table(table).select('*').eq('session_id', session_id).order('order_index').execute()
+        if not conv_response.data:
+            return None
+        return [
+            {
+                'message': conv['message'],
+                'speaker': conv['speaker'],
+                'timestamp': conv.get('timestamp')
+            }
+            for conv in conv_response.data
+        ]
+
+    def _load_family_trip_info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """family_trip_infoから読み込み"""
         trip_response = self.client.table('family_trip_info').select('*').eq('session_id', session_id).execute()
-        if trip_response.data:
-            data['family_trip_info'] = trip_response.data[0].get('trip_data', {})
+        if not trip_response.data:
+            return None
+        return trip_response.data[0].get('trip_data', {})
 
-        # family_plansから読み込み
+    def _load_family_plan(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """family_plansから読み込み"""
         plan_response = self.client.table('family_plans').select('*').eq('session_id', session_id).execute()
-        if plan_response.data:
-            data['family_plan'] = plan_response.data[0].get('plan_data', {})
-
-        # その他のメタデータ
-        data['created_at'] = session_response.data[0].get('created_at')
-        data['status'] = session_response.data[0].get('status')
-
-        return data
+        if not plan_response.data:
+            return None
+        return plan_response.data[0].get('plan_data', {})
 
     def delete(self, session_id: str) -> None:
         """セッションデータを削除（カスケード削除により関連データも削除）"""
@@ -405,11 +1072,12 @@ def create_session_manager() -> SessionManager:
     環境変数に基づいてセッションマネージャーを作成
 
     環境変数:
-        SESSION_TYPE: 'file', 'redis', 'supabase', 'firebase' (デフォルト: 'file')
+        SESSION_TYPE: 'file', 'sqlite', 'redis', 'supabase', 'firebase' (デフォルト: 'file')
         REDIS_URL: RedisのURL（SESSION_TYPE='redis'の場合に必須）
         SUPABASE_URL: SupabaseプロジェクトのURL（SESSION_TYPE='supabase'の場合に必須）
         SUPABASE_SERVICE_ROLE_KEY: Supabaseサービスロールキー（SESSION_TYPE='supabase'の場合に必須）
         FIREBASE_PROJECT_ID: FirebaseプロジェクトID（SESSION_TYPE='firebase'の場合に必須）
+        SQLITE_SESSION_PATH: SQLiteデータベースのパス（SESSION_TYPE='sqlite'の場合、デフォルト: SESSIONS_DIR/sessions.sqlite3）
         SESSIONS_DIR: ファイルベースの場合のセッションディレクトリ
 
     Returns:
@@ -438,9 +1106,14 @@ def create_session_manager() -> SessionManager:
     elif session_type == 'firebase':
         return FirebaseSessionManager()
 
+    elif session_type == 'sqlite':
+        from config import get_sessions_dir
+        db_path = os.getenv('SQLITE_SESSION_PATH') or os.path.join(get_sessions_dir(), 'sessions.sqlite3')
+        return SqliteSessionManager(db_path)
+
     else:  # file
         from config import get_sessions_dir
-        return FileSessionManager(get_sessions_dir())
+        return FileSessionManager(get_sessions_dir(), index=get_session_index())
 
 
 # グローバルセッションマネージャー
@@ -448,8 +1121,24 @@ _session_manager: Optional[SessionManager] = None
 
 
 def get_session_manager() -> SessionManager:
-    """グローバルセッションマネージャーを取得"""
+    """
+    グローバルセッションマネージャーを取得
+
+    環境変数:
+        SESSION_CACHE: 'true'の場合、読み込みキャッシュを挟む
+            （デフォルト: SESSION_CACHE_INVALIDATION_URL が設定されていれば 'true'、なければ 'false'。
+            無効化通知なしで複数ワーカーから使うと、他のワーカーの更新がTTLの間見えない）
+        SESSION_WRITE_BEHIND: 'true'の場合、書き込みをまとめて反映するラッパーを挟む（デフォルト: 'true'）
+    """
     global _session_manager
     if _session_manager is None:
-        _session_manager = create_session_manager()
+        manager = create_session_manager()
+        cache_default = 'true' if os.getenv('SESSION_CACHE_INVALIDATION_URL') else 'false'
+        if os.getenv('SESSION_CACHE', cache_default).lower() == 'true':
+            from .cached_session import CachedSessionManager
+            manager = CachedSessionManager(manager)
+        if os.getenv('SESSION_WRITE_BEHIND', 'true').lower() == 'true':
+            from .write_behind_session import WriteBehindSessionManager
+            manager = WriteBehindSessionManager(manager)
+        _session_manager = manager
     return _session_manager
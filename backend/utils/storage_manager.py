@@ -4,12 +4,120 @@
 """
 import os
 import json
+import hashlib
+import hmac
+import secrets
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, BinaryIO
-from datetime import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, BinaryIO
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
 import mimetypes
 
 
+# ファイルを分割して読み出すときの1チャンクのバイト数
+STREAM_CHUNK_SIZE = int(os.getenv('STORAGE_STREAM_CHUNK_SIZE', str(256 * 1024)))
+# 一括削除の1リクエストあたりの件数（GCSのバッチ / S3のdelete_objects / Azureのバッチの上限）
+GCS_BATCH_SIZE = 100
+S3_DELETE_BATCH_SIZE = 1000
+AZURE_BATCH_SIZE = 256
+# 署名付きURLの有効期限（秒）
+SIGNED_URL_TTL_SEC = int(os.getenv('SIGNED_URL_TTL_SEC', '3600'))
+# ローカルの署名付きアップロードURLの署名鍵（未設定の場合は保存先ディレクトリの鍵ファイルを使う）
+UPLOAD_SIGNING_SECRET = os.getenv('UPLOAD_SIGNING_SECRET')
+UPLOAD_SECRET_FILENAME = '.upload_signing_secret'
+
+
+@dataclass
+class FileInfo:
+    """保存済みファイルの属性（条件付きリクエスト・Range配信用）"""
+
+    size: int
+    # 強いETag（ダブルクォートなしの値）
+    etag: str
+    last_modified: Optional[datetime] = None
+    content_type: Optional[str] = None
+
+
+class SignedUrlCache:
+    """署名付きダウンロードURLのキャッシュ（有効期限の半分まで同じURLを返す）"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}
+
+    def get_or_create(self, key: str, ttl: int, factory) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[1] > now:
+                return cached[0]
+        url = factory()
+        if url is None:
+            return None
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (url, now + ttl / 2)
+        return url
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if not k.startswith(prefix)}
+
+
+def load_upload_secret(base_dir: str) -> str:
+    """ローカルの署名付きアップロードURLの署名鍵を取得
+
+    UPLOAD_SIGNING_SECRET が未設定の場合は、保存先ディレクトリの鍵ファイルを読み込む
+    （なければ作成する）。同じディレクトリを使うプロセス間と再起動後で同じ鍵になる。
+    """
+    if UPLOAD_SIGNING_SECRET:
+        return UPLOAD_SIGNING_SECRET
+
+    secret_path = os.path.join(base_dir, UPLOAD_SECRET_FILENAME)
+    try:
+        with open(secret_path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+
+    # 書き終えた一時ファイルをリンクで置き、同時に作成した場合は先に置かれた鍵を使う
+    tmp_path = f"{secret_path}.{secrets.token_hex(4)}.part"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, secret_path)
+            print(f"[INFO] アップロードURLの署名鍵を作成しました: {secret_path}")
+        except FileExistsError:
+            pass
+    finally:
+        os.remove(tmp_path)
+    with open(secret_path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def _upload_ticket(url: str, content_type: str, expires_in: int, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """クライアントに返すアップロード情報"""
+    return {
+        'url': url,
+        'method': 'PUT',
+        'headers': headers or {'Content-Type': content_type},
+        'expires_at': (datetime.now(timezone.utc) + timedelta(seconds=expires_in)).isoformat(),
+    }
+
+
 class StorageManager(ABC):
     """ストレージ管理の基底クラス"""
 
@@ -38,6 +146,162 @@ class StorageManager(ABC):
         """セッション全体を削除"""
         pass
 
+    def stat_file(self, session_id: str, file_path: str) -> Optional[FileInfo]:
+        """ファイルの属性を取得（存在しない場合はNone）
+
+        デフォルト実装はファイル全体を読み込んで内容からETagを作るので、
+        各ストレージは本体を読まずにメタデータだけを取得するよう上書きする。
+        """
+        data = self.load_file(session_id, file_path)
+        if data is None:
+            return None
+        return FileInfo(
+            size=len(data),
+            etag=hashlib.sha256(data).hexdigest(),
+            content_type=mimetypes.guess_type(file_path)[0],
+        )
+
+    def open_file(
+        self,
+        session_id: str,
+        file_path: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Optional[Iterator[bytes]]:
+        """ファイルの [start, end) をチャンクごとに読み出すイテレータを返す（存在しない場合はNone）
+
+        デフォルト実装はファイル全体を読み込んでから分割するので、
+        各ストレージはストリームから順に読むよう上書きする。
+        """
+        data = self.load_file(session_id, file_path)
+        if data is None:
+            return None
+        data = data[start:end]
+        return (data[offset:offset + chunk_size] for offset in range(0, len(data), chunk_size))
+
+    def save_stream(self, session_id: str, file_path: str, stream: BinaryIO) -> str:
+        """ファイルオブジェクトから読み込んで保存し、URLを返す
+
+        デフォルト実装は全体を読み込んでから save_file() する。
+        """
+        return self.save_file(session_id, file_path, stream.read())
+
+    @abstractmethod
+    def discard_file(self, session_id: str, file_path: str) -> None:
+        """ファイルを1つ削除（検証に失敗したアップロードの破棄用）"""
+        pass
+
+    def delete_files(self, session_id: str, file_paths: List[str]) -> None:
+        """複数のファイルを削除
+
+        デフォルト実装は1件ずつ discard_file() する。各ストレージは一括削除APIで上書きする。
+        """
+        for file_path in file_paths:
+            self.discard_file(session_id, file_path)
+
+    def move_file(self, session_id: str, src_path: str, dst_path: str) -> None:
+        """ファイルを別のパスへ移動（検証済みのアップロードを配信するパスに置く）
+
+        デフォルト実装は読み込んで保存し直してから元のファイルを削除する。
+        各ストレージはサーバー側のコピー・リネームで上書きする。
+        """
+        data = self.load_file(session_id, src_path)
+        if data is None:
+            raise FileNotFoundError(f"{session_id}/{src_path}")
+        self.save_file(session_id, dst_path, data)
+        self.discard_file(session_id, src_path)
+
+    def create_upload_url(
+        self,
+        session_id: str,
+        file_path: str,
+        content_type: str,
+        expires_in: int = SIGNED_URL_TTL_SEC,
+    ) -> Optional[Dict[str, Any]]:
+        """クライアントが直接アップロードするための署名付きURLを発行
+
+        Returns:
+            {'url', 'method', 'headers', 'expires_at'}。対応していない場合はNone
+        """
+        return None
+
+    def get_download_url(
+        self,
+        session_id: str,
+        file_path: str,
+        expires_in: int = SIGNED_URL_TTL_SEC,
+    ) -> Optional[str]:
+        """クライアントが直接ダウンロードするための署名付きURLを取得
+
+        Returns:
+            署名付きURL。対応していない場合やファイルがない場合はNone（APIから配信する）
+        """
+        return None
+
+    def verify_upload(self, session_id: str, file_path: str, expires: str, signature: str) -> bool:
+        """APIの署名付きアップロードルートへのPUTを検証
+
+        create_upload_url() がAPIのURLを返すストレージのみ上書きする。
+        """
+        return False
+
+    def _signed_url_cache(self) -> SignedUrlCache:
+        cache = getattr(self, '_url_cache', None)
+        if cache is None:
+            cache = self._url_cache = SignedUrlCache()
+        return cache
+
+
+def _iter_reader(reader, start: int, end: Optional[int], chunk_size: int) -> Iterator[bytes]:
+    """シーク可能なファイルオブジェクトから [start, end) を読み出して閉じる"""
+    try:
+        if start:
+            reader.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk = reader.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        reader.close()
+
+
+def _chunked(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
+def gcs_batch_delete(client, bucket, blob_names: List[str]) -> None:
+    """GCSのBlobをバッチリクエストでまとめて削除（存在しないBlobは無視）"""
+    for names in _chunked(list(blob_names), GCS_BATCH_SIZE):
+        with client.batch(raise_exception=False):
+            for name in names:
+                bucket.delete_blob(name)
+
+
+def _blob_signed_url(blob, method: str, expires_in: int, content_type: Optional[str] = None) -> str:
+    """GCS / Firebase Storageのblobの署名付きURL（V4）"""
+    return blob.generate_signed_url(
+        version="v4",
+        expiration=timedelta(seconds=expires_in),
+        method=method,
+        content_type=content_type,
+    )
+
+
+def _blob_info(blob) -> FileInfo:
+    """GCS / Firebase Storageのblobから属性を取得"""
+    return FileInfo(
+        size=blob.size or 0,
+        etag=(blob.etag or blob.md5_hash or f"{blob.generation}").strip('"'),
+        last_modified=blob.updated,
+        content_type=blob.content_type,
+    )
+
 
 class FirebaseStorageManager(StorageManager):
     """Firebase Storage + Firestore管理（本番用）"""
@@ -115,6 +379,55 @@ class FirebaseStorageManager(StorageManager):
 
         return blob.download_as_bytes()
 
+    def stat_file(self, session_id: str, file_path: str) -> Optional[FileInfo]:
+        """blobのメタデータのみ取得"""
+        blob = self.bucket.get_blob(self._get_blob_path(session_id, file_path))
+        return _blob_info(blob) if blob is not None else None
+
+    def open_file(
+        self,
+        session_id: str,
+        file_path: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Optional[Iterator[bytes]]:
+        """blobをチャンク単位で読み出す"""
+        blob = self.bucket.blob(self._get_blob_path(session_id, file_path))
+        if not blob.exists():
+            return None
+        return _iter_reader(blob.open('rb', chunk_size=chunk_size), start, end, chunk_size)
+
+    def discard_file(self, session_id: str, file_path: str) -> None:
+        self.bucket.blob(self._get_blob_path(session_id, file_path)).delete()
+        self._signed_url_cache().invalidate(f"{session_id}/{file_path}")
+
+    def delete_files(self, session_id: str, file_paths: List[str]) -> None:
+        gcs_batch_delete(self.bucket.client, self.bucket, [self._get_blob_path(session_id, p) for p in file_paths])
+        for file_path in file_paths:
+            self._signed_url_cache().invalidate(f"{session_id}/{file_path}")
+
+    def move_file(self, session_id: str, src_path: str, dst_path: str) -> None:
+        """バケット内でコピーしてから元のblobを削除"""
+        blob = self.bucket.blob(self._get_blob_path(session_id, src_path))
+        self.bucket.copy_blob(blob, self.bucket, self._get_blob_path(session_id, dst_path))
+        self.discard_file(session_id, src_path)
+        self._signed_url_cache().invalidate(f"{session_id}/{dst_path}")
+
+    def create_upload_url(self, session_id, file_path, content_type, expires_in=SIGNED_URL_TTL_SEC):
+        """Firebase Storageへ直接PUTする署名付きURL"""
+        blob = self.bucket.blob(self._get_blob_path(session_id, file_path))
+        self._signed_url_cache().invalidate(f"{session_id}/{file_path}")
+        return _upload_ticket(_blob_signed_url(blob, "PUT", expires_in, content_type), content_type, expires_in)
+
+    def get_download_url(self, session_id, file_path, expires_in=SIGNED_URL_TTL_SEC):
+        """Firebase Storageから直接GETする署名付きURL（キャッシュ済みなら存在確認も省略）"""
+        def create():
+            blob = self.bucket.blob(self._get_blob_path(session_id, file_path))
+            return _blob_signed_url(blob, "GET", expires_in) if blob.exists() else None
+
+        return self._signed_url_cache().get_or_create(f"{session_id}/{file_path}", expires_in, create)
+
     def delete_session(self, session_id: str) -> None:
         """セッション全体を削除（メタデータとファイル）"""
         # Firestoreのメタデータを削除
@@ -126,11 +439,11 @@ class FirebaseStorageManager(StorageManager):
         batch.delete(metadata_ref)
         batch.commit()
 
-        # Firebase Storageのファイルを削除
+        # Firebase Storageのファイルをバッチでまとめて削除
         prefix = f"sessions/{session_id}/"
-        blobs = self.bucket.list_blobs(prefix=prefix)
-        for blob in blobs:
-            blob.delete()
+        names = [blob.name for blob in self.bucket.list_blobs(prefix=prefix)]
+        gcs_batch_delete(self.bucket.client, self.bucket, names)
+        self._signed_url_cache().invalidate_prefix(f"{session_id}/")
 
 
 class LocalStorageManager(StorageManager):
@@ -139,9 +452,11 @@ class LocalStorageManager(StorageManager):
     def __init__(self, base_dir: str):
         self.base_dir = base_dir
         os.makedirs(base_dir, exist_ok=True)
+        self._upload_secret = load_upload_secret(base_dir).encode('utf-8')
 
     def _get_session_dir(self, session_id: str) -> str:
-        return os.path.join(self.base_dir, session_id)
+        from .session_layout import session_dir
+        return session_dir(self.base_dir, session_id)
 
     def save_metadata(self, session_id: str, key: str, data: Dict[str, Any]) -> None:
         session_dir = self._get_session_dir(session_id)
@@ -176,6 +491,96 @@ class LocalStorageManager(StorageManager):
         with open(full_path, 'rb') as f:
             return f.read()
 
+    def stat_file(self, session_id: str, file_path: str) -> Optional[FileInfo]:
+        """ファイルのサイズと更新時刻からETagを作る（本体は読まない）"""
+        full_path = os.path.join(self._get_session_dir(session_id), file_path)
+        try:
+            st = os.stat(full_path)
+        except FileNotFoundError:
+            return None
+        return FileInfo(
+            size=st.st_size,
+            etag=f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}",
+            last_modified=datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+            content_type=mimetypes.guess_type(file_path)[0],
+        )
+
+    def open_file(
+        self,
+        session_id: str,
+        file_path: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Optional[Iterator[bytes]]:
+        """ファイルハンドルから順に読み出す"""
+        full_path = os.path.join(self._get_session_dir(session_id), file_path)
+        try:
+            f = open(full_path, 'rb')
+        except FileNotFoundError:
+            return None
+        return _iter_reader(f, start, end, chunk_size)
+
+    def save_stream(self, session_id: str, file_path: str, stream: BinaryIO) -> str:
+        """チャンク単位で一時ファイルに書き込み、書き終えてから置き換える"""
+        full_path = os.path.join(self._get_session_dir(session_id), file_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        tmp_path = f"{full_path}.{secrets.token_hex(4)}.part"
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            os.replace(tmp_path, full_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return f"/api/sessions/{session_id}/{file_path}"
+
+    def discard_file(self, session_id: str, file_path: str) -> None:
+        full_path = os.path.join(self._get_session_dir(session_id), file_path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+
+    def delete_files(self, session_id: str, file_paths: List[str]) -> None:
+        for file_path in file_paths:
+            self.discard_file(session_id, file_path)
+
+    def move_file(self, session_id: str, src_path: str, dst_path: str) -> None:
+        """リネームで置き換える（置き換え中も移動先は古いファイルか新しいファイルのどちらかになる）"""
+        session_dir = self._get_session_dir(session_id)
+        full_path = os.path.join(session_dir, dst_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(os.path.join(session_dir, src_path), full_path)
+
+    def create_upload_url(self, session_id, file_path, content_type, expires_in=SIGNED_URL_TTL_SEC):
+        """APIの署名付きアップロードルート（/api/sessions/<id>/uploads/<path>）のURL"""
+        expires = int(time.time()) + expires_in
+        signature = self._sign_upload(session_id, file_path, expires)
+        url = (
+            f"/api/sessions/{quote(session_id)}/uploads/{quote(file_path)}"
+            f"?expires={expires}&signature={signature}"
+        )
+        return _upload_ticket(url, content_type, expires_in)
+
+    def verify_upload(self, session_id: str, file_path: str, expires: str, signature: str) -> bool:
+        """署名付きアップロードURLを検証（期限切れ・改ざんはFalse）"""
+        try:
+            expires_at = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if expires_at < time.time():
+            return False
+        return hmac.compare_digest(self._sign_upload(session_id, file_path, expires_at), signature or '')
+
+    def _sign_upload(self, session_id: str, file_path: str, expires: int) -> str:
+        message = f"{session_id}:{file_path}:{expires}".encode('utf-8')
+        return hmac.new(self._upload_secret, message, hashlib.sha256).hexdigest()
+
     def delete_session(self, session_id: str) -> None:
         import shutil
         session_dir = self._get_session_dir(session_id)
@@ -327,6 +732,192 @@ class CloudStorageManager(StorageManager):
             print(f"ファイル読み込みエラー: {e}")
             return None
 
+    def stat_file(self, session_id: str, file_path: str) -> Optional[FileInfo]:
+        """オブジェクトのメタデータのみ取得（S3: HEAD、GCS: メタデータ取得、Azure: プロパティ取得）"""
+        object_key = f"sessions/{session_id}/{file_path}"
+
+        try:
+            if self.storage_type == 's3':
+                response = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+                return FileInfo(
+                    size=response['ContentLength'],
+                    etag=response['ETag'].strip('"'),
+                    last_modified=response.get('LastModified'),
+                    content_type=response.get('ContentType'),
+                )
+
+            elif self.storage_type == 'gcs':
+                blob = self.gcs_client.bucket(self.bucket_name).get_blob(object_key)
+                return _blob_info(blob) if blob is not None else None
+
+            elif self.storage_type == 'azure':
+                blob_client = self.blob_service.get_blob_client(
+                    container=self.container_name,
+                    blob=object_key
+                )
+                props = blob_client.get_blob_properties()
+                return FileInfo(
+                    size=props.size,
+                    etag=props.etag.strip('"'),
+                    last_modified=props.last_modified,
+                    content_type=props.content_settings.content_type,
+                )
+
+        except Exception as e:
+            print(f"ファイル属性取得エラー: {e}")
+            return None
+
+    def open_file(
+        self,
+        session_id: str,
+        file_path: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Optional[Iterator[bytes]]:
+        """オブジェクトの指定範囲をチャンク単位で読み出す"""
+        object_key = f"sessions/{session_id}/{file_path}"
+        byte_range = f"bytes={start}-{'' if end is None else end - 1}"
+
+        try:
+            if self.storage_type == 's3':
+                response = self.s3_client.get_object(
+                    Bucket=self.bucket_name,
+                    Key=object_key,
+                    Range=byte_range
+                )
+                return response['Body'].iter_chunks(chunk_size=chunk_size)
+
+            elif self.storage_type == 'gcs':
+                blob = self.gcs_client.bucket(self.bucket_name).blob(object_key)
+                return _iter_reader(blob.open('rb', chunk_size=chunk_size), start, end, chunk_size)
+
+            elif self.storage_type == 'azure':
+                blob_client = self.blob_service.get_blob_client(
+                    container=self.container_name,
+                    blob=object_key
+                )
+                length = None if end is None else end - start
+                return blob_client.download_blob(offset=start, length=length).chunks()
+
+        except Exception as e:
+            print(f"ファイル読み込みエラー: {e}")
+            return None
+
+    def discard_file(self, session_id: str, file_path: str) -> None:
+        object_key = f"sessions/{session_id}/{file_path}"
+        if self.storage_type == 's3':
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_key)
+        elif self.storage_type == 'gcs':
+            self.gcs_client.bucket(self.bucket_name).blob(object_key).delete()
+        elif self.storage_type == 'azure':
+            self.blob_service.get_blob_client(container=self.container_name, blob=object_key).delete_blob()
+        self._signed_url_cache().invalidate(object_key)
+
+    def delete_files(self, session_id: str, file_paths: List[str]) -> None:
+        """複数のファイルを一括削除（S3: delete_objects、GCS: バッチ、Azure: バッチ）"""
+        object_keys = [f"sessions/{session_id}/{file_path}" for file_path in file_paths]
+        self._delete_objects(object_keys)
+        for object_key in object_keys:
+            self._signed_url_cache().invalidate(object_key)
+
+    def move_file(self, session_id: str, src_path: str, dst_path: str) -> None:
+        """バケット内でコピーしてから元のオブジェクトを削除（Azureは読み込んで保存し直す）"""
+        src_key = f"sessions/{session_id}/{src_path}"
+        dst_key = f"sessions/{session_id}/{dst_path}"
+
+        if self.storage_type == 's3':
+            self.s3_client.copy_object(
+                Bucket=self.bucket_name,
+                Key=dst_key,
+                CopySource={'Bucket': self.bucket_name, 'Key': src_key}
+            )
+            self.discard_file(session_id, src_path)
+        elif self.storage_type == 'gcs':
+            bucket = self.gcs_client.bucket(self.bucket_name)
+            bucket.copy_blob(bucket.blob(src_key), bucket, dst_key)
+            self.discard_file(session_id, src_path)
+        else:
+            super().move_file(session_id, src_path, dst_path)
+        self._signed_url_cache().invalidate(dst_key)
+
+    def _delete_objects(self, object_keys: List[str]) -> None:
+        if self.storage_type == 's3':
+            for keys in _chunked(object_keys, S3_DELETE_BATCH_SIZE):
+                self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+                )
+
+        elif self.storage_type == 'gcs':
+            gcs_batch_delete(self.gcs_client, self.gcs_client.bucket(self.bucket_name), object_keys)
+
+        elif self.storage_type == 'azure':
+            container_client = self.blob_service.get_container_client(self.container_name)
+            for names in _chunked(object_keys, AZURE_BATCH_SIZE):
+                container_client.delete_blobs(*names, raise_on_any_failure=False)
+
+    def create_upload_url(self, session_id, file_path, content_type, expires_in=SIGNED_URL_TTL_SEC):
+        """バケットへ直接PUTする署名付きURL（S3: presigned URL、GCS: V4署名、Azure: SAS）"""
+        object_key = f"sessions/{session_id}/{file_path}"
+        self._signed_url_cache().invalidate(object_key)
+
+        if self.storage_type == 's3':
+            url = self.s3_client.generate_presigned_url(
+                'put_object',
+                Params={'Bucket': self.bucket_name, 'Key': object_key, 'ContentType': content_type},
+                ExpiresIn=expires_in
+            )
+            return _upload_ticket(url, content_type, expires_in)
+
+        elif self.storage_type == 'gcs':
+            blob = self.gcs_client.bucket(self.bucket_name).blob(object_key)
+            return _upload_ticket(_blob_signed_url(blob, "PUT", expires_in, content_type), content_type, expires_in)
+
+        elif self.storage_type == 'azure':
+            url = self._azure_sas_url(object_key, expires_in, create=True, write=True)
+            headers = {'Content-Type': content_type, 'x-ms-blob-type': 'BlockBlob'}
+            return _upload_ticket(url, content_type, expires_in, headers=headers)
+
+        return None
+
+    def get_download_url(self, session_id, file_path, expires_in=SIGNED_URL_TTL_SEC):
+        """バケットから直接GETする署名付きURL（キャッシュ済みなら存在確認も省略）"""
+        object_key = f"sessions/{session_id}/{file_path}"
+
+        def create():
+            if self.stat_file(session_id, file_path) is None:
+                return None
+            if self.storage_type == 's3':
+                return self.s3_client.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': self.bucket_name, 'Key': object_key},
+                    ExpiresIn=expires_in
+                )
+            elif self.storage_type == 'gcs':
+                blob = self.gcs_client.bucket(self.bucket_name).blob(object_key)
+                return _blob_signed_url(blob, "GET", expires_in)
+            elif self.storage_type == 'azure':
+                return self._azure_sas_url(object_key, expires_in, read=True)
+            return None
+
+        return self._signed_url_cache().get_or_create(object_key, expires_in, create)
+
+    def _azure_sas_url(self, object_key: str, expires_in: int, **permissions) -> str:
+        """Azure BlobのSAS付きURL"""
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+        blob_client = self.blob_service.get_blob_client(container=self.container_name, blob=object_key)
+        sas = generate_blob_sas(
+            account_name=self.blob_service.account_name,
+            container_name=self.container_name,
+            blob_name=object_key,
+            account_key=self.blob_service.credential.account_key,
+            permission=BlobSasPermissions(**permissions),
+            expiry=datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+        )
+        return f"{blob_client.url}?{sas}"
+
     def delete_session(self, session_id: str) -> None:
         """セッション全体を削除"""
         # Redisのメタデータを削除
@@ -335,34 +926,25 @@ class CloudStorageManager(StorageManager):
         if keys:
             self.redis.delete(*keys)
 
-        # クラウドストレージのファイルを削除
+        # クラウドストレージのファイルを一覧のページごとにまとめて削除
         prefix = f"sessions/{session_id}/"
 
         if self.storage_type == 's3':
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=prefix
-            )
-            if 'Contents' in response:
-                objects = [{'Key': obj['Key']} for obj in response['Contents']]
-                self.s3_client.delete_objects(
-                    Bucket=self.bucket_name,
-                    Delete={'Objects': objects}
-                )
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                self._delete_objects([obj['Key'] for obj in page.get('Contents', [])])
 
         elif self.storage_type == 'gcs':
             bucket = self.gcs_client.bucket(self.bucket_name)
-            blobs = bucket.list_blobs(prefix=prefix)
-            for blob in blobs:
-                blob.delete()
+            self._delete_objects([blob.name for blob in bucket.list_blobs(prefix=prefix)])
 
         elif self.storage_type == 'azure':
             container_client = self.blob_service.get_container_client(
                 self.container_name
             )
-            blobs = container_client.list_blobs(name_starts_with=prefix)
-            for blob in blobs:
-                container_client.delete_blob(blob.name)
+            self._delete_objects([blob.name for blob in container_client.list_blobs(name_starts_with=prefix)])
+
+        self._signed_url_cache().invalidate_prefix(prefix)
 
 
 def create_storage_manager() -> StorageManager:
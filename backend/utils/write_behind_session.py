@@ -0,0 +1,190 @@
+"""
+ライトビハインド方式のセッション管理
+SessionManagerの前段で書き込みをバッファし、1ターン分の保存を1回にまとめる
+
+- セッションごとに変更されたキー（dirtyキー）を保持し、最新の値だけを書き込む
+- リクエスト終了時の flush() か、最初の変更から WRITE_BEHIND_DELAY_SEC 後のタイマーで反映する
+- 未反映の値も load()/load_keys() で読める（read-your-writes）
+- プロセス終了時に残りを反映する
+"""
+import atexit
+import copy
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .session_manager import SessionManager
+
+
+class WriteBehindSessionManager(SessionManager):
+    """書き込みをまとめて下位のSessionManagerへ反映するラッパー"""
+
+    def __init__(self, backend: SessionManager, flush_delay: Optional[float] = None):
+        """
+        Args:
+            backend: 実際に保存するセッションマネージャー
+            flush_delay: 最初の変更から自動反映までの秒数（デフォルト: WRITE_BEHIND_DELAY_SEC or 0.5）
+        """
+        self.backend = backend
+        self.flush_delay = flush_delay if flush_delay is not None else float(
+            os.getenv('WRITE_BEHIND_DELAY_SEC', '0.5')
+        )
+
+        self._lock = threading.Lock()
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        # 反映中（backend.save実行中）の値。反映が終わるまで読み込みに使う
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        # セッションごとの反映ロックと、そのロックを使用中のスレッド数（0になったら破棄）
+        self._flush_locks: Dict[str, List[Any]] = {}
+        self._closed = False
+
+        atexit.register(self.close)
+
+    # ===== SessionManager =====
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        """変更をバッファに記録（実際の保存は flush() またはタイマーで行う）"""
+        if self._closed:
+            self.backend.save(session_id, data)
+            return
+
+        # 呼び出し側が後で値を変更しても、記録時点の内容で保存する
+        snapshot = copy.deepcopy(data)
+        with self._lock:
+            self._dirty.setdefault(session_id, {}).update(snapshot)
+            if session_id not in self._timers and self.flush_delay >= 0:
+                timer = threading.Timer(self.flush_delay, self._flush_quietly, args=(session_id,))
+                timer.daemon = True
+                self._timers[session_id] = timer
+                timer.start()
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """保存済みのデータに未反映の変更を重ねて返す"""
+        pending = self._pending(session_id)
+        data = self.backend.load(session_id)
+        if data is None:
+            return pending or None
+        data.update(pending)
+        return data
+
+    def load_keys(self, session_id: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """未反映のキーはバッファから返し、それ以外だけ下位から読む"""
+        keys = list(keys)
+        pending = self._pending(session_id)
+        result = {key: pending[key] for key in keys if key in pending}
+
+        remaining = [key for key in keys if key not in pending]
+        if not remaining and pending:
+            return result
+
+        data = self.backend.load_keys(session_id, remaining)
+        if data is None:
+            return result if pending else None
+        data.update(result)
+        return data
+
+    def delete(self, session_id: str) -> None:
+        """未反映の変更を破棄してセッションを削除"""
+        with self._lock:
+            self._dirty.pop(session_id, None)
+            timer = self._timers.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+        with self._flush_lock(session_id):
+            self.backend.delete(session_id)
+
+    def exists(self, session_id: str) -> bool:
+        """未反映の変更があるか、下位にセッションがあればTrue"""
+        if self._pending(session_id):
+            return True
+        return self.backend.exists(session_id)
+
+    # ===== 反映 =====
+
+    def flush(self, session_id: Optional[str] = None) -> None:
+        """未反映の変更を下位のセッションマネージャーへ書き込む
+
+        Args:
+            session_id: 対象セッション（Noneの場合は全セッション）
+        """
+        if session_id is None:
+            with self._lock:
+                session_ids = list(self._dirty.keys())
+            for sid in session_ids:
+                self.flush(sid)
+            return
+
+        with self._flush_lock(session_id):
+            with self._lock:
+                timer = self._timers.pop(session_id, None)
+                dirty = self._dirty.pop(session_id, None)
+                if dirty:
+                    self._inflight[session_id] = dirty
+            if timer is not None:
+                timer.cancel()
+            if not dirty:
+                return
+
+            try:
+                self.backend.save(session_id, dirty)
+            except Exception:
+                # 反映に失敗した値は、より新しい変更がなければバッファに戻す
+                with self._lock:
+                    self._inflight.pop(session_id, None)
+                    pending = self._dirty.setdefault(session_id, {})
+                    for key, value in dirty.items():
+                        pending.setdefault(key, value)
+                raise
+
+            with self._lock:
+                self._inflight.pop(session_id, None)
+
+    def close(self) -> None:
+        """全セッションの変更を反映し、以降の保存は直接書き込む"""
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+
+    def _flush_quietly(self, session_id: str) -> None:
+        try:
+            self.flush(session_id)
+        except Exception as e:
+            print(f"[WARN] セッションの遅延保存に失敗しました ({session_id}): {e}")
+            # 失敗した変更は次のタイマーで再試行する
+            with self._lock:
+                if session_id not in self._dirty or session_id in self._timers or self._closed:
+                    return
+                timer = threading.Timer(max(self.flush_delay, 1.0), self._flush_quietly, args=(session_id,))
+                timer.daemon = True
+                self._timers[session_id] = timer
+                timer.start()
+
+    @contextmanager
+    def _flush_lock(self, session_id: str) -> Iterator[None]:
+        """セッションの反映を直列化するロック（使い終わったら破棄し、辞書が増え続けないようにする）"""
+        with self._lock:
+            entry = self._flush_locks.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0 and self._flush_locks.get(session_id) is entry:
+                    del self._flush_locks[session_id]
+
+    def _pending(self, session_id: str) -> Dict[str, Any]:
+        """反映中と未反映の変更（新しいものを優先）"""
+        with self._lock:
+            pending = dict(self._inflight.get(session_id, {}))
+            pending.update(self._dirty.get(session_id, {}))
+        return copy.deepcopy(pending)
+
+
+__all__ = ["WriteBehindSessionManager"]